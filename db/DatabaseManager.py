@@ -1,15 +1,55 @@
 import sqlite3
 import logging
 import pandas as pd
-from typing import Dict
+from typing import Dict, List, Tuple, Optional
 from pathlib import Path
+from datetime import datetime
+from itertools import islice
+from contextlib import contextmanager
 import os
+import time
+import json
+from StreamingStats import register_aggregates, threshold_rows
+
+# Tables whose rows are API entities; their IDs are tracked in fetch_state for request planning.
+ENTITY_TABLES = ('albums', 'artists', 'tracks', 'playlists', 'users')
+# Tables whose JSON `markets` list is also stored as a bitset over the `markets` dictionary table.
+MARKET_TABLES = ('albums', 'tracks')
+MARKET_COLUMNS = {'market_bits': 'BLOB', 'market_count': 'INTEGER'}
+# Fast-moving columns whose changes feed refresh_state.volatility and the <column>_history tables.
+OBSERVED_COLUMNS = {
+    'artists': ('popularity', 'followers'),
+    'albums': ('popularity',),
+    'tracks': ('popularity',),
+    'users': ('followers',)
+}
+# Secondary indexes for the joins and filters in query/SQLQuery.sql. Trailing columns make the
+# per-artist lookups covering, so the reports never touch the wide table rows.
+SECONDARY_INDEXES = {
+    'idx_tracks_artist': 'tracks(artist_id, popularity, track_id)',
+    'idx_tracks_album': 'tracks(album_id)',
+    'idx_albums_artist': 'albums(artist_id, release_date, popularity, album_id)',
+    'idx_playlist_tracks_track': 'playlist_tracks(track_id)',
+    'idx_playlists_owner': 'playlists(owner_id)',
+    'idx_artists_popularity': 'artists(popularity, followers)'
+}
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "spotify_db/spotify.db", schema_dir: str = "spotify_db/schema"):
+    def __init__(self, db_path: str = "spotify_db/spotify.db", schema_dir: str = "spotify_db/schema",
+                 incremental: bool = False, keep_market_json: bool = False, history_path: Optional[str] = None):
         self.db_path = Path(db_path).resolve()
+        self.history_path = Path(history_path).resolve() if history_path else self.db_path.parent / "history.db"
         self.schema_dir = Path(schema_dir).resolve()
+        self.incremental = incremental
+        self.keep_market_json = keep_market_json
+        self._market_ids = {}
+        self._rebuild_genres = False
         self.connection = None
+        self._primary_keys = {}
+        self._tables = set()
+        self._deferred_indexes = []
+        self.load_stats = {}
+        self.run_started_at = datetime.now().isoformat(timespec='seconds')
         self._initialize_database()
 
     def _load_schema_file(self, filename: str) -> str:
@@ -18,12 +58,22 @@ class DatabaseManager:
             return f.read()
 
     def _initialize_database(self):
-        if Path(self.db_path).exists():
+        # Incremental mode keeps the existing file; the schema files only use IF NOT EXISTS.
+        if not self.incremental and Path(self.db_path).exists():
             os.remove(self.db_path)
 
-        self.connection = sqlite3.connect(self.db_path)
+        # The streaming writer owns the connection from its own thread during a run.
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
         cursor = self.connection.cursor()
         cursor.execute("PRAGMA foreign_keys = OFF")
+        # WAL lets dashboards and reports keep reading while a load is writing.
+        cursor.execute("PRAGMA journal_mode = WAL")
+        # Set once up front: changing temp_store later discards the connection's temp tables.
+        cursor.execute("PRAGMA temp_store = MEMORY")
+        cursor.execute("ATTACH DATABASE ? AS history", (str(self.history_path),))
+        cursor.execute("PRAGMA history.journal_mode = WAL")
+        self._migrate_market_columns(cursor)
+        self._migrate_legacy_genres(cursor)
 
         schema_dir_path = Path(self.schema_dir)
         sql_files = sorted(schema_dir_path.glob("*.sql"))
@@ -32,9 +82,521 @@ class DatabaseManager:
             sql = self._load_schema_file(schema_file)
             cursor.executescript(sql)
 
+        self.ensure_indexes()
+        self._seed_history(cursor)
+        self.connection.commit()
+        self._refresh_tables()
+        self._load_market_ids()
+        self.connection.create_function("in_market", 2, self._in_market, deterministic=True)
+        self.connection.create_function("market_count", 1, self._market_count, deterministic=True)
+        register_aggregates(self.connection)
+
+        self._create_temp_tables(cursor)
+        if self._rebuild_genres:
+            self.refresh_genres(all_artists=True)
+        # Stats built before the bridge existed missed every album credited to more than one artist.
+        if self._backfill_album_artists(cursor) or not cursor.execute("SELECT 1 FROM artist_stats LIMIT 1").fetchone():
+            self.refresh_artist_stats(all_artists=True)
+        if not cursor.execute("SELECT 1 FROM thresholds WHERE source = 'computed' LIMIT 1").fetchone():
+            self.refresh_thresholds()
+
+    @classmethod
+    def open_existing(cls, db_path: str = "spotify_db/spotify.db", read_only: bool = True) -> 'DatabaseManager':
+        # For the support scripts: skips _initialize_database, so nothing is deleted, migrated, indexed or
+        # recomputed just by opening the file, and a mistyped path fails instead of creating an empty database.
+        manager = cls.__new__(cls)
+        manager.db_path = Path(db_path).resolve()
+        manager.incremental = True
+        manager.connection = sqlite3.connect(f"{manager.db_path.as_uri()}?mode={'ro' if read_only else 'rw'}",
+                                             uri=True)
+        manager.connection.execute("PRAGMA temp_store = MEMORY")
+        register_aggregates(manager.connection)
+        manager._create_temp_tables(manager.connection.cursor())
+        return manager
+
+    @staticmethod
+    def _create_temp_tables(cursor: sqlite3.Cursor):
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS touched_artists (artist_id TEXT PRIMARY KEY) WITHOUT ROWID")
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS stale_artist_stats (artist_id TEXT PRIMARY KEY) WITHOUT ROWID")
+
+    def _backfill_album_artists(self, cursor: sqlite3.Cursor) -> int:
+        if cursor.execute("SELECT 1 FROM album_artists LIMIT 1").fetchone():
+            return 0
+        cursor.execute(
+            """
+            WITH RECURSIVE split(album_id, artist_id, rest) AS (
+                SELECT album_id, '', artist_id || ',' FROM albums
+                UNION ALL
+                SELECT album_id, substr(rest, 1, instr(rest, ',') - 1), substr(rest, instr(rest, ',') + 1)
+                FROM split WHERE rest <> ''
+            )
+            INSERT OR IGNORE INTO album_artists (album_id, artist_id)
+            SELECT album_id, artist_id FROM split WHERE artist_id <> ''
+            """
+        )
+        self.connection.commit()
+        return cursor.rowcount
+
+    def _load_market_ids(self):
+        rows = self.connection.execute("SELECT country_code, market_id FROM markets").fetchall()
+        self._market_ids = dict(rows)
+
+    def _migrate_market_columns(self, cursor: sqlite3.Cursor):
+        # Databases created before the bitset columns existed get them added in place.
+        for table in MARKET_TABLES:
+            existing = {col[1] for col in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
+            if not existing:
+                continue
+            for column, column_type in MARKET_COLUMNS.items():
+                if column not in existing:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def _migrate_legacy_genres(self, cursor: sqlite3.Cursor):
+        # The old genres table built by SeperateTable.py is replaced by a view over genre_dim/artist_genres.
+        legacy = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'genres'").fetchone()
+        if legacy:
+            cursor.execute("DROP TABLE genres")
+            self._rebuild_genres = True
+
+    def _in_market(self, market_bits: Optional[bytes], country_code: str) -> int:
+        bit = self._market_ids.get(country_code)
+        if market_bits is None or bit is None or bit // 8 >= len(market_bits):
+            return 0
+        return (market_bits[bit // 8] >> (bit % 8)) & 1
+
+    @staticmethod
+    def _market_count(market_bits: Optional[bytes]) -> Optional[int]:
+        if market_bits is None:
+            return None
+        return int.from_bytes(market_bits, 'little').bit_count()
+
+    def _encode_markets(self, cursor: sqlite3.Cursor, markets_json: Optional[str]) -> Tuple[Optional[bytes], Optional[int]]:
+        if markets_json is None:
+            return None, None
+        bits = 0
+        for country_code in json.loads(markets_json):
+            bit = self._market_ids.get(country_code)
+            if bit is None:
+                # Codes are append-only, so bits already stored keep their meaning.
+                bit = len(self._market_ids)
+                cursor.execute("INSERT INTO markets (market_id, country_code) VALUES (?, ?)", (bit, country_code))
+                self._market_ids[country_code] = bit
+            bits |= 1 << bit
+        return bits.to_bytes((bits.bit_length() + 7) // 8, 'little'), bits.bit_count()
+
+    def _with_market_bits(self, cursor: sqlite3.Cursor, table: str, columns: List[str],
+                          data_tuples: List[tuple]) -> Tuple[List[str], List[tuple]]:
+        if table not in MARKET_TABLES or 'markets' not in columns:
+            return columns, data_tuples
+        markets_index = columns.index('markets')
+        encoded = []
+        for row in data_tuples:
+            market_bits, market_count = self._encode_markets(cursor, row[markets_index])
+            if not self.keep_market_json:
+                row = row[:markets_index] + (None,) + row[markets_index + 1:]
+            encoded.append(row + (market_bits, market_count))
+        return columns + list(MARKET_COLUMNS), encoded
+
+    def ensure_indexes(self):
+        cursor = self.connection.cursor()
+        for name, target in SECONDARY_INDEXES.items():
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+    def _refresh_tables(self):
+        rows = self.connection.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+        self._tables = {row[0] for row in rows}
+
+    def begin_bulk_load(self, defer_indexes: bool = True):
+        cursor = self.connection.cursor()
+        # In WAL mode NORMAL skips the fsync on each commit but, unlike OFF, cannot corrupt the file on power loss.
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.execute("PRAGMA cache_size = -262144")
+        self.load_stats = {}
+
+        # Secondary indexes are rebuilt once after the load instead of being maintained row by row.
+        if defer_indexes:
+            self._deferred_indexes = cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL"
+            ).fetchall()
+            for name, _ in self._deferred_indexes:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+            self.connection.commit()
+
+    def end_bulk_load(self):
+        cursor = self.connection.cursor()
+        if self._deferred_indexes:
+            started = time.perf_counter()
+            for _, sql in self._deferred_indexes:
+                cursor.execute(sql)
+            self.connection.commit()
+            logging.info(f"Rebuilt {len(self._deferred_indexes)} deferred indexes in "
+                         f"{time.perf_counter() - started:.2f}s")
+            self._deferred_indexes = []
+            # Stats refreshes wait for the rebuilt indexes; without them every per-artist lookup is a scan.
+            self.refresh_artist_stats()
+            # A full rebuild changes the data distribution too much for PRAGMA optimize's sampling.
+            cursor.execute("ANALYZE")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.execute("PRAGMA optimize")
+        self.refresh_thresholds()
+
+        for table, (rows, seconds) in self.load_stats.items():
+            rate = rows / seconds if seconds else float('inf')
+            logging.info(f"Loaded {rows} rows into {table} in {seconds:.2f}s ({rate:,.0f} rows/s)")
+
+    @contextmanager
+    def bulk_load(self, defer_indexes: bool = True):
+        self.begin_bulk_load(defer_indexes)
+        try:
+            yield self
+        finally:
+            self.end_bulk_load()
+
+    def _get_primary_key(self, table: str) -> List[str]:
+        if table not in self._primary_keys:
+            columns = self.connection.execute(f"PRAGMA table_info({table})").fetchall()
+            pk_columns = sorted((col for col in columns if col[5]), key=lambda col: col[5])
+            self._primary_keys[table] = [col[1] for col in pk_columns]
+        return self._primary_keys[table]
+
+    def _build_upsert(self, table: str, columns: List[str]) -> str:
+        column_list = ', '.join(columns)
+        placeholders = ', '.join(['?'] * len(columns))
+        sql = f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})"
+
+        pk_columns = self._get_primary_key(table)
+        update_columns = [col for col in columns if col not in pk_columns]
+        if not pk_columns:
+            return sql
+        if not update_columns:
+            return f"{sql} ON CONFLICT({', '.join(pk_columns)}) DO NOTHING"
+
+        # Unchanged rows fail the WHERE clause and cost no write.
+        assignments = ', '.join(f"{col} = excluded.{col}" for col in update_columns)
+        changed = ' OR '.join(f"{table}.{col} IS NOT excluded.{col}" for col in update_columns)
+        return (f"{sql} ON CONFLICT({', '.join(pk_columns)}) DO UPDATE SET {assignments} "
+                f"WHERE {changed}")
+
+    def _record_watermark(self, cursor: sqlite3.Cursor, table: str, rows_seen: int, rows_written: int):
+        # Counts accumulate across the chunks of one run and restart with the next run.
+        cursor.execute(
+            """
+            INSERT INTO load_watermarks (table_name, run_started_at, last_loaded_at, rows_seen, rows_written)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(table_name) DO UPDATE SET
+                rows_seen = CASE WHEN run_started_at = excluded.run_started_at
+                                 THEN rows_seen + excluded.rows_seen ELSE excluded.rows_seen END,
+                rows_written = CASE WHEN run_started_at = excluded.run_started_at
+                                    THEN rows_written + excluded.rows_written ELSE excluded.rows_written END,
+                run_started_at = excluded.run_started_at,
+                last_loaded_at = excluded.last_loaded_at
+            """,
+            (table, self.run_started_at, datetime.now().isoformat(timespec='seconds'), rows_seen, rows_written)
+        )
+
+    def get_watermarks(self) -> Dict[str, Dict]:
+        rows = self.connection.execute(
+            "SELECT table_name, run_started_at, last_loaded_at, rows_seen, rows_written FROM load_watermarks"
+        ).fetchall()
+        return {row[0]: {'run_started_at': row[1], 'last_loaded_at': row[2], 'rows_seen': row[3],
+                         'rows_written': row[4]} for row in rows}
+
+    def _table_exists(self, table: str) -> bool:
+        return table in self._tables
+
+    def _write_rows(self, cursor: sqlite3.Cursor, table: str, columns: List[str], data_tuples: List[tuple]) -> int:
+        try:
+            started = time.perf_counter()
+            columns, data_tuples = self._with_market_bits(cursor, table, columns, data_tuples)
+            sql = self._build_upsert(table, columns)
+            changes_before = self.connection.total_changes
+            cursor.executemany(sql, data_tuples)
+            rows_written = self.connection.total_changes - changes_before
+            self._record_watermark(cursor, table, len(data_tuples), rows_written)
+            self._record_fetched(cursor, table, columns, data_tuples)
+            self._record_observations(cursor, table, columns, data_tuples)
+            self._record_history(cursor, table, columns, data_tuples)
+            if table == 'artists':
+                self._mark_artists_touched(cursor, columns, data_tuples)
+            elif table == 'albums':
+                self._record_album_artists(cursor, columns, data_tuples)
+            self._mark_stats_stale(cursor, table, columns, data_tuples)
+
+            rows, seconds = self.load_stats.get(table, (0, 0.0))
+            self.load_stats[table] = (rows + len(data_tuples), seconds + time.perf_counter() - started)
+            return rows_written
+        except sqlite3.Error as e:
+            logging.error(f"Error inserting to {table}: {str(e)}")
+            logging.debug(f"Sample data: {data_tuples[:5]}")
+            raise
+
+    def _record_fetched(self, cursor: sqlite3.Cursor, table: str, columns: List[str], data_tuples: List[tuple]):
+        if table not in ENTITY_TABLES:
+            return
+        id_index = columns.index(self._get_primary_key(table)[0])
+        fetched_at = int(time.time())
+        cursor.executemany(
+            "INSERT OR REPLACE INTO fetch_state (entity_type, entity_id, fetched_at) VALUES (?, ?, ?)",
+            ((table, row[id_index], fetched_at) for row in data_tuples)
+        )
+
+    def _record_observations(self, cursor: sqlite3.Cursor, table: str, columns: List[str],
+                             data_tuples: List[tuple]):
+        if table not in OBSERVED_COLUMNS:
+            return
+        id_index = columns.index(self._get_primary_key(table)[0])
+        indexes = [columns.index(column) if column in columns else None for column in ('popularity', 'followers')]
+        observed_at = int(time.time())
+        # Follower changes are taken relative to the old count, so 1% growth weighs like one popularity point.
+        # Observations less than a day apart count as a day, which keeps same-day refetches from inflating the rate.
+        cursor.executemany(
+            """
+            INSERT INTO refresh_state (entity_type, entity_id, popularity, followers, observed_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(entity_type, entity_id) DO UPDATE SET
+                volatility = COALESCE(0.5 * volatility, 0) + (CASE WHEN volatility IS NULL THEN 1.0 ELSE 0.5 END) *
+                    MAX(ABS(COALESCE(excluded.popularity - popularity, 0)),
+                        COALESCE(MIN(100.0, 100.0 * ABS(excluded.followers - followers) / MAX(followers, 1)), 0))
+                    / MAX((excluded.observed_at - observed_at) / 86400.0, 1.0),
+                popularity = excluded.popularity,
+                followers = excluded.followers,
+                observed_at = excluded.observed_at
+            """,
+            ((table, row[id_index], *(row[i] if i is not None else None for i in indexes), observed_at)
+             for row in data_tuples)
+        )
+
+    def _seed_history(self, cursor: sqlite3.Cursor):
+        # A database loaded before the history tables existed starts each series from its current values.
+        for table, observed in OBSERVED_COLUMNS.items():
+            id_column = self._get_primary_key(table)[0]
+            for column in observed:
+                if cursor.execute(f"SELECT 1 FROM history.{column}_history WHERE entity_type = ? LIMIT 1",
+                                  (table,)).fetchone():
+                    continue
+                cursor.execute(
+                    f"INSERT OR IGNORE INTO history.{column}_history (entity_type, entity_id, observed_at, {column}) "
+                    f"SELECT ?, t.{id_column}, COALESCE(f.fetched_at, ?), t.{column} FROM {table} t "
+                    f"LEFT JOIN fetch_state f ON f.entity_type = ? AND f.entity_id = t.{id_column} "
+                    f"WHERE t.{column} IS NOT NULL",
+                    (table, int(time.time()), table)
+                )
+
+    def _record_history(self, cursor: sqlite3.Cursor, table: str, columns: List[str], data_tuples: List[tuple]):
+        if table not in OBSERVED_COLUMNS:
+            return
+        id_index = columns.index(self._get_primary_key(table)[0])
+        observed_at = int(time.time())
+        for column in OBSERVED_COLUMNS[table]:
+            if column not in columns:
+                continue
+            value_index = columns.index(column)
+            # The latest value is one backward seek on the primary key, so history grows with changes, not runs.
+            cursor.executemany(
+                f"""
+                INSERT INTO history.{column}_history (entity_type, entity_id, observed_at, {column})
+                SELECT ?1, ?2, ?3, ?4
+                WHERE ?4 IS NOT NULL AND ?4 IS NOT (
+                    SELECT {column} FROM history.{column}_history
+                    WHERE entity_type = ?1 AND entity_id = ?2 ORDER BY observed_at DESC LIMIT 1
+                )
+                ON CONFLICT(entity_type, entity_id, observed_at) DO UPDATE SET {column} = excluded.{column}
+                """,
+                ((table, row[id_index], observed_at, row[value_index]) for row in data_tuples)
+            )
+
+    def _mark_artists_touched(self, cursor: sqlite3.Cursor, columns: List[str], data_tuples: List[tuple]):
+        id_index = columns.index('artist_id')
+        cursor.executemany("INSERT OR IGNORE INTO touched_artists (artist_id) VALUES (?)",
+                           ((row[id_index],) for row in data_tuples))
+
+    def _refresh_touched_genres(self, cursor: sqlite3.Cursor) -> int:
+        # Set-based explode of artists.genres for the artists written in this transaction only.
+        touched_genres = """
+            SELECT a.artist_id, lower(trim(j.value)) AS genre
+            FROM touched_artists t
+            JOIN artists a ON a.artist_id = t.artist_id,
+                 json_each(CASE WHEN json_valid(a.genres) THEN a.genres ELSE '[]' END) j
+            WHERE trim(j.value) <> ''
+        """
+        cursor.execute(f"INSERT OR IGNORE INTO genre_dim (genre) SELECT DISTINCT genre FROM ({touched_genres})")
+        cursor.execute("DELETE FROM artist_genres WHERE artist_id IN (SELECT artist_id FROM touched_artists)")
+        cursor.execute(
+            f"INSERT OR IGNORE INTO artist_genres (artist_id, genre_id) "
+            f"SELECT tg.artist_id, g.genre_id FROM ({touched_genres}) tg JOIN genre_dim g ON g.genre = tg.genre"
+        )
+        refreshed = cursor.execute("SELECT COUNT(*) FROM touched_artists").fetchone()[0]
+        cursor.execute("INSERT OR IGNORE INTO stale_artist_stats (artist_id) SELECT artist_id FROM touched_artists")
+        cursor.execute("DELETE FROM touched_artists")
+        return refreshed
+
+    def _record_album_artists(self, cursor: sqlite3.Cursor, columns: List[str], data_tuples: List[tuple]):
+        album_index = columns.index('album_id')
+        artist_index = columns.index('artist_id')
+        album_ids = [(row[album_index],) for row in data_tuples]
+        # Artists dropped from an album's credits lose it from their stats too.
+        cursor.executemany("INSERT OR IGNORE INTO stale_artist_stats (artist_id) "
+                           "SELECT artist_id FROM album_artists WHERE album_id = ?", album_ids)
+        cursor.executemany("DELETE FROM album_artists WHERE album_id = ?", album_ids)
+        cursor.executemany("INSERT OR IGNORE INTO album_artists (album_id, artist_id) VALUES (?, ?)",
+                           ((row[album_index], artist_id) for row in data_tuples
+                            for artist_id in (row[artist_index] or '').split(',') if artist_id))
+
+    def _mark_stats_stale(self, cursor: sqlite3.Cursor, table: str, columns: List[str], data_tuples: List[tuple]):
+        if table in ('artists', 'tracks', 'albums'):
+            # albums.artist_id lists every credited artist comma-joined; each of them is counted separately.
+            id_index = columns.index('artist_id')
+            cursor.executemany("INSERT OR IGNORE INTO stale_artist_stats (artist_id) VALUES (?)",
+                               ((artist_id,) for row in data_tuples
+                                for artist_id in (row[id_index] or '').split(',') if artist_id))
+        elif table == 'playlist_tracks':
+            id_index = columns.index('track_id')
+            cursor.executemany("INSERT OR IGNORE INTO stale_artist_stats (artist_id) "
+                               "SELECT artist_id FROM tracks WHERE track_id = ?",
+                               ((row[id_index],) for row in data_tuples))
+
+    def _refresh_stale_artist_stats(self, cursor: sqlite3.Cursor) -> int:
+        # One narrow row per artist from indexed per-artist lookups, instead of the reports
+        # joining tracks x playlist_tracks x albums x genres and de-duplicating with COUNT(DISTINCT).
+        cursor.execute(
+            """
+            INSERT OR REPLACE INTO artist_stats (artist_id, track_count, album_count, playlist_count, genre_count,
+                                                 avg_track_popularity, avg_album_popularity, refreshed_at)
+            SELECT s.artist_id,
+                   (SELECT COUNT(*) FROM tracks t WHERE t.artist_id = s.artist_id),
+                   (SELECT COUNT(*) FROM album_artists aa WHERE aa.artist_id = s.artist_id),
+                   (SELECT COUNT(DISTINCT pt.playlist_id) FROM tracks t
+                    JOIN playlist_tracks pt ON pt.track_id = t.track_id WHERE t.artist_id = s.artist_id),
+                   (SELECT COUNT(*) FROM artist_genres ag WHERE ag.artist_id = s.artist_id),
+                   (SELECT AVG(t.popularity) FROM tracks t WHERE t.artist_id = s.artist_id),
+                   (SELECT AVG(al.popularity) FROM album_artists aa
+                    JOIN albums al ON al.album_id = aa.album_id WHERE aa.artist_id = s.artist_id),
+                   ?
+            FROM stale_artist_stats s
+            JOIN artists ar ON ar.artist_id = s.artist_id
+            """,
+            (int(time.time()),)
+        )
+        refreshed = cursor.execute("SELECT COUNT(*) FROM stale_artist_stats").fetchone()[0]
+        cursor.execute("DELETE FROM stale_artist_stats")
+        return refreshed
+
+    def refresh_artist_stats(self, all_artists: bool = False) -> int:
+        cursor = self.connection.cursor()
+        if all_artists:
+            cursor.execute("INSERT OR IGNORE INTO stale_artist_stats (artist_id) SELECT artist_id FROM artists")
+        started = time.perf_counter()
+        refreshed = self._refresh_stale_artist_stats(cursor)
+        self.connection.commit()
+        if refreshed:
+            logging.info(f"Refreshed artist_stats for {refreshed} artists in {time.perf_counter() - started:.2f}s")
+        return refreshed
+
+    def compute_thresholds(self) -> List[Tuple[str, float]]:
+        # One scan of artists feeds both single-pass summaries.
+        popularity, followers = self.connection.execute(
+            "SELECT stat_summary(popularity), stat_summary(CASE WHEN followers > 0 THEN followers END) FROM artists"
+        ).fetchone()
+        return threshold_rows(popularity, followers)
+
+    def refresh_thresholds(self) -> Dict[str, float]:
+        # Only computed rows are overwritten; hand-set thresholds are kept.
+        rows = self.compute_thresholds()
+        computed_at = datetime.now().isoformat(timespec='seconds')
+        self.connection.executemany(
+            """
+            INSERT INTO thresholds (name, value, source, computed_at) VALUES (?, ?, 'computed', ?)
+            ON CONFLICT(name) DO UPDATE SET value = excluded.value, computed_at = excluded.computed_at
+            WHERE thresholds.source = 'computed'
+            """,
+            [(name, value, computed_at) for name, value in rows]
+        )
         self.connection.commit()
+        if rows:
+            values = dict(rows)
+            logging.info(f"Thresholds: emerging popularity >= {values.get('emerging_min_popularity')}, "
+                         f"followers < {values.get('emerging_max_followers')}")
+        return dict(rows)
 
-    def save_data(self, dataframes: Dict[str, pd.DataFrame]) -> bool:
+    def refresh_genres(self, all_artists: bool = False) -> int:
+        cursor = self.connection.cursor()
+        if all_artists:
+            cursor.execute("INSERT OR IGNORE INTO touched_artists (artist_id) SELECT artist_id FROM artists")
+        refreshed = self._refresh_touched_genres(cursor)
+        self._refresh_stale_artist_stats(cursor)
+        self.connection.commit()
+        logging.info(f"Refreshed genres for {refreshed} artists")
+        return refreshed
+
+    def get_checkpoints(self, entity: str) -> Dict[str, int]:
+        rows = self.connection.execute(
+            "SELECT chunk_key, position FROM etl_checkpoints WHERE entity = ?", (entity,)
+        ).fetchall()
+        return dict(rows)
+
+    def clear_checkpoints(self):
+        self.connection.execute("DELETE FROM etl_checkpoints")
+        self.connection.commit()
+
+    def save_rows(self, records: Dict[str, List[Dict]],
+                  checkpoints: Optional[List[Tuple[str, str, int]]] = None) -> bool:
+        if not self.connection:
+            logging.error("Database connection not established")
+            return False
+
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("PRAGMA foreign_keys = OFF")
+
+            for table, rows in records.items():
+                if not rows:
+                    continue
+                if not self._table_exists(table):
+                    logging.error(f"Table {table} does not exist")
+                    continue
+
+                columns = [col for col in rows[0] if not (table == "playlists" and col == "tracks")]
+                data_tuples = [tuple(row.get(col) for col in columns) for row in rows]
+                rows_written = self._write_rows(cursor, table, columns, data_tuples)
+                logging.debug(f"Upserted {len(data_tuples)} rows to {table} ({rows_written} new or changed)")
+
+            self._refresh_touched_genres(cursor)
+            if not self._deferred_indexes:
+                self._refresh_stale_artist_stats(cursor)
+
+            # Checkpoints land in the same transaction as their rows, so a crash never marks unsaved work as done.
+            if checkpoints:
+                completed_at = datetime.now().isoformat(timespec='seconds')
+                cursor.executemany(
+                    "INSERT OR REPLACE INTO etl_checkpoints (entity, chunk_key, position, completed_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(entity, chunk_key, position, completed_at) for entity, chunk_key, position in checkpoints]
+                )
+
+            self.connection.commit()
+            return True
+
+        except Exception:
+            self.connection.rollback()
+            self._load_market_ids()
+            self.connection.execute("DELETE FROM touched_artists")
+            logging.exception("Failed to save rows")
+            return False
+
+    @staticmethod
+    def _column_arrays(df: pd.DataFrame) -> List[list]:
+        # Column-wise conversion: tolist() yields native Python values, and only columns with nulls
+        # pay for the NaN -> None pass, so there is no full object-array copy of the frame.
+        arrays = []
+        for col in df.columns:
+            values = df[col].tolist()
+            nulls = df[col].isna()
+            if nulls.any():
+                values = [None if is_null else value for value, is_null in zip(values, nulls.tolist())]
+            arrays.append(values)
+        return arrays
+
+    def save_data(self, dataframes: Dict[str, pd.DataFrame], batch_size: int = 50000) -> bool:
         if not self.connection:
             logging.error("Database connection not established")
             return False
@@ -51,32 +613,31 @@ class DatabaseManager:
                 if table == "playlists" and "tracks" in df.columns:
                     df = df.drop(columns=["tracks"])
 
-                df = df.where(pd.notnull(df), None)
-                columns = ', '.join(df.columns)
-                placeholders = ', '.join(['?'] * len(df.columns))
-
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
-                if not cursor.fetchone():
+                if not self._table_exists(table):
                     logging.error(f"Table {table} does not exist")
                     continue
 
-                sql = f"INSERT OR REPLACE INTO {table} ({columns}) VALUES ({placeholders})"
-                data_tuples = [tuple(x) for x in df.to_numpy()]
-
-                try:
-                    cursor.executemany(sql, data_tuples)
-                    logging.info(f"Inserted/updated {len(data_tuples)} rows to {table}")
-                except sqlite3.Error as e:
-                    logging.error(f"Error inserting to {table}: {str(e)}")
-                    logging.debug(f"Sample data: {data_tuples[:5]}")
-                    raise
+                columns = list(df.columns)
+                rows = zip(*self._column_arrays(df))
+                rows_written = 0
+                while True:
+                    data_tuples = list(islice(rows, batch_size))
+                    if not data_tuples:
+                        break
+                    rows_written += self._write_rows(cursor, table, columns, data_tuples)
+                logging.info(f"Upserted {len(df)} rows to {table} ({rows_written} new or changed)")
 
+            self._refresh_touched_genres(cursor)
+            if not self._deferred_indexes:
+                self._refresh_stale_artist_stats(cursor)
             self.connection.commit()
             logging.info("Data saved successfully")
             return True
 
-        except Exception as e:
+        except Exception:
             self.connection.rollback()
+            self._load_market_ids()
+            self.connection.execute("DELETE FROM touched_artists")
             logging.exception("Failed to save data")
             return False
 
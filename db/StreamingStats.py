@@ -0,0 +1,266 @@
+import json
+import math
+from typing import Dict, List, Optional
+
+SUMMARY_QUANTILES = (0.25, 0.5, 0.75, 0.9, 0.99)
+
+
+class RunningMoments:
+    # Welford's update: numerically stable mean/variance in one pass without keeping the values.
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def std(self) -> Optional[float]:
+        # Population std, the same as numpy.std's default.
+        return math.sqrt(self.m2 / self.count) if self.count else None
+
+
+class P2Quantile:
+    # Jain & Chlamtac's P-square estimator: five markers track the quantile in O(1) memory.
+    def __init__(self, p: float):
+        self.p = p
+        self.heights = []
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value: float):
+        heights = self.heights
+        if len(heights) < 5:
+            heights.append(value)
+            heights.sort()
+            return
+
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = next(i for i in range(4) if heights[i] <= value < heights[i + 1])
+        for i in range(cell + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        positions = self.positions
+        for i in range(1, 4):
+            offset = self.desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        if not self.heights:
+            return None
+        if len(self.heights) < 5 or self.positions[4] < 5:
+            # Too few samples for the markers; interpolate the sorted values directly.
+            ordered = self.heights
+            rank = self.p * (len(ordered) - 1)
+            lower = math.floor(rank)
+            upper = min(lower + 1, len(ordered) - 1)
+            return ordered[lower] + (rank - lower) * (ordered[upper] - ordered[lower])
+        return self.heights[2]
+
+
+class StdDevAggregate:
+    def __init__(self):
+        self.moments = RunningMoments()
+
+    def step(self, value):
+        if value is not None:
+            self.moments.add(value)
+
+    def finalize(self):
+        return self.moments.std()
+
+
+class Log10MeanAggregate:
+    def __init__(self):
+        self.moments = RunningMoments()
+
+    def step(self, value):
+        if value is not None and value > 0:
+            self.moments.add(math.log10(value))
+
+    def finalize(self):
+        return self.moments.mean if self.moments.count else None
+
+
+class Log10StdDevAggregate(Log10MeanAggregate):
+    def finalize(self):
+        return self.moments.std()
+
+
+class QuantileAggregate:
+    def __init__(self):
+        self.estimator = None
+
+    def step(self, value, p):
+        if self.estimator is None:
+            self.estimator = P2Quantile(p)
+        if value is not None:
+            self.estimator.add(value)
+
+    def finalize(self):
+        return self.estimator.value() if self.estimator else None
+
+
+class HyperLogLog:
+    # 2^precision one-byte registers; standard error is about 1.04 / sqrt(2^precision), 1.6% at 12.
+    MASK = (1 << 64) - 1
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    @classmethod
+    def _hash(cls, value) -> int:
+        # splitmix64 finalizer over Python's hash, which is the identity for small ints.
+        x = (hash(value) + 0x9E3779B97F4A7C15) & cls.MASK
+        x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & cls.MASK
+        x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & cls.MASK
+        return x ^ (x >> 31)
+
+    def add(self, value):
+        x = self._hash(value)
+        index = x >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        rank = remaining_bits - (x & ((1 << remaining_bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+
+class ApproxDistinctAggregate:
+    def __init__(self):
+        self.sketch = HyperLogLog()
+
+    def step(self, value):
+        if value is not None:
+            self.sketch.add(value)
+
+    def finalize(self):
+        return self.sketch.estimate()
+
+
+class SummaryAggregate:
+    # Everything the threshold scripts used to compute with NumPy, from a single scan.
+    def __init__(self):
+        self.moments = RunningMoments()
+        self.log_moments = RunningMoments()
+        self.quantiles = [P2Quantile(p) for p in SUMMARY_QUANTILES]
+        self.minimum = None
+        self.maximum = None
+
+    def step(self, value):
+        if value is None:
+            return
+        self.moments.add(value)
+        if value > 0:
+            self.log_moments.add(math.log10(value))
+        for estimator in self.quantiles:
+            estimator.add(value)
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def finalize(self) -> str:
+        summary = {
+            'count': self.moments.count,
+            'mean': self.moments.mean if self.moments.count else None,
+            'std': self.moments.std(),
+            'min': self.minimum,
+            'max': self.maximum,
+            'log10_mean': self.log_moments.mean if self.log_moments.count else None,
+            'log10_std': self.log_moments.std()
+        }
+        for p, estimator in zip(SUMMARY_QUANTILES, self.quantiles):
+            summary[f"p{round(p * 100)}"] = estimator.value()
+        return json.dumps(summary)
+
+
+AGGREGATES = {
+    'stddev_pop': (1, StdDevAggregate),
+    'log10_mean': (1, Log10MeanAggregate),
+    'log10_stddev': (1, Log10StdDevAggregate),
+    'quantile': (2, QuantileAggregate),
+    'stat_summary': (1, SummaryAggregate),
+    'approx_distinct': (1, ApproxDistinctAggregate)
+}
+
+
+def register_aggregates(connection):
+    for name, (num_params, aggregate) in AGGREGATES.items():
+        connection.create_aggregate(name, num_params, aggregate)
+
+
+def popularity_thresholds(summary: Dict) -> Dict[str, float]:
+    # Same rounding as the original StatArtistPop.py, so the cut-offs match the published numbers.
+    mean = round(summary['mean'], 2)
+    std = round(summary['std'], 2)
+    return {
+        'popularity_mean': mean,
+        'popularity_std': std,
+        'popularity_p50': summary['p50'],
+        'popularity_p90': summary['p90'],
+        'popularity_low': round(mean - std, 2),
+        'popularity_high': round(mean + std, 2)
+    }
+
+
+def follower_thresholds(summary: Dict) -> Dict[str, float]:
+    # Same rounding as the original StatArtistFollower.py: cut-offs are taken in log10 space.
+    log_mean = round(summary['log10_mean'], 2)
+    log_std = round(summary['log10_std'], 2)
+    return {
+        'followers_mean': round(summary['mean'], 2),
+        'followers_log10_mean': log_mean,
+        'followers_log10_std': log_std,
+        'followers_p50': summary['p50'],
+        'followers_p90': summary['p90'],
+        'followers_low': int(10 ** round(log_mean - log_std, 2)),
+        'followers_high': int(10 ** round(log_mean + log_std, 2))
+    }
+
+
+def threshold_rows(popularity_summary: Optional[str], follower_summary: Optional[str]) -> List[tuple]:
+    # An aggregate over zero rows finalizes to NULL.
+    popularity = json.loads(popularity_summary) if popularity_summary else {'count': 0}
+    followers = json.loads(follower_summary) if follower_summary else {'count': 0}
+    values = {}
+    if popularity['count']:
+        values.update(popularity_thresholds(popularity))
+        values['emerging_min_popularity'] = values['popularity_high']
+    if followers['count']:
+        values.update(follower_thresholds(followers))
+        values['emerging_max_followers'] = values['followers_high']
+    return list(values.items())
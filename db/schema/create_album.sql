@@ -7,5 +7,7 @@ CREATE TABLE IF NOT EXISTS albums (
     total_tracks INTEGER,
     popularity INTEGER CHECK(popularity BETWEEN 0 AND 100),
     markets TEXT,
+    market_bits BLOB,
+    market_count INTEGER,
     album_uri TEXT
 );
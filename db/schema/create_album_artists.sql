@@ -0,0 +1,8 @@
+-- One row per credited artist of an album; albums.artist_id keeps them comma-joined in a single string.
+CREATE TABLE IF NOT EXISTS `album_artists` (
+    `album_id` TEXT NOT NULL,
+    `artist_id` TEXT NOT NULL,
+    PRIMARY KEY (`album_id`, `artist_id`)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_album_artists_artist ON album_artists(artist_id, album_id);
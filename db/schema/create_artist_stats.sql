@@ -0,0 +1,10 @@
+CREATE TABLE IF NOT EXISTS `artist_stats` (
+    `artist_id` TEXT PRIMARY KEY,
+    `track_count` INTEGER,
+    `album_count` INTEGER,
+    `playlist_count` INTEGER,
+    `genre_count` INTEGER,
+    `avg_track_popularity` REAL,
+    `avg_album_popularity` REAL,
+    `refreshed_at` INTEGER
+) WITHOUT ROWID;
@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS `etl_checkpoints` (
+    `entity` TEXT,
+    `chunk_key` TEXT,
+    `position` INTEGER,
+    `completed_at` TEXT,
+    PRIMARY KEY (`entity`, `chunk_key`)
+);
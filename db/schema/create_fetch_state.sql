@@ -0,0 +1,6 @@
+CREATE TABLE IF NOT EXISTS `fetch_state` (
+    `entity_type` TEXT,
+    `entity_id` TEXT,
+    `fetched_at` INTEGER,
+    PRIMARY KEY (`entity_type`, `entity_id`)
+) WITHOUT ROWID;
@@ -0,0 +1,18 @@
+CREATE TABLE IF NOT EXISTS `genre_dim` (
+    `genre_id` INTEGER PRIMARY KEY,
+    `genre` TEXT UNIQUE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS `artist_genres` (
+    `artist_id` TEXT NOT NULL,
+    `genre_id` INTEGER NOT NULL,
+    PRIMARY KEY (`artist_id`, `genre_id`)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_artist_genres_genre ON artist_genres(genre_id, artist_id);
+
+-- Keeps the old (artist_id, genre) shape for existing queries and workbooks.
+CREATE VIEW IF NOT EXISTS genres AS
+SELECT ag.artist_id, g.genre
+FROM artist_genres ag
+JOIN genre_dim g ON g.genre_id = ag.genre_id;
@@ -0,0 +1,17 @@
+-- Change-only series in the attached history database, which outlives full rebuilds of spotify.db.
+-- A row is written only when a value differs from the entity's latest one, keyed for "as of" seeks.
+CREATE TABLE IF NOT EXISTS history.`popularity_history` (
+    `entity_type` TEXT,
+    `entity_id` TEXT,
+    `observed_at` INTEGER,
+    `popularity` INTEGER,
+    PRIMARY KEY (`entity_type`, `entity_id`, `observed_at`)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS history.`followers_history` (
+    `entity_type` TEXT,
+    `entity_id` TEXT,
+    `observed_at` INTEGER,
+    `followers` INTEGER,
+    PRIMARY KEY (`entity_type`, `entity_id`, `observed_at`)
+) WITHOUT ROWID;
@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS `load_watermarks` (
+    `table_name` TEXT PRIMARY KEY,
+    `run_started_at` TEXT,
+    `last_loaded_at` TEXT,
+    `rows_seen` INTEGER,
+    `rows_written` INTEGER
+);
@@ -0,0 +1,17 @@
+-- market_bits holds bit market_id of each row's market set, little-endian (byte market_id / 8, bit market_id % 8).
+-- hex() prints the high nibble of each byte first, so the bit is read from the matching hex digit.
+CREATE VIEW IF NOT EXISTS track_markets AS
+SELECT t.track_id, m.country_code
+FROM tracks t
+JOIN markets m
+  ON ((instr('0123456789ABCDEF',
+             substr(hex(t.market_bits), (m.market_id / 8) * 2 + CASE WHEN m.market_id % 8 < 4 THEN 2 ELSE 1 END, 1)
+      ) - 1) >> (m.market_id % 4)) & 1 = 1;
+
+CREATE VIEW IF NOT EXISTS album_markets AS
+SELECT a.album_id, m.country_code
+FROM albums a
+JOIN markets m
+  ON ((instr('0123456789ABCDEF',
+             substr(hex(a.market_bits), (m.market_id / 8) * 2 + CASE WHEN m.market_id % 8 < 4 THEN 2 ELSE 1 END, 1)
+      ) - 1) >> (m.market_id % 4)) & 1 = 1;
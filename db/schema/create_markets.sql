@@ -0,0 +1,4 @@
+CREATE TABLE IF NOT EXISTS `markets` (
+    `market_id` INTEGER PRIMARY KEY,
+    `country_code` TEXT UNIQUE NOT NULL
+);
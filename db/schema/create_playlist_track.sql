@@ -5,4 +5,4 @@ CREATE TABLE IF NOT EXISTS `playlist_tracks` (
     PRIMARY KEY (`playlist_id`, `track_id`),
     FOREIGN KEY (`playlist_id`) REFERENCES `playlists`(`playlist_id`),
     FOREIGN KEY (`track_id`) REFERENCES `tracks`(`track_id`)
-);
+) WITHOUT ROWID;
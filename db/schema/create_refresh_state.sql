@@ -0,0 +1,10 @@
+CREATE TABLE IF NOT EXISTS `refresh_state` (
+    `entity_type` TEXT,
+    `entity_id` TEXT,
+    `popularity` INTEGER,
+    `followers` INTEGER,
+    -- Smoothed change per day between successive observations, on the 0-100 popularity scale.
+    `volatility` REAL,
+    `observed_at` INTEGER,
+    PRIMARY KEY (`entity_type`, `entity_id`)
+) WITHOUT ROWID;
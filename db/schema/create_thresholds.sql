@@ -0,0 +1,29 @@
+CREATE TABLE IF NOT EXISTS `thresholds` (
+    `name` TEXT PRIMARY KEY,
+    `value` REAL,
+    `source` TEXT CHECK(source IN ('computed', 'configured')),
+    `computed_at` TEXT
+);
+
+-- Famous cut-offs are editorial choices rather than statistics, so they are seeded once and never recomputed.
+INSERT OR IGNORE INTO thresholds (name, value, source) VALUES ('famous_min_popularity', 80, 'configured');
+INSERT OR IGNORE INTO thresholds (name, value, source) VALUES ('famous_min_followers', 5000000, 'configured');
+
+CREATE VIEW IF NOT EXISTS threshold_values AS
+SELECT
+    MAX(CASE WHEN name = 'emerging_min_popularity' THEN value END) AS emerging_min_popularity,
+    MAX(CASE WHEN name = 'emerging_max_followers' THEN value END) AS emerging_max_followers,
+    MAX(CASE WHEN name = 'famous_min_popularity' THEN value END) AS famous_min_popularity,
+    MAX(CASE WHEN name = 'famous_min_followers' THEN value END) AS famous_min_followers
+FROM thresholds;
+
+CREATE VIEW IF NOT EXISTS artist_categories AS
+SELECT
+    ar.artist_id,
+    CASE
+        WHEN ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers THEN 'Emerging'
+        WHEN ar.popularity >= tv.famous_min_popularity AND ar.followers >= tv.famous_min_followers THEN 'Famous'
+        ELSE 'Other'
+    END AS artist_category
+FROM artists ar
+CROSS JOIN threshold_values tv;
@@ -6,6 +6,8 @@ CREATE TABLE IF NOT EXISTS `tracks` (
 	`track_uri` TEXT,
 	`track_number` INTEGER,
 	`markets` TEXT,
+	`market_bits` BLOB,
+	`market_count` INTEGER,
 	`local` BOOLEAN,
 	`disc_number` INTEGER,
 	`explicit` BOOLEAN,
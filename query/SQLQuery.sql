@@ -1,65 +1,43 @@
 -- Artist Category
 SELECT 
-    CASE 
-        WHEN popularity >= 74.43 AND followers < 3388441 THEN 'Emerging'
-        WHEN popularity >= 80 AND followers >= 5000000 THEN 'Famous'
-        ELSE 'Other'
-    END AS artist_category,
+    c.artist_category,
     
-    CASE 
-        WHEN popularity >= 74.43 AND followers < 3388441 THEN 'High popularity (≥ 74.43) & Low followers (< 3,388,441)'
-        WHEN popularity >= 80 AND followers >= 5000000 THEN 'High popularity (≥ 80) & High followers (≥ 5,000,000)'
+    CASE c.artist_category
+        WHEN 'Emerging' THEN printf('High popularity (≥ %g) & Low followers (< %,d)',
+                                    tv.emerging_min_popularity, CAST(tv.emerging_max_followers AS INTEGER))
+        WHEN 'Famous' THEN printf('High popularity (≥ %g) & High followers (≥ %,d)',
+                                  tv.famous_min_popularity, CAST(tv.famous_min_followers AS INTEGER))
         ELSE 'Does not meet criteria for Emerging or Famous'
     END AS category_criteria,
     
     COUNT(*) AS artist_count
-FROM artists
-GROUP BY artist_category, category_criteria;
+FROM artist_categories c
+CROSS JOIN threshold_values tv
+GROUP BY c.artist_category, category_criteria;
 
 -- PopularityFollowerComparison
 SELECT 
-    CASE 
-        WHEN ar.popularity >= 74.43 AND ar.followers < 3388441 THEN 'Emerging'
-        WHEN ar.popularity >= 80 AND ar.followers >= 5000000 THEN 'Famous'
-        ELSE 'Other'
-    END AS artist_category,
+    c.artist_category,
     ROUND(AVG(ar.popularity), 2) AS avg_popularity,
     CAST(AVG(ar.followers) AS INTEGER) AS avg_followers
 FROM artists ar
-GROUP BY artist_category
-HAVING artist_category IN ('Emerging', 'Famous');
+JOIN artist_categories c ON ar.artist_id = c.artist_id
+GROUP BY c.artist_category
+HAVING c.artist_category IN ('Emerging', 'Famous');
 
 -- Overall Comparison
 SELECT 
-    artist_category,
-    ROUND(AVG(playlist_count), 2) AS avg_playlist_count,
-    ROUND(AVG(album_count), 2) AS avg_album_count,
-    ROUND(AVG(track_count), 2) AS avg_track_count,
-    ROUND(AVG(genre_count), 2) AS avg_genre_count,
-    ROUND(AVG(track_popularity), 2) AS avg_track_popularity,
-    ROUND(AVG(album_popularity), 2) AS avg_album_popularity
-FROM (
-    SELECT 
-        ar.artist_id,
-        COUNT(DISTINCT pt.playlist_id) AS playlist_count,
-        COUNT(DISTINCT al.album_id) AS album_count,
-        COUNT(DISTINCT t.track_id) AS track_count,
-        COUNT(DISTINCT g.genre) AS genre_count,
-        AVG(t.popularity) AS track_popularity,
-        AVG(al.popularity) AS album_popularity,
-        CASE 
-            WHEN ar.popularity >= 74.43 AND ar.followers < 3388441 THEN 'Emerging'
-            WHEN ar.popularity >= 80 AND ar.followers >= 5000000 THEN 'Famous'
-        END AS artist_category
-    FROM artists ar
-    LEFT JOIN tracks t ON ar.artist_id = t.artist_id
-    LEFT JOIN playlist_tracks pt ON t.track_id = pt.track_id
-    LEFT JOIN albums al ON ar.artist_id = al.artist_id
-    LEFT JOIN genres g ON ar.artist_id = g.artist_id
-    GROUP BY ar.artist_id
-) sub
-WHERE artist_category IS NOT NULL
-GROUP BY artist_category;
+    c.artist_category,
+    ROUND(AVG(s.playlist_count), 2) AS avg_playlist_count,
+    ROUND(AVG(s.album_count), 2) AS avg_album_count,
+    ROUND(AVG(s.track_count), 2) AS avg_track_count,
+    ROUND(AVG(s.genre_count), 2) AS avg_genre_count,
+    ROUND(AVG(s.avg_track_popularity), 2) AS avg_track_popularity,
+    ROUND(AVG(s.avg_album_popularity), 2) AS avg_album_popularity
+FROM artist_categories c
+JOIN artist_stats s ON c.artist_id = s.artist_id
+WHERE c.artist_category IN ('Emerging', 'Famous')
+GROUP BY c.artist_category;
 
 -- Followers Gap Comparison (Owner - Artist)
 SELECT 
@@ -68,22 +46,22 @@ SELECT
 
     -- Average followers of Emerging Artists in the playlist
     CAST(AVG(CASE 
-              WHEN ar.popularity >= 74.43 AND ar.followers < 3388441 THEN ar.followers 
+              WHEN ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers THEN ar.followers 
              END) AS INTEGER) AS avg_emerging_artist_follower,
 
     -- Average followers of Famous Artists in the playlist
     CAST(AVG(CASE 
-              WHEN ar.popularity >= 80 AND ar.followers >= 5000000 THEN ar.followers 
+              WHEN ar.popularity >= tv.famous_min_popularity AND ar.followers >= tv.famous_min_followers THEN ar.followers 
              END) AS INTEGER) AS avg_famous_artist_follower,
 
     -- Follower Gap: Owner - Emerging Artist
     CAST((u.followers - AVG(CASE 
-                WHEN ar.popularity >= 74.43 AND ar.followers < 3388441 THEN ar.followers 
+                WHEN ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers THEN ar.followers 
               END)) AS INTEGER) AS emerging_follower_gap,
 
     -- Follower Gap: Owner - Famous Artist
     CAST((u.followers - AVG(CASE 
-                WHEN ar.popularity >= 80 AND ar.followers >= 5000000 THEN ar.followers 
+                WHEN ar.popularity >= tv.famous_min_popularity AND ar.followers >= tv.famous_min_followers THEN ar.followers 
               END)) AS INTEGER) AS famous_follower_gap
 
 FROM playlists p
@@ -91,15 +69,16 @@ JOIN users u ON p.owner_id = u.user_id
 JOIN playlist_tracks pt ON p.playlist_id = pt.playlist_id
 JOIN tracks t ON pt.track_id = t.track_id
 JOIN artists ar ON t.artist_id = ar.artist_id
+CROSS JOIN threshold_values tv
 
 GROUP BY p.playlist_id
 HAVING 
     COUNT(CASE 
-             WHEN ar.popularity >= 74.43 AND ar.followers < 3388441 THEN 1 
+             WHEN ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers THEN 1 
           END) > 0
 AND 
     COUNT(CASE 
-             WHEN ar.popularity >= 80 AND ar.followers >= 5000000 THEN 1 
+             WHEN ar.popularity >= tv.famous_min_popularity AND ar.followers >= tv.famous_min_followers THEN 1 
           END) > 0
 
 ORDER BY p.playlist_name;
@@ -107,17 +86,18 @@ ORDER BY p.playlist_name;
 -- Album By Year Comparison
 SELECT 
     CASE 
-        WHEN ar.popularity >= 74.43 AND ar.followers < 3388441 THEN 'Emerging'
-        WHEN ar.popularity >= 80 AND ar.followers >= 5000000 THEN 'Famous'
+        WHEN ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers THEN 'Emerging'
+        WHEN ar.popularity >= tv.famous_min_popularity AND ar.followers >= tv.famous_min_followers THEN 'Famous'
     END AS artist_category,
     STRFTIME('%Y', al.release_date) AS year,
     COUNT(DISTINCT al.album_id) AS album_count
 FROM albums al
 JOIN artists ar ON al.artist_id = ar.artist_id
+CROSS JOIN threshold_values tv
 WHERE STRFTIME('%Y', al.release_date) IS NOT NULL
   AND (
-        (ar.popularity >= 74.43 AND ar.followers < 3388441)
-     OR (ar.popularity >= 80 AND ar.followers >= 5000000)
+        (ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers)
+     OR (ar.popularity >= tv.famous_min_popularity AND ar.followers >= tv.famous_min_followers)
   )
 GROUP BY artist_category, year
 ORDER BY year DESC;
@@ -125,8 +105,8 @@ ORDER BY year DESC;
 -- Popularity By Year Comparison
 SELECT 
     CASE 
-        WHEN ar.popularity >= 74.43 AND ar.followers < 3388441 THEN 'Emerging'
-        WHEN ar.popularity >= 80 AND ar.followers >= 5000000 THEN 'Famous'
+        WHEN ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers THEN 'Emerging'
+        WHEN ar.popularity >= tv.famous_min_popularity AND ar.followers >= tv.famous_min_followers THEN 'Famous'
     END AS artist_category,
     STRFTIME('%Y', al.release_date) AS year,
     ROUND(AVG(ar.popularity), 2) AS avg_artist_popularity
@@ -136,11 +116,13 @@ JOIN (
     SELECT 
         artist_id,
         CASE 
-            WHEN popularity >= 74.43 AND followers < 3388441 THEN 'Emerging'
-            WHEN popularity >= 80 AND followers >= 5000000 THEN 'Famous'
+            WHEN popularity >= tv.emerging_min_popularity AND followers < tv.emerging_max_followers THEN 'Emerging'
+            WHEN popularity >= tv.famous_min_popularity AND followers >= tv.famous_min_followers THEN 'Famous'
         END AS artist_category
     FROM artists
+    CROSS JOIN threshold_values tv
 ) cat ON ar.artist_id = cat.artist_id
+CROSS JOIN threshold_values tv
 WHERE year IS NOT NULL
   AND artist_category IS NOT NULL
 GROUP BY artist_category, year
@@ -149,17 +131,18 @@ ORDER BY year DESC;
 -- Followers By Year Comparison
 SELECT 
     CASE 
-        WHEN ar.popularity >= 74.43 AND ar.followers < 3388441 THEN 'Emerging'
-        WHEN ar.popularity >= 80 AND ar.followers >= 5000000 THEN 'Famous'
+        WHEN ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers THEN 'Emerging'
+        WHEN ar.popularity >= tv.famous_min_popularity AND ar.followers >= tv.famous_min_followers THEN 'Famous'
     END AS artist_category,
     STRFTIME('%Y', al.release_date) AS year,
     CAST(AVG(ar.followers) AS INTEGER) AS avg_artist_followers
 FROM artists ar
 JOIN albums al ON ar.artist_id = al.artist_id
+CROSS JOIN threshold_values tv
 WHERE STRFTIME('%Y', al.release_date) IS NOT NULL
   AND (
-        (ar.popularity >= 74.43 AND ar.followers < 3388441) OR
-        (ar.popularity >= 80 AND ar.followers >= 5000000)
+        (ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers) OR
+        (ar.popularity >= tv.famous_min_popularity AND ar.followers >= tv.famous_min_followers)
       )
 GROUP BY artist_category, year
 ORDER BY year DESC;
@@ -167,8 +150,8 @@ ORDER BY year DESC;
 -- Track By Year Comparison
 SELECT 
     CASE 
-        WHEN ar.popularity >= 74.43 AND ar.followers < 3388441 THEN 'Emerging'
-        WHEN ar.popularity >= 80 AND ar.followers >= 5000000 THEN 'Famous'
+        WHEN ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers THEN 'Emerging'
+        WHEN ar.popularity >= tv.famous_min_popularity AND ar.followers >= tv.famous_min_followers THEN 'Famous'
     END AS artist_category,
     STRFTIME('%Y', al.release_date) AS year,
     CAST(AVG(track_counts.track_count) AS INTEGER) AS avg_track_count
@@ -181,16 +164,88 @@ JOIN (
     FROM tracks t
     GROUP BY t.artist_id
 ) track_counts ON ar.artist_id = track_counts.artist_id
+CROSS JOIN threshold_values tv
 WHERE STRFTIME('%Y', al.release_date) IS NOT NULL
   AND (
-        (ar.popularity >= 74.43 AND ar.followers < 3388441) OR
-        (ar.popularity >= 80 AND ar.followers >= 5000000)
+        (ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers) OR
+        (ar.popularity >= tv.famous_min_popularity AND ar.followers >= tv.famous_min_followers)
       )
 GROUP BY artist_category, year
 ORDER BY year DESC;
 
+-- Follower Trend Last 30 Days
+WITH window_start AS (
+    -- The value as of the window start is one backward seek on the history primary key per artist.
+    SELECT
+        ar.artist_id,
+        ar.followers,
+        (SELECT h.followers FROM history.followers_history h
+         WHERE h.entity_type = 'artists' AND h.entity_id = ar.artist_id
+           AND h.observed_at <= CAST(STRFTIME('%s', 'now', '-30 days') AS INTEGER)
+         ORDER BY h.observed_at DESC LIMIT 1) AS followers_then
+    FROM artists ar
+)
+SELECT
+    c.artist_category,
+    COUNT(*) AS artist_count,
+    CAST(AVG(ws.followers - ws.followers_then) AS INTEGER) AS avg_follower_gain,
+    ROUND(AVG(100.0 * (ws.followers - ws.followers_then) / MAX(ws.followers_then, 1)), 2) AS avg_follower_growth_pct
+FROM window_start ws
+JOIN artist_categories c ON ws.artist_id = c.artist_id
+WHERE ws.followers_then IS NOT NULL
+GROUP BY c.artist_category;
+
+-- Popularity Trend Last 30 Days
+WITH window_start AS (
+    SELECT
+        ar.artist_id,
+        ar.popularity,
+        (SELECT h.popularity FROM history.popularity_history h
+         WHERE h.entity_type = 'artists' AND h.entity_id = ar.artist_id
+           AND h.observed_at <= CAST(STRFTIME('%s', 'now', '-30 days') AS INTEGER)
+         ORDER BY h.observed_at DESC LIMIT 1) AS popularity_then
+    FROM artists ar
+)
+SELECT
+    c.artist_category,
+    COUNT(*) AS artist_count,
+    ROUND(AVG(ws.popularity - ws.popularity_then), 2) AS avg_popularity_change,
+    SUM(ws.popularity > ws.popularity_then) AS rising_count,
+    SUM(ws.popularity < ws.popularity_then) AS falling_count
+FROM window_start ws
+JOIN artist_categories c ON ws.artist_id = c.artist_id
+WHERE ws.popularity_then IS NOT NULL
+GROUP BY c.artist_category;
+
+-- Emerging Artist Monthly Followers
+WITH RECURSIVE months(month_start) AS (
+    SELECT DATE('now', 'start of month', '-11 months')
+    UNION ALL
+    SELECT DATE(month_start, '+1 month') FROM months WHERE month_start < DATE('now', 'start of month')
+),
+monthly AS (
+    -- Each month's value is the last change recorded before the month ended.
+    SELECT
+        m.month_start,
+        (SELECT h.followers FROM history.followers_history h
+         WHERE h.entity_type = 'artists' AND h.entity_id = c.artist_id
+           AND h.observed_at < CAST(STRFTIME('%s', m.month_start, '+1 month') AS INTEGER)
+         ORDER BY h.observed_at DESC LIMIT 1) AS followers
+    FROM months m
+    CROSS JOIN artist_categories c
+    WHERE c.artist_category = 'Emerging'
+)
+SELECT
+    STRFTIME('%Y-%m', month_start) AS month,
+    COUNT(followers) AS artist_count,
+    CAST(AVG(followers) AS INTEGER) AS avg_followers
+FROM monthly
+GROUP BY month_start
+ORDER BY month_start;
+
 -------------------------------------------------------------------------------------------------------------
-WITH artist_stats AS (
+-- EArtist Metrics
+WITH artist_metrics AS (
     SELECT 
         ar.artist_id,
         ar.artist_name,
@@ -205,7 +260,8 @@ WITH artist_stats AS (
     LEFT JOIN tracks t ON ar.artist_id = t.artist_id
     LEFT JOIN albums al ON ar.artist_id = al.artist_id
     LEFT JOIN playlist_tracks pt ON t.track_id = pt.track_id
-    WHERE ar.popularity >= 74.43 AND ar.followers < 3388441
+    CROSS JOIN threshold_values tv
+    WHERE ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers
     GROUP BY ar.artist_id, ar.artist_name, ar.popularity, ar.followers
 ),
 avg_stats AS (
@@ -217,7 +273,7 @@ avg_stats AS (
         AVG(playlist_count) AS avg_playlist_count,
         AVG(track_popularity) AS avg_track_popularity,
         AVG(album_popularity) AS avg_album_popularity
-    FROM artist_stats
+    FROM artist_metrics
 ),
 artist_with_flags AS (
     SELECT 
@@ -264,7 +320,7 @@ artist_with_flags AS (
              AND a.popularity > avg.avg_artist_popularity
             THEN 'Yes' ELSE 'No'
         END AS top_by_all_rate
-    FROM artist_stats a
+    FROM artist_metrics a
     CROSS JOIN avg_stats avg
 ),
 final_output AS (
@@ -293,7 +349,8 @@ WITH emerging_artists AS (
         ar.popularity,
         ar.followers
     FROM artists ar
-    WHERE ar.popularity >= 74.43 AND ar.followers < 3388441
+    CROSS JOIN threshold_values tv
+    WHERE ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers
 )
 
 SELECT 
@@ -312,7 +369,8 @@ WITH qualified_emerging_artists AS (
         artist_id,
         artist_name
     FROM artists
-    WHERE popularity >= 74.43 AND followers < 3388441
+    CROSS JOIN threshold_values tv
+    WHERE popularity >= tv.emerging_min_popularity AND followers < tv.emerging_max_followers
 ),
 
 tracks_with_popularity AS (
@@ -407,22 +465,25 @@ SELECT
     ar.artist_name,
     ar.popularity AS artist_popularity,
     ar.followers AS artist_followers,
-    GROUP_CONCAT(DISTINCT g.genre) AS genres,  
-    COUNT(DISTINCT al.album_id) AS album_count,
-    COUNT(DISTINCT tr.track_id) AS track_count,
-    COUNT(DISTINCT pt.playlist_id) AS playlist_count
+    (SELECT GROUP_CONCAT(g.genre)
+     FROM artist_genres ag
+     JOIN genre_dim g ON ag.genre_id = g.genre_id
+     WHERE ag.artist_id = ar.artist_id) AS genres,
+    s.album_count,
+    s.track_count,
+    s.playlist_count
 
 FROM artists ar
 
-INNER JOIN genres g ON ar.artist_id = g.artist_id
-INNER JOIN albums al ON ar.artist_id = al.artist_id
-INNER JOIN tracks tr ON ar.artist_id = tr.artist_id
-INNER JOIN playlist_tracks pt ON tr.track_id = pt.track_id
+INNER JOIN artist_stats s ON ar.artist_id = s.artist_id
+CROSS JOIN threshold_values tv
 
-WHERE ar.popularity >= 74.43 
-  AND ar.followers < 3388441
+WHERE ar.popularity >= tv.emerging_min_popularity 
+  AND ar.followers < tv.emerging_max_followers
+  AND s.genre_count > 0
+  AND s.album_count > 0
+  AND s.playlist_count > 0
 
-GROUP BY ar.artist_id
 ORDER BY ar.popularity DESC;
 
 --  Genres By Emerging Artists
@@ -433,8 +494,9 @@ SELECT
     CAST(AVG(ar.followers) AS INTEGER) AS avg_followers
 FROM artists ar
 JOIN genres g ON ar.artist_id = g.artist_id
-WHERE ar.popularity >= 74.43
-  AND ar.followers < 3388441
+CROSS JOIN threshold_values tv
+WHERE ar.popularity >= tv.emerging_min_popularity
+  AND ar.followers < tv.emerging_max_followers
 GROUP BY g.genre
 ORDER BY artist_count DESC;
 
@@ -444,7 +506,8 @@ SELECT
     COUNT(DISTINCT a.album_id) AS album_count
 FROM albums a
 JOIN artists ar ON a.artist_id = ar.artist_id
-WHERE ar.popularity >= 74.43 AND ar.followers < 3388441
+CROSS JOIN threshold_values tv
+WHERE ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers
 GROUP BY release_year
 ORDER BY release_year;
 
@@ -455,7 +518,8 @@ SELECT
     COUNT(DISTINCT a.album_id) AS album_count
 FROM albums a
 JOIN artists ar ON a.artist_id = ar.artist_id
-WHERE ar.popularity >= 74.43 AND ar.followers < 3388441
+CROSS JOIN threshold_values tv
+WHERE ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers
 GROUP BY ar.artist_id, release_year
 ORDER BY ar.artist_name, release_year;
 
@@ -468,7 +532,8 @@ SELECT
 FROM artists ar
 LEFT JOIN tracks t ON ar.artist_id = t.artist_id
 INNER JOIN albums al ON ar.artist_id = al.artist_id
-WHERE ar.popularity >= 74.43 AND ar.followers < 3388441
+CROSS JOIN threshold_values tv
+WHERE ar.popularity >= tv.emerging_min_popularity AND ar.followers < tv.emerging_max_followers
 GROUP BY ar.artist_id
 ORDER BY avg_track_popularity DESC;
 
@@ -486,8 +551,9 @@ FROM tracks t
 JOIN artists ar ON t.artist_id = ar.artist_id
 JOIN genres g ON ar.artist_id = g.artist_id
 LEFT JOIN playlist_tracks pt ON t.track_id = pt.track_id
-WHERE ar.popularity >= 74.43
-  AND ar.followers < 3388441
+CROSS JOIN threshold_values tv
+WHERE ar.popularity >= tv.emerging_min_popularity
+  AND ar.followers < tv.emerging_max_followers
 GROUP BY t.track_id
 ORDER BY t.popularity DESC
 LIMIT 10;
@@ -502,8 +568,9 @@ SELECT
 FROM albums al
 JOIN tracks t ON al.album_id = t.album_id
 JOIN artists ar ON t.artist_id = ar.artist_id
-WHERE ar.popularity >= 74.43
-  AND ar.followers < 3388441
+CROSS JOIN threshold_values tv
+WHERE ar.popularity >= tv.emerging_min_popularity
+  AND ar.followers < tv.emerging_max_followers
 GROUP BY al.album_id
 ORDER BY al.popularity DESC
 LIMIT 10;
@@ -0,0 +1,158 @@
+import argparse
+import json
+import logging
+import re
+import sqlite3
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+QUERY_FILE = Path(__file__).resolve().parent / "SQLQuery.sql"
+BASELINE_FILE = Path(__file__).resolve().parent / "plan_baseline.json"
+# "SCAN t" with no index is a full table scan; "SCAN t USING [COVERING] INDEX ..." is not.
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+SUBQUERY = re.compile(r'^(?:MATERIALIZE|CO-ROUTINE) (\w+)')
+TABLE_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+# Tables the reports reach through DatabaseManager's managed indexes; a full scan of one means an index went unused.
+INDEXED_JOIN_TABLES = ('tracks', 'albums', 'playlist_tracks', 'playlists')
+
+
+def parse_blocks(path: Path) -> List[Tuple[str, str]]:
+    # A block is one statement named by the "-- Name" comment right above it.
+    blocks = []
+    name = None
+    lines = []
+    for line in path.read_text(encoding='utf-8').splitlines():
+        stripped = line.strip()
+        if not lines:
+            if stripped.startswith('--'):
+                label = stripped.strip('-').strip()
+                if label:
+                    name = label
+                continue
+            if not stripped:
+                continue
+        lines.append(line)
+        statement = '\n'.join(lines)
+        if sqlite3.complete_statement(statement):
+            name = name or f"block_{len(blocks) + 1}"
+            if any(existing == name for existing, _ in blocks):
+                name = f"{name} ({len(blocks) + 1})"
+            blocks.append((name, statement.strip()))
+            name = None
+            lines = []
+    return blocks
+
+
+def full_scans(connection: sqlite3.Connection, sql: str) -> List[str]:
+    plan = [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+    subqueries = {match.group(1) for match in map(SUBQUERY.match, plan) if match}
+    scans = [match.group(1) for match in map(FULL_SCAN.match, plan) if match]
+    return sorted(scan for scan in scans if scan not in subqueries)
+
+
+def scanned_tables(sql: str, scans: List[str]) -> List[str]:
+    # Plans name tables by alias, so aliases are mapped back through the FROM and JOIN clauses.
+    tables = {}
+    for table, alias in TABLE_ALIAS.findall(sql):
+        tables[table] = table
+        if alias and alias.upper() not in ('ON', 'WHERE', 'JOIN', 'LEFT', 'CROSS', 'INNER', 'GROUP', 'ORDER'):
+            tables[alias] = table
+    return sorted({tables.get(scan, scan) for scan in scans})
+
+
+def unindexed_scans(results: Dict[str, Dict]) -> List[str]:
+    return [f"{name}: full scan of {table} with no baseline to accept it"
+            for name, current in results.items()
+            for table in current['scanned_tables'] if table in INDEXED_JOIN_TABLES]
+
+
+def time_query(connection: sqlite3.Connection, sql: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        connection.execute(sql).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def profile(db_path: str, query_file: Path, repeat: int) -> Dict[str, Dict]:
+    connection = sqlite3.connect(f"file:{Path(db_path).resolve()}?mode=ro", uri=True)
+    # The trend reports read the change-only series kept beside the database by DatabaseManager.
+    history_path = Path(db_path).resolve().parent / "history.db"
+    if history_path.exists():
+        connection.execute("ATTACH DATABASE ? AS history", (f"file:{history_path}?mode=ro",))
+    results = {}
+    try:
+        for name, sql in parse_blocks(query_file):
+            scans = full_scans(connection, sql)
+            results[name] = {
+                'full_scans': scans,
+                'scanned_tables': scanned_tables(sql, scans),
+                'median_ms': round(time_query(connection, sql, repeat), 3)
+            }
+    finally:
+        connection.close()
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float,
+            min_delta_ms: float) -> List[str]:
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            logging.info(f"{name}: {current['median_ms']:.1f} ms, no baseline")
+            continue
+        new_scans = sorted(set(current['full_scans']) - set(previous['full_scans']))
+        if new_scans:
+            regressions.append(f"{name}: new full scan of {', '.join(new_scans)}")
+        # The committed baseline holds plans only; timings are compared once a local run has recorded them.
+        if previous.get('median_ms') is None:
+            logging.info(f"{name}: {current['median_ms']:.1f} ms, no baseline timing")
+            continue
+        slowdown = current['median_ms'] - previous['median_ms']
+        if slowdown > min_delta_ms and current['median_ms'] > previous['median_ms'] * (1 + threshold):
+            regressions.append(f"{name}: {previous['median_ms']:.1f} ms -> {current['median_ms']:.1f} ms")
+        logging.info(f"{name}: {current['median_ms']:.1f} ms (baseline {previous['median_ms']:.1f} ms)")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check query plans and timings of the SQLQuery.sql reports")
+    parser.add_argument('--db-path', default="spotify_db/spotify.db")
+    parser.add_argument('--queries', type=Path, default=QUERY_FILE)
+    parser.add_argument('--baseline', type=Path, default=BASELINE_FILE)
+    parser.add_argument('--repeat', type=int, default=3, help="runs per query; the median is compared")
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help="allowed slowdown as a fraction of the baseline time")
+    parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                        help="slowdowns smaller than this are treated as noise")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="write the current plans and timings as the new baseline")
+    parser.add_argument('--plans-only', action='store_true',
+                        help="with --update-baseline, leave the timings out so the baseline holds on any machine")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    results = profile(args.db_path, args.queries, args.repeat)
+
+    if args.update_baseline:
+        if args.plans_only:
+            results = {name: {**current, 'median_ms': None} for name, current in results.items()}
+        args.baseline.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+        logging.info(f"Wrote baseline for {len(results)} queries to {args.baseline}")
+        sys.exit(0)
+
+    baseline = json.loads(args.baseline.read_text(encoding='utf-8')) if args.baseline.exists() else {}
+    if not baseline:
+        logging.warning(f"No baseline at {args.baseline}; run with --update-baseline first")
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    if not baseline:
+        # Nothing is compared on a fresh checkout, but a scan of an indexed join table is never acceptable.
+        regressions += unindexed_scans(results)
+    for regression in regressions:
+        logging.error(f"Regression: {regression}")
+    sys.exit(1 if regressions else 0)
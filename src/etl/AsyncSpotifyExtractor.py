@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+import aiohttp
+from typing import Optional, Dict, List, Callable, Iterable
+from SpotifyExtractor import SpotifyExtractor
+from CredentialPool import Credential
+from Metrics import metrics, endpoint_label
+from HttpSession import create_async_session, API_BASE_URL
+from ResponseCache import ResponseCache
+
+
+class AsyncSpotifyExtractor(SpotifyExtractor):
+    def __init__(self, concurrency: int = 8, cache: Optional[ResponseCache] = None):
+        super().__init__(cache, page_concurrency=concurrency)
+        self.concurrency = concurrency
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        self._session = create_async_session(self.concurrency)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+        self._session = None
+
+    @staticmethod
+    async def _get_access_token_async(credential: Credential) -> Optional[str]:
+        # Token refreshes are rare, so the blocking client is reused off the event loop.
+        if credential.token_valid():
+            return credential.access_token
+        return await asyncio.to_thread(credential.get_access_token)
+
+    async def make_request_async(self, endpoint: str, retries: int = 10, backoff: float = 1.0) -> Optional[Dict]:
+        label = endpoint_label(endpoint)
+        cached = self.cache.lookup(endpoint) if self.cache else None
+        if cached and cached.fresh:
+            return self._parse(label, cached.body)
+
+        for attempt in range(retries):
+            try:
+                async with self._semaphore:
+                    credential = await self.credentials.acquire_async()
+                    headers = {'Authorization': f'Bearer {await self._get_access_token_async(credential)}'}
+                    if cached and cached.etag:
+                        headers['If-None-Match'] = cached.etag
+                    started = time.perf_counter()
+                    async with self._session.get(
+                        f'{API_BASE_URL}/{endpoint}',
+                        headers=headers,
+                        timeout=aiohttp.ClientTimeout(total=15)
+                    ) as response:
+                        body = await response.read()
+                        self._record_response(label, response.status, time.perf_counter() - started, len(body))
+
+                        if response.status == 200:
+                            self.credentials.on_success(credential)
+                            if self.cache:
+                                self.cache.store(endpoint, body, response.headers.get('ETag'))
+                            return self._parse(label, body)
+
+                        elif response.status == 304 and cached:
+                            self.credentials.on_success(credential)
+                            self.cache.mark_revalidated(endpoint)
+                            return self._parse(label, cached.body)
+
+                        elif response.status == 401:
+                            logging.warning(f"Unauthorized for {endpoint}. Refreshing token and retrying...")
+                            self._record_retry(label, 'unauthorized')
+                            credential.invalidate()
+                            continue
+
+                        elif response.status == 429:
+                            retry_after = int(response.headers.get("Retry-After", "5"))
+                            logging.warning(f"Rate limited for {endpoint}, retrying after {retry_after} seconds...")
+                            self._record_retry(label, 'rate_limited', retry_after)
+                            self.credentials.on_rate_limited(credential, retry_after)
+                            continue
+
+                        else:
+                            logging.error(f"API error {response.status} for {endpoint}: "
+                                          f"{body.decode('utf-8', errors='replace')}")
+                            return None
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.warning(f"Attempt {attempt + 1}/{retries} failed for {endpoint}: {e}")
+                self._record_retry(label, 'network')
+                delay = backoff * (2 ** attempt)
+                metrics.inc('spotify_sleep_seconds_total', delay, reason='backoff')
+                await asyncio.sleep(delay)
+                continue
+
+        logging.error(f"Exceeded max retries for {endpoint}")
+        return None
+
+    async def _stream_chunks(self, chunks: Iterable[List[str]], resource: str,
+                             parse: Callable[[Dict], List[Dict]],
+                             on_records: Callable[[str, List[str], List[Dict]], None]):
+        # A fixed set of workers pulls from one shared iterator, so only `concurrency`
+        # chunks are ever materialized regardless of how many IDs are queued.
+        iterator = iter(chunks)
+
+        async def worker():
+            for chunk in iterator:
+                data = await self.make_request_async(f"{resource}?ids={','.join(chunk)}")
+                # Failed requests are reported too, as an empty result, so the chunk is recorded as failed.
+                on_records(resource, chunk, parse(data) if data else [])
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+    async def _stream_entities(self, album_chunks: Iterable[List[str]], artist_chunks: Iterable[List[str]],
+                               track_chunks: Iterable[List[str]],
+                               on_records: Callable[[str, List[str], List[Dict]], None]):
+        async with self:
+            await asyncio.gather(
+                self._stream_chunks(album_chunks, 'albums', self._parse_albums_batch, on_records),
+                self._stream_chunks(artist_chunks, 'artists', self._parse_artists_batch, on_records),
+                self._stream_chunks(track_chunks, 'tracks', self._parse_tracks_batch, on_records)
+            )
+
+    def stream_entities(self, album_chunks: Iterable[List[str]], artist_chunks: Iterable[List[str]],
+                        track_chunks: Iterable[List[str]], on_records: Callable[[str, List[str], List[Dict]], None]):
+        asyncio.run(self._stream_entities(album_chunks, artist_chunks, track_chunks, on_records))
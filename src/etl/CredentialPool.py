@@ -0,0 +1,130 @@
+import base64
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+from RateLimiter import AdaptiveRateLimiter
+from HttpSession import get_session, TOKEN_URL
+from Metrics import metrics
+
+
+class Credential:
+    def __init__(self, client_id: str, client_secret: str, target_rps: float):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.limiter = AdaptiveRateLimiter(target_rps=target_rps, name=f"client {client_id[:8]}")
+        self.access_token = None
+        self.token_expiry = None
+        self.requests = 0
+        self.rate_limited = 0
+        self.disabled = False
+        self._lock = threading.Lock()
+
+    def token_valid(self) -> bool:
+        return bool(self.access_token) and datetime.now() < self.token_expiry
+
+    def get_access_token(self) -> Optional[str]:
+        with self._lock:
+            if self.token_valid():
+                return self.access_token
+
+            auth_string = f"{self.client_id}:{self.client_secret}"
+            auth_base64 = base64.b64encode(auth_string.encode('utf-8')).decode('utf-8')
+            headers = {
+                'Authorization': f'Basic {auth_base64}',
+                'Content-Type': 'application/x-www-form-urlencoded'
+            }
+            data = {'grant_type': 'client_credentials'}
+
+            try:
+                metrics.inc('spotify_token_refreshes_total')
+                response = get_session().post(TOKEN_URL,
+                                              headers=headers, data=data, timeout=10)
+                response.raise_for_status()
+                token_data = response.json()
+                self.access_token = token_data['access_token']
+                self.token_expiry = datetime.now() + timedelta(seconds=token_data['expires_in'] - 60)
+                return self.access_token
+            except Exception as e:
+                logging.error(f"Error getting access token for client {self.client_id[:8]}: {str(e)}")
+                return None
+
+    def invalidate(self):
+        with self._lock:
+            self.access_token = None
+
+
+class CredentialPool:
+    # Each registered app has its own token and rate budget; requests go to the key that can send soonest.
+    def __init__(self, credentials: List[Tuple[str, str]], target_rps: float = 5.0):
+        if not credentials:
+            raise ValueError("CredentialPool needs at least one client ID/secret pair")
+        self.credentials = [Credential(client_id, client_secret, target_rps)
+                            for client_id, client_secret in credentials]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'CredentialPool':
+        # CLIENT_ID/CLIENT_SECRET plus any numbered pairs: CLIENT_ID_2/CLIENT_SECRET_2, CLIENT_ID_3, ...
+        load_dotenv()
+        credentials = []
+        if os.getenv("CLIENT_ID"):
+            credentials.append((os.getenv("CLIENT_ID"), os.getenv("CLIENT_SECRET")))
+        index = 2
+        while os.getenv(f"CLIENT_ID_{index}"):
+            credentials.append((os.getenv(f"CLIENT_ID_{index}"), os.getenv(f"CLIENT_SECRET_{index}")))
+            index += 1
+        return cls(credentials, target_rps=float(os.getenv("SPOTIFY_TARGET_RPS", "5")))
+
+    @property
+    def active(self) -> List[Credential]:
+        return [credential for credential in self.credentials if not credential.disabled]
+
+    @property
+    def rate(self) -> float:
+        return sum(credential.limiter.rate for credential in self.active)
+
+    def authenticate(self) -> Optional[str]:
+        # Keys that cannot obtain a token are dropped from rotation instead of failing every request.
+        token = None
+        for credential in self.credentials:
+            credential_token = credential.get_access_token()
+            if credential_token:
+                token = token or credential_token
+            else:
+                credential.disabled = True
+        logging.info(f"Credential pool: {len(self.active)} of {len(self.credentials)} clients authenticated")
+        return token
+
+    def _select(self) -> Credential:
+        with self._lock:
+            # A key paused by a 429 reports a long wait, so it drops out of rotation until its pause ends.
+            credential = min(self.active or self.credentials,
+                             key=lambda candidate: (candidate.limiter.wait_time(), candidate.requests))
+            credential.requests += 1
+            return credential
+
+    def acquire(self) -> Credential:
+        credential = self._select()
+        credential.limiter.acquire()
+        return credential
+
+    async def acquire_async(self) -> Credential:
+        credential = self._select()
+        await credential.limiter.acquire_async()
+        return credential
+
+    def on_success(self, credential: Credential):
+        credential.limiter.on_success()
+
+    def on_rate_limited(self, credential: Credential, retry_after: float):
+        credential.rate_limited += 1
+        credential.limiter.on_rate_limited(retry_after)
+
+    def log_stats(self):
+        for credential in self.credentials:
+            state = "disabled" if credential.disabled else f"{credential.limiter.rate:.2f} req/s"
+            logging.info(f"Client {credential.client_id[:8]}: {credential.requests} requests, "
+                         f"{credential.rate_limited} rate limited, {state}")
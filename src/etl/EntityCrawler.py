@@ -0,0 +1,81 @@
+import logging
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+from SpotifyExtractor import SpotifyExtractor
+from RequestPlanner import RequestPlanner
+
+
+class EntityCrawler:
+    # Seed playlists are depth 0. Their tracks, albums and artists are depth 1.
+    # Albums and artists below max_depth are expanded into their own tracks and albums.
+    def __init__(self, extractor: SpotifyExtractor, planner: RequestPlanner, max_depth: int = 1,
+                 max_requests: Optional[int] = None):
+        self.extractor = extractor
+        self.planner = planner
+        self.max_depth = max_depth
+        self.max_requests = max_requests
+        self.requests_used = 0
+        self.frontier = deque()
+        self.discovered = {'tracks': 0, 'albums': 0, 'artists': 0}
+
+    def _plan(self, entity: str, ids: List[str], depth: int) -> bool:
+        new_ids = self.planner.discover(entity, ids)
+        self.discovered[entity] += len(new_ids)
+        if depth < self.max_depth and entity in ('albums', 'artists'):
+            self.frontier.extend((entity, entity_id, depth) for entity_id in new_ids)
+        return bool(new_ids)
+
+    def discover_tracks(self, tracks: List[Dict], depth: int = 1) -> List[str]:
+        # Tracks from crawl-field playlist pages already carry their album and artist IDs.
+        touched = []
+        if self._plan('tracks', [track.get('track_id') for track in tracks], depth):
+            touched.append('tracks')
+        if self._plan('albums', [track.get('album_id') for track in tracks], depth):
+            touched.append('albums')
+        artist_ids = [artist_id for track in tracks for artist_id in track.get('artist_ids', [])]
+        if self._plan('artists', artist_ids, depth):
+            touched.append('artists')
+        return touched
+
+    def _budget_left(self) -> bool:
+        return self.max_requests is None or self.requests_used < self.max_requests
+
+    def _expand_album(self, album_id: str, depth: int) -> List[str]:
+        data = self.extractor.make_request(f'albums/{album_id}/tracks?limit=50')
+        self.requests_used += 1
+        if not data:
+            return []
+        items = [item for item in data.get('items', []) if item]
+        touched = []
+        if self._plan('tracks', [item.get('id') for item in items], depth + 1):
+            touched.append('tracks')
+        artist_ids = [artist.get('id') for item in items for artist in item.get('artists', []) if artist]
+        if self._plan('artists', artist_ids, depth + 1):
+            touched.append('artists')
+        return touched
+
+    def _expand_artist(self, artist_id: str, depth: int) -> List[str]:
+        data = self.extractor.make_request(f'artists/{artist_id}/albums?include_groups=album,single&limit=50')
+        self.requests_used += 1
+        if not data:
+            return []
+        items = [item for item in data.get('items', []) if item]
+        touched = []
+        if self._plan('albums', [item.get('id') for item in items], depth + 1):
+            touched.append('albums')
+        return touched
+
+    def expand(self) -> Iterator[str]:
+        # Yields each entity type as soon as new IDs of that type have been planned.
+        while self.frontier and self._budget_left():
+            entity, entity_id, depth = self.frontier.popleft()
+            expand = self._expand_album if entity == 'albums' else self._expand_artist
+            yield from expand(entity_id, depth)
+        if self.frontier:
+            logging.info(f"Crawl budget of {self.max_requests} requests reached with {len(self.frontier)} "
+                         f"entities left unexpanded")
+        self.frontier.clear()
+
+    def log_summary(self):
+        logging.info(f"Crawl discovered {self.discovered['tracks']} tracks, {self.discovered['albums']} albums "
+                     f"and {self.discovered['artists']} artists using {self.requests_used} expansion requests")
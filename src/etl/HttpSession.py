@@ -0,0 +1,111 @@
+import logging
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from typing import Dict
+
+# Overridable so the extractors can be pointed at a local stand-in (support/benchmark/mock_spotify_api.py).
+API_BASE_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com/v1").rstrip('/')
+TOKEN_URL = os.getenv("SPOTIFY_TOKEN_URL", "https://accounts.spotify.com/api/token")
+
+DEFAULT_HEADERS = {
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive'
+}
+
+
+class ConnectionStats:
+    def __init__(self):
+        self.requests = 0
+        self.opened = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_open(self):
+        with self._lock:
+            self.opened += 1
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'connections_opened': self.opened,
+                'connections_reused': max(0, self.requests - self.opened)
+            }
+
+
+connection_stats = ConnectionStats()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        connection_stats.record_open()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        connection_stats.record_open()
+        return super()._new_conn()
+
+
+class PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool
+        }
+
+    def send(self, request, **kwargs):
+        connection_stats.record_request()
+        return super().send(request, **kwargs)
+
+
+def pool_size() -> int:
+    return int(os.getenv("SPOTIFY_HTTP_POOL_SIZE", "16"))
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            size = pool_size()
+            adapter = PooledAdapter(pool_connections=4, pool_maxsize=size, pool_block=True)
+            _session = requests.Session()
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+            _session.headers.update(DEFAULT_HEADERS)
+        return _session
+
+
+def create_async_session(limit: int):
+    # aiohttp is only needed by the async extractor, so it is imported on demand.
+    import aiohttp
+
+    async def on_create(session, context, params):
+        connection_stats.record_open()
+
+    async def on_request(session, context, params):
+        connection_stats.record_request()
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_end.append(on_create)
+    trace_config.on_request_start.append(on_request)
+    connector = aiohttp.TCPConnector(limit=limit, keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=connector, headers=DEFAULT_HEADERS, trace_configs=[trace_config])
+
+
+def log_connection_stats():
+    stats = connection_stats.summary()
+    logging.info(f"HTTP connections: {stats['requests']} requests, {stats['connections_opened']} opened, "
+                 f"{stats['connections_reused']} reused")
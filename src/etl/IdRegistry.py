@@ -0,0 +1,194 @@
+import argparse
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+STATUSES = ('pending', 'fetched', 'failed', 'gone')
+# Legacy seed files; importing them is idempotent, so they can keep being edited by hand.
+ID_FILES = {
+    'albums': 'album_ids.txt',
+    'artists': 'artist_ids.txt',
+    'tracks': 'track_ids.txt',
+    'playlists': 'playlist_ids.txt'
+}
+
+
+class IdRegistry:
+    # Lives in its own database file: full rebuilds delete spotify.db, but what is known about each ID must survive.
+    def __init__(self, db_path: str = "spotify_db/id_registry.db", max_attempts: int = 3):
+        self.db_path = Path(db_path).resolve()
+        self.max_attempts = max_attempts
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Statuses are updated from the streaming writer's thread after each commit, so access is serialized here.
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS id_registry (
+                entity_type TEXT NOT NULL,
+                entity_id TEXT NOT NULL,
+                source TEXT,
+                status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'fetched', 'failed', 'gone')),
+                discovered_at INTEGER,
+                last_fetched INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (entity_type, entity_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_id_registry_status ON id_registry(entity_type, status, entity_id);
+        """)
+
+    def add(self, entity: str, ids: Iterable[str], source: str) -> int:
+        # The first source to report an ID is kept; later sightings are ignored by the primary key.
+        now = int(time.time())
+        with self._lock:
+            before = self.connection.total_changes
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO id_registry (entity_type, entity_id, source, discovered_at) VALUES (?, ?, ?, ?)",
+                ((entity, entity_id, source, now) for entity_id in ids if entity_id)
+            )
+            self.connection.commit()
+            return self.connection.total_changes - before
+
+    def import_file(self, entity: str, file_path: str) -> int:
+        try:
+            with open(file_path, 'r') as f:
+                added = self.add(entity, (line.strip() for line in f), source=f"file:{Path(file_path).name}")
+        except FileNotFoundError:
+            return 0
+        if added:
+            logging.info(f"Registered {added} new {entity} IDs from {file_path}")
+        return added
+
+    def import_files(self, id_dir: str = '.') -> int:
+        return sum(self.import_file(entity, str(Path(id_dir) / filename)) for entity, filename in ID_FILES.items())
+
+    def contains(self, entity: str, entity_id: str) -> bool:
+        with self._lock:
+            return self.connection.execute(
+                "SELECT 1 FROM id_registry WHERE entity_type = ? AND entity_id = ?", (entity, entity_id)
+            ).fetchone() is not None
+
+    def known(self, entity: str, ids: Iterable[str]) -> Set[str]:
+        candidates = list(dict.fromkeys(ids))
+        known = set()
+        # Bound the statement size; SQLite's default limit on host parameters is 32766.
+        for i in range(0, len(candidates), 500):
+            batch = candidates[i:i + 500]
+            with self._lock:
+                known.update(row[0] for row in self.connection.execute(
+                    f"SELECT entity_id FROM id_registry WHERE entity_type = ? "
+                    f"AND entity_id IN ({', '.join(['?'] * len(batch))})", (entity, *batch)
+                ))
+        return known
+
+    def requeue(self, entities: Iterable[str], fetched_before: Optional[int] = None) -> int:
+        # A full rebuild starts from an empty database, so everything fetched so far is due again.
+        # Only kinds the caller plans are requeued; users are refetched with their playlists and never planned.
+        requeued = 0
+        with self._lock:
+            for entity in entities:
+                before = self.connection.total_changes
+                self.connection.execute(
+                    "UPDATE id_registry SET status = 'pending', attempts = 0 "
+                    "WHERE entity_type = ? AND status = 'fetched' AND (? IS NULL OR last_fetched < ?)",
+                    (entity, fetched_before, fetched_before)
+                )
+                requeued += self.connection.total_changes - before
+            self.connection.commit()
+        return requeued
+
+    def next_pending(self, entity: str, limit: int, after: str = '') -> List[str]:
+        # Keyset page over the status index: each call is one short range scan, however large the registry.
+        with self._lock:
+            return [row[0] for row in self.connection.execute(
+                "SELECT entity_id FROM id_registry WHERE entity_type = ? AND status = 'pending' AND entity_id > ? "
+                "ORDER BY entity_id LIMIT ?", (entity, after, limit)
+            )]
+
+    def iter_pending(self, entity: str, page_size: int = 1000) -> Iterator[str]:
+        last_id = ''
+        while True:
+            page = self.next_pending(entity, page_size, last_id)
+            if not page:
+                return
+            last_id = page[-1]
+            yield from page
+
+    def _set_status(self, sql: str, entity: str, ids: Iterable[str], *params):
+        now = int(time.time())
+        with self._lock:
+            self.connection.executemany(sql, ((*params, now, entity, entity_id) for entity_id in ids))
+            self.connection.commit()
+
+    def mark_fetched(self, entity: str, ids: Iterable[str]):
+        self._set_status(
+            "UPDATE id_registry SET status = 'fetched', attempts = attempts + 1, last_fetched = ? "
+            "WHERE entity_type = ? AND entity_id = ?", entity, ids
+        )
+
+    def mark_gone(self, entity: str, ids: Iterable[str]):
+        # The API answered but returned nothing for these IDs, so retrying cannot help.
+        self._set_status(
+            "UPDATE id_registry SET status = 'gone', attempts = attempts + 1, last_fetched = ? "
+            "WHERE entity_type = ? AND entity_id = ?", entity, ids
+        )
+
+    def mark_failed(self, entity: str, ids: Iterable[str]):
+        # Failed requests stay pending until they have used up max_attempts.
+        self._set_status(
+            "UPDATE id_registry SET attempts = attempts + 1, "
+            "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END, last_fetched = ? "
+            "WHERE entity_type = ? AND entity_id = ?", entity, ids, self.max_attempts
+        )
+
+    def record_results(self, entity: str, requested: List[str], returned: Iterable[str]):
+        returned = set(returned)
+        if not returned:
+            self.mark_failed(entity, requested)
+            return
+        self.mark_fetched(entity, [entity_id for entity_id in requested if entity_id in returned])
+        self.mark_gone(entity, [entity_id for entity_id in requested if entity_id not in returned])
+
+    def retry_failed(self) -> int:
+        with self._lock:
+            before = self.connection.total_changes
+            self.connection.execute("UPDATE id_registry SET status = 'pending', attempts = 0 WHERE status = 'failed'")
+            self.connection.commit()
+            return self.connection.total_changes - before
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        counts = {}
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT entity_type, status, COUNT(*) FROM id_registry GROUP BY entity_type, status").fetchall()
+        for entity, status, count in rows:
+            counts.setdefault(entity, dict.fromkeys(STATUSES, 0))[status] = count
+        return counts
+
+    def log_summary(self):
+        for entity, statuses in sorted(self.counts().items()):
+            logging.info(f"ID registry {entity}: " + ', '.join(f"{count} {status}" for status, count in statuses.items()))
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import the *_ids.txt files into the ID registry and report it")
+    parser.add_argument('--db-path', default="spotify_db/id_registry.db")
+    parser.add_argument('--id-dir', default='.', help="directory holding album_ids.txt, track_ids.txt, ...")
+    parser.add_argument('--retry-failed', action='store_true',
+                        help="put IDs that used up their attempts back to pending")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    registry = IdRegistry(args.db_path)
+    registry.import_files(args.id_dir)
+    if args.retry_failed:
+        logging.info(f"Re-queued {registry.retry_failed()} failed IDs")
+    registry.log_summary()
+    registry.close()
@@ -0,0 +1,241 @@
+import cProfile
+import json
+import logging
+import math
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+# Upper bounds in seconds, the same layout as the Prometheus client's default buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, math.inf)
+
+HELP = {
+    'spotify_requests_total': "API responses by endpoint and HTTP status",
+    'spotify_request_seconds': "Time from sending a request to receiving its full body",
+    'spotify_response_bytes_total': "Decoded response body bytes received",
+    'spotify_retries_total': "Request attempts repeated after a 401, 429 or network error",
+    'spotify_token_refreshes_total': "Access tokens fetched from the accounts service",
+    'spotify_retry_after_seconds_total': "Retry-After seconds requested by 429 responses",
+    'spotify_sleep_seconds_total': "Time spent in deliberate sleeps by reason",
+    'spotify_json_parse_seconds': "Time spent decoding response bodies",
+    'spotify_db_write_seconds': "Time spent in DatabaseManager.save_rows per flush",
+    'spotify_db_rows_total': "Rows handed to the database by table",
+    'spotify_stage_seconds': "Wall time of each pipeline stage",
+    'spotify_stage_peak_memory_bytes': "Peak traced allocation size of a stage run under tracemalloc"
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def endpoint_label(endpoint: str) -> str:
+    # IDs are folded out so the label set stays small: 'playlists/abc/tracks?...' -> 'playlists/{id}/tracks'.
+    parts = endpoint.split('?', 1)[0].split('/')
+    return '/'.join([parts[0]] + ['{id}' if i % 2 else part for i, part in enumerate(parts[1:], 1)])
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * len(self.bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Upper bound of the bucket holding the q-th observation, which is what a dashboard would show.
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.bounds[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.profile_stages = set()
+        self.trace_memory_stages = set()
+        self.profile_dir = Path("spotify_db/profiles")
+        self._profiling = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Labels]:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self.counters[self._key(name, labels)] += value
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def configure_profiling(self, profile_stages: Iterable[str] = (), trace_memory_stages: Iterable[str] = (),
+                            profile_dir: Optional[str] = None):
+        self.profile_stages = set(profile_stages)
+        self.trace_memory_stages = set(trace_memory_stages)
+        if profile_dir:
+            self.profile_dir = Path(profile_dir)
+
+    @contextmanager
+    def stage(self, name: str):
+        # cProfile only sees the calling thread, so writer-thread time shows up as waits in the profile.
+        profiler = None
+        if name in self.profile_stages:
+            if self._profiling:
+                logging.warning(f"Not profiling stage {name}: an enclosing stage is already being profiled")
+            else:
+                profiler = cProfile.Profile()
+                self._profiling = True
+        trace_memory = name in self.trace_memory_stages and not tracemalloc.is_tracing()
+        if trace_memory:
+            tracemalloc.start(25)
+
+        started = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+                self._profiling = False
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                path = self.profile_dir / f"{name}.prof"
+                profiler.dump_stats(str(path))
+                logging.info(f"cProfile stats for stage {name} written to {path}")
+            self.observe('spotify_stage_seconds', time.perf_counter() - started, stage=name)
+            if trace_memory:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.inc('spotify_stage_peak_memory_bytes', peak, stage=name)
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                path = self.profile_dir / f"{name}.memory.txt"
+                top = snapshot.statistics('lineno')[:25]
+                path.write_text('\n'.join(str(stat) for stat in top) + '\n', encoding='utf-8')
+                logging.info(f"Stage {name} peak traced memory {peak / 1048576:.1f} MiB; top allocations in {path}")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = [{
+                'name': name,
+                'labels': dict(labels),
+                'count': histogram.count,
+                'sum': histogram.sum,
+                'p50': histogram.quantile(0.5),
+                'p99': histogram.quantile(0.99),
+                'buckets': {('+Inf' if math.isinf(bound) else str(bound)): count
+                            for bound, count in zip(histogram.bounds, histogram.counts)}
+            } for (name, labels), histogram in sorted(self.histograms.items())]
+        return {'counters': counters, 'histograms': histograms}
+
+    def write_json(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(self.snapshot(), indent=2), encoding='utf-8')
+
+    @staticmethod
+    def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(labels) + ([extra] if extra else [])
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+    def prometheus_text(self) -> str:
+        lines = []
+        described = set()
+
+        def describe(name: str, kind: str):
+            if name not in described:
+                described.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                describe(name, 'counter')
+                lines.append(f"{name}{self._format_labels(labels)} {value:g}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                describe(name, 'histogram')
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if math.isinf(bound) else f"{bound:g}"
+                    lines.append(f"{name}_bucket{self._format_labels(labels, ('le', le))} {cumulative}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        # node_exporter's textfile collector may read at any moment, so the file is replaced atomically.
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        Path(tmp_path).write_text(self.prometheus_text(), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def log_summary(self):
+        with self._lock:
+            requests = defaultdict(float)
+            for (name, labels), value in self.counters.items():
+                if name == 'spotify_requests_total':
+                    requests[dict(labels)['endpoint']] += value
+            latency = {dict(labels)['endpoint']: histogram for (name, labels), histogram in self.histograms.items()
+                       if name == 'spotify_request_seconds'}
+            totals = defaultdict(float)
+            for (name, _), value in self.counters.items():
+                totals[name] += value
+            stages = {dict(labels)['stage']: histogram.sum for (name, labels), histogram in self.histograms.items()
+                      if name == 'spotify_stage_seconds'}
+            parse = sum(histogram.sum for (name, _), histogram in self.histograms.items()
+                        if name == 'spotify_json_parse_seconds')
+            db_write = sum(histogram.sum for (name, _), histogram in self.histograms.items()
+                           if name == 'spotify_db_write_seconds')
+
+        for endpoint, count in sorted(requests.items()):
+            histogram = latency.get(endpoint)
+            p50 = histogram.quantile(0.5) if histogram else None
+            p99 = histogram.quantile(0.99) if histogram else None
+            logging.info(f"Endpoint {endpoint}: {count:.0f} responses, p50 <= {p50}s, p99 <= {p99}s")
+        logging.info(f"Requests: {totals['spotify_response_bytes_total'] / 1048576:.1f} MiB received, "
+                     f"{totals['spotify_retries_total']:.0f} retries, "
+                     f"{totals['spotify_token_refreshes_total']:.0f} token refreshes, "
+                     f"{totals['spotify_retry_after_seconds_total']:.0f}s of Retry-After, "
+                     f"{totals['spotify_sleep_seconds_total']:.1f}s asleep")
+        logging.info(f"JSON parsing {parse:.2f}s, database writes {db_write:.2f}s; stages: " +
+                     ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in stages.items()))
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,181 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Partition value used for rows without a usable release year, same as Hive's default.
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+RELEASE_YEAR = "substr({alias}.release_date, 1, 4)"
+
+# dataset -> (source table or view, SELECT producing its rows, partition expression or None)
+DATASETS = {
+    'albums': ('albums', "SELECT al.*, {year} AS release_year FROM albums al", RELEASE_YEAR.format(alias='al')),
+    'tracks': ('tracks', "SELECT t.*, {year} AS release_year FROM tracks t LEFT JOIN albums al "
+                         "ON al.album_id = t.album_id", RELEASE_YEAR.format(alias='al')),
+    'artists': ('artists', "SELECT * FROM artists", None),
+    'playlists': ('playlists', "SELECT * FROM playlists", None),
+    'playlist_tracks': ('playlist_tracks', "SELECT * FROM playlist_tracks", None),
+    'users': ('users', "SELECT * FROM users", None),
+    'markets': ('markets', "SELECT * FROM markets", None),
+    'genre_dim': ('genre_dim', "SELECT * FROM genre_dim", None),
+    'artist_genres': ('artist_genres', "SELECT * FROM artist_genres", None),
+    'artist_stats': ('artist_stats', "SELECT * FROM artist_stats", None),
+    'thresholds': ('thresholds', "SELECT * FROM thresholds", None),
+    'artist_categories': ('artist_categories', "SELECT * FROM artist_categories", None),
+    'genres': ('genres', "SELECT * FROM genres", None)
+}
+
+# Low-cardinality string columns stored as Parquet dictionary pages.
+DICTIONARY_COLUMNS = {'album_type', 'genre', 'artist_category', 'country_code', 'owner_id'}
+
+ARROW_TYPES = {
+    'INTEGER': pa.int64(),
+    'REAL': pa.float64(),
+    'TEXT': pa.string(),
+    'BLOB': pa.binary(),
+    'BOOLEAN': pa.bool_()
+}
+
+
+class RowFingerprint:
+    # Order-independent: the sum of per-row hashes does not depend on scan order.
+    def __init__(self):
+        self.total = 0
+
+    def step(self, *values):
+        digest = hashlib.blake2b(repr(values).encode('utf-8'), digest_size=8).digest()
+        self.total = (self.total + int.from_bytes(digest, 'little')) % (1 << 64)
+
+    def finalize(self):
+        return f"{self.total:016x}"
+
+
+class ParquetExporter:
+    def __init__(self, db_path: str = "spotify_db/spotify.db", out_dir: str = "spotify_db/parquet",
+                 compression: str = "zstd"):
+        self.db_path = Path(db_path).resolve()
+        self.out_dir = Path(out_dir).resolve()
+        self.compression = compression
+        self.manifest_path = self.out_dir / "_manifest.json"
+        self.connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        self.connection.create_aggregate("row_fingerprint", -1, RowFingerprint)
+        self.manifest = json.loads(self.manifest_path.read_text(encoding='utf-8')) \
+            if self.manifest_path.exists() else {}
+        self.written = 0
+        self.skipped = 0
+
+    def _schema(self, source: str, partitioned: bool) -> pa.Schema:
+        fields = []
+        for _, name, declared_type, *_ in self.connection.execute(f"PRAGMA table_info({source})").fetchall():
+            fields.append(pa.field(name, ARROW_TYPES.get(declared_type.upper(), pa.string())))
+        if partitioned:
+            fields.append(pa.field('release_year', pa.string()))
+        return pa.schema(fields)
+
+    def _fingerprints(self, sql: str, columns: List[str], partition: Optional[str]) -> Dict[str, str]:
+        # One grouped pass hashes every partition; only partitions whose hash moved are rewritten.
+        column_list = ', '.join(f'"{col}"' for col in columns)
+        key = f"COALESCE(NULLIF(release_year, ''), '{NULL_PARTITION}')" if partition else "''"
+        rows = self.connection.execute(
+            f"SELECT {key} AS partition_key, COUNT(*) || ':' || row_fingerprint({column_list}) "
+            f"FROM ({sql.format(year=partition or 'NULL')}) GROUP BY partition_key"
+        ).fetchall()
+        return dict(rows)
+
+    @staticmethod
+    def _arrow_table(rows, schema: pa.Schema) -> pa.Table:
+        columns = {field.name: [] for field in schema}
+        names = list(columns)
+        for row in rows:
+            for name, value in zip(names, row):
+                columns[name].append(value)
+        for field in schema:
+            if field.type == pa.bool_():
+                columns[field.name] = [None if value is None else bool(value) for value in columns[field.name]]
+        return pa.Table.from_pydict(columns, schema=schema)
+
+    def _write(self, table: pa.Table, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        dictionary_columns = [name for name in table.column_names if name in DICTIONARY_COLUMNS]
+        tmp_path = path.with_suffix('.parquet.tmp')
+        pq.write_table(table, tmp_path, compression=self.compression, use_dictionary=dictionary_columns)
+        os.replace(tmp_path, path)
+
+    def export_dataset(self, dataset: str) -> Tuple[int, int]:
+        source, sql, partition = DATASETS[dataset]
+        schema = self._schema(source, partition is not None)
+        if not len(schema):
+            logging.warning(f"Skipping {dataset}: {source} does not exist")
+            return 0, 0
+
+        current = self._fingerprints(sql, schema.names, partition)
+        previous = self.manifest.get(dataset, {})
+        changed = [key for key, fingerprint in current.items() if previous.get(key) != fingerprint]
+
+        if changed and partition:
+            # One ordered pass feeds every changed partition; rows of unchanged ones are only stepped over.
+            wanted = set(changed)
+            cursor = self.connection.execute(
+                f"SELECT *, COALESCE(NULLIF(release_year, ''), '{NULL_PARTITION}') AS partition_key "
+                f"FROM ({sql.format(year=partition)}) ORDER BY partition_key"
+            )
+            for key, rows in groupby(cursor, key=lambda row: row[-1]):
+                if key not in wanted:
+                    continue
+                # The year lives in the directory name (Hive layout), not in the file.
+                table = self._arrow_table(rows, schema).drop_columns(['release_year'])
+                self._write(table, self.out_dir / dataset / f"release_year={key}" / "part-0.parquet")
+        elif changed:
+            cursor = self.connection.execute(sql.format(year='NULL'))
+            self._write(self._arrow_table(cursor, schema), self.out_dir / f"{dataset}.parquet")
+
+        for key in set(previous) - set(current):
+            if partition:
+                shutil.rmtree(self.out_dir / dataset / f"release_year={key}", ignore_errors=True)
+            else:
+                (self.out_dir / f"{dataset}.parquet").unlink(missing_ok=True)
+
+        self.manifest[dataset] = current
+        return len(changed), len(current) - len(changed)
+
+    def export(self, datasets: Optional[List[str]] = None) -> Dict[str, Tuple[int, int]]:
+        started = time.perf_counter()
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        results = {}
+        for dataset in datasets or DATASETS:
+            written, skipped = self.export_dataset(dataset)
+            results[dataset] = (written, skipped)
+            self.written += written
+            self.skipped += skipped
+            logging.debug(f"Parquet export of {dataset}: {written} partitions written, {skipped} unchanged")
+        # The manifest is saved last, so an interrupted export is redone on the next run.
+        self.manifest_path.write_text(json.dumps(self.manifest, indent=2), encoding='utf-8')
+        logging.info(f"Parquet export to {self.out_dir}: {self.written} partitions written, "
+                     f"{self.skipped} unchanged, in {time.perf_counter() - started:.2f}s")
+        return results
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the Spotify SQLite database to Parquet")
+    parser.add_argument('--db-path', default="spotify_db/spotify.db")
+    parser.add_argument('--out-dir', default="spotify_db/parquet")
+    parser.add_argument('--dataset', action='append', choices=sorted(DATASETS),
+                        help="export only this dataset; may be repeated")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    exporter = ParquetExporter(args.db_path, args.out_dir)
+    exporter.export(args.dataset)
+    exporter.close()
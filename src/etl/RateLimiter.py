@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Optional
+from Metrics import metrics
+
+
+# Token bucket shared by every caller of the Spotify API: additive increase while
+# responses are clean, multiplicative decrease plus a global pause on 429.
+class AdaptiveRateLimiter:
+    def __init__(self, target_rps: float = 5.0, min_rps: float = 0.5, max_rps: Optional[float] = None,
+                 increase_step: float = 0.25, decrease_factor: float = 0.5, burst: Optional[float] = None,
+                 name: str = "all requests"):
+        self.name = name
+        self.rate = target_rps
+        self.min_rps = min_rps
+        self.max_rps = max_rps or target_rps * 4
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.capacity = burst or max(1.0, target_rps)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if now > self.updated:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+            self.tokens -= 1
+            delay = self.updated - now
+            if self.tokens < 0:
+                delay += -self.tokens / self.rate
+            return max(0.0, delay)
+
+    def wait_time(self) -> float:
+        # How long an acquire() issued now would block, without reserving a token.
+        with self._lock:
+            now = time.monotonic()
+            if self.paused_until > now:
+                return self.paused_until - now
+            tokens = self.tokens
+            if now > self.updated:
+                tokens = min(self.capacity, tokens + (now - self.updated) * self.rate)
+            delay = max(0.0, self.updated - now)
+            return delay + (0.0 if tokens >= 1 else (1 - tokens) / self.rate)
+
+    def _pause_remaining(self) -> float:
+        with self._lock:
+            return max(0.0, self.paused_until - time.monotonic())
+
+    def acquire(self):
+        delay = self._reserve()
+        while delay > 0:
+            metrics.inc('spotify_sleep_seconds_total', delay, reason='rate_limiter')
+            time.sleep(delay)
+            delay = self._pause_remaining()
+
+    async def acquire_async(self):
+        delay = self._reserve()
+        while delay > 0:
+            metrics.inc('spotify_sleep_seconds_total', delay, reason='rate_limiter')
+            await asyncio.sleep(delay)
+            delay = self._pause_remaining()
+
+    def on_success(self):
+        with self._lock:
+            # Roughly ``increase_step`` requests/second of extra budget per second of clean responses.
+            self.rate = min(self.max_rps, self.rate + self.increase_step / self.rate)
+
+    def on_rate_limited(self, retry_after: float):
+        with self._lock:
+            now = time.monotonic()
+            self.rate = max(self.min_rps, self.rate * self.decrease_factor)
+            resume_at = now + retry_after
+            if resume_at > self.paused_until:
+                self.paused_until = resume_at
+            if resume_at > self.updated:
+                self.updated = resume_at
+                self.tokens = min(self.tokens, 0.0)
+        logging.warning(f"Rate limit hit, pausing {self.name} for {retry_after}s and lowering rate to {self.rate:.2f} req/s")
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_limiter() -> AdaptiveRateLimiter:
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = AdaptiveRateLimiter(target_rps=float(os.getenv("SPOTIFY_TARGET_RPS", "5")))
+        return _shared_limiter
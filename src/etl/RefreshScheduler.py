@@ -0,0 +1,146 @@
+import logging
+import math
+import time
+from typing import Dict
+from RequestPlanner import RequestPlanner, BATCH_LIMITS
+from SpotifyExtractor import PLAYLIST_PAGE_SIZE
+
+# Change per day assumed for IDs never seen twice, so they are re-observed and get a measured volatility.
+VOLATILITY_PRIOR = 1.0
+# Added to every volatility, so entities that never change still come due as they age.
+VOLATILITY_FLOOR = 0.25
+EMERGING_WEIGHT = 2.0
+
+EMERGING = "COALESCE(c.artist_category = 'Emerging', 0)"
+# Per entity: the joins that supply its importance, the importance itself and the requests one ID costs.
+# A playlist costs its header, every further page of tracks and, roughly, its owner.
+SCORING = {
+    'artists': (
+        "LEFT JOIN main.artist_categories c ON c.artist_id = p.entity_id "
+        "LEFT JOIN main.artist_stats s ON s.artist_id = p.entity_id",
+        f"1 + :emerging_weight * {EMERGING} + log1p(s.playlist_count)",
+        f"{1 / BATCH_LIMITS['artists']}"
+    ),
+    'albums': (
+        "LEFT JOIN main.albums al ON al.album_id = p.entity_id "
+        "LEFT JOIN main.artist_categories c ON c.artist_id = al.artist_id "
+        "LEFT JOIN main.artist_stats s ON s.artist_id = al.artist_id",
+        f"1 + :emerging_weight * {EMERGING} + log1p(s.playlist_count)",
+        f"{1 / BATCH_LIMITS['albums']}"
+    ),
+    'tracks': (
+        "LEFT JOIN main.tracks t ON t.track_id = p.entity_id "
+        "LEFT JOIN main.artist_categories c ON c.artist_id = t.artist_id",
+        f"1 + :emerging_weight * {EMERGING} + "
+        f"log1p((SELECT COUNT(*) FROM main.playlist_tracks pt WHERE pt.track_id = p.entity_id))",
+        f"{1 / BATCH_LIMITS['tracks']}"
+    ),
+    'playlists': (
+        "LEFT JOIN main.playlists pl ON pl.playlist_id = p.entity_id "
+        "LEFT JOIN main.users u ON u.user_id = pl.owner_id",
+        "1 + 0.2 * log1p(u.followers)",
+        f"2 + MAX(COALESCE(pl.total_tracks, 0) - 1, 0) / {PLAYLIST_PAGE_SIZE}"
+    )
+}
+
+
+def _log1p(value) -> float:
+    return math.log1p(value) if value and value > 0 else 0.0
+
+
+class RefreshScheduler:
+    # Trims the plan to a request budget, keeping the refreshes whose data has most likely drifted
+    # furthest in the entities that matter most. Priority is age in days x (volatility + floor) x importance,
+    # divided by the requests an ID costs; IDs never fetched have no data at all and always go first.
+    def __init__(self, planner: RequestPlanner, budget: int, emerging_weight: float = EMERGING_WEIGHT):
+        self.planner = planner
+        self.connection = planner.connection
+        self.budget = budget
+        self.emerging_weight = emerging_weight
+        self.connection.create_function("log1p", 1, _log1p, deterministic=True)
+
+    def _has_tables(self) -> bool:
+        found = {row[0] for row in self.connection.execute(
+            "SELECT name FROM main.sqlite_master WHERE name IN ('fetch_state', 'refresh_state', 'artist_categories')"
+        )}
+        return len(found) == 3
+
+    def _score(self, now: int):
+        self.connection.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS plan_scores (
+                entity TEXT,
+                entity_id TEXT,
+                score REAL,
+                cost REAL,
+                age_days REAL,
+                PRIMARY KEY (entity, entity_id)
+            ) WITHOUT ROWID
+        """)
+        self.connection.execute("DELETE FROM temp.plan_scores")
+        for entity, (joins, importance, cost) in SCORING.items():
+            self.connection.execute(f"""
+                INSERT INTO temp.plan_scores (entity, entity_id, score, cost, age_days)
+                SELECT p.entity, p.entity_id,
+                       (:now - f.fetched_at) / 86400.0
+                           * (COALESCE(r.volatility, :prior) + :floor) * ({importance}),
+                       {cost},
+                       (:now - f.fetched_at) / 86400.0
+                FROM temp.plan_ids p
+                LEFT JOIN main.fetch_state f ON f.entity_type = p.entity AND f.entity_id = p.entity_id
+                LEFT JOIN main.refresh_state r ON r.entity_type = p.entity AND r.entity_id = p.entity_id
+                {joins}
+                WHERE p.entity = :entity
+            """, {'now': now, 'prior': VOLATILITY_PRIOR, 'floor': VOLATILITY_FLOOR,
+                  'emerging_weight': self.emerging_weight, 'entity': entity})
+
+    def _summary(self) -> Dict[tuple, tuple]:
+        return {(entity, bool(deferred)): (count, new, mean_age)
+                for entity, deferred, count, new, mean_age in self.connection.execute("""
+            SELECT s.entity, d.entity_id IS NOT NULL, COUNT(*), SUM(s.score IS NULL), AVG(s.age_days)
+            FROM temp.plan_scores s
+            LEFT JOIN temp.deferred_ids d ON d.entity = s.entity AND d.entity_id = s.entity_id
+            GROUP BY 1, 2
+        """)}
+
+    def apply(self) -> int:
+        if not self._has_tables():
+            logging.warning("Refresh budget ignored: the database has no fetch history to rank against")
+            return 0
+        started = time.perf_counter()
+        self._score(int(time.time()))
+        self.connection.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS deferred_ids (
+                entity TEXT,
+                entity_id TEXT,
+                PRIMARY KEY (entity, entity_id)
+            ) WITHOUT ROWID
+        """)
+        self.connection.execute("DELETE FROM temp.deferred_ids")
+        # Requests are spent in priority order per unit of cost; the running total decides where the budget ends.
+        self.connection.execute("""
+            INSERT INTO temp.deferred_ids (entity, entity_id)
+            SELECT entity, entity_id FROM (
+                SELECT entity, entity_id,
+                       SUM(cost) OVER (ORDER BY score IS NULL DESC, score / cost DESC, entity, entity_id
+                                       ROWS UNBOUNDED PRECEDING) AS spent
+                FROM temp.plan_scores
+            )
+            WHERE spent > ?
+        """, (self.budget,))
+        summary = self._summary()
+        before = self.connection.total_changes
+        self.connection.execute(
+            "DELETE FROM temp.plan_ids WHERE (entity, entity_id) IN (SELECT entity, entity_id FROM temp.deferred_ids)"
+        )
+        self.connection.commit()
+        dropped = self.connection.total_changes - before
+
+        for entity in BATCH_LIMITS:
+            kept_count, new, kept_age = summary.get((entity, False), (0, 0, None))
+            deferred_count, _, deferred_age = summary.get((entity, True), (0, 0, None))
+            self.planner.ids_deferred[entity] = deferred_count
+            logging.info(f"Refresh schedule {entity}: {kept_count} kept ({new} never fetched, mean age "
+                         f"{kept_age or 0:.1f} days), {deferred_count} deferred (mean age {deferred_age or 0:.1f} days)")
+        logging.info(f"Refresh budget of {self.budget} requests: deferred {dropped} IDs to later runs "
+                     f"(scheduled in {time.perf_counter() - started:.2f}s)")
+        return dropped
@@ -0,0 +1,186 @@
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+# Maximum IDs per request for each endpoint; playlists are fetched one at a time.
+BATCH_LIMITS = {
+    'albums': 20,
+    'artists': 50,
+    'tracks': 50,
+    'playlists': 1
+}
+
+
+class RequestPlanner:
+    def __init__(self, db_path: Path, page_size: int = 1000):
+        # The plan lives in a TEMP table on a private connection, so it never locks the main database.
+        self.connection = sqlite3.connect(db_path)
+        self.page_size = page_size
+        self.connection.execute("""
+            CREATE TEMP TABLE plan_ids (
+                entity TEXT,
+                entity_id TEXT,
+                dispatched INTEGER DEFAULT 0,
+                PRIMARY KEY (entity, entity_id)
+            ) WITHOUT ROWID
+        """)
+        self.connection.execute("CREATE INDEX temp.idx_plan_pending ON plan_ids(entity, dispatched)")
+        self.max_age_seconds = None
+        self.ids_read = {entity: 0 for entity in BATCH_LIMITS}
+        self.ids_fresh = {entity: 0 for entity in BATCH_LIMITS}
+        self.ids_deferred = {entity: 0 for entity in BATCH_LIMITS}
+
+    def add_ids(self, entity: str, ids: Iterable[str]) -> int:
+        before = self.connection.total_changes
+        rows = ((entity, entity_id) for entity_id in ids)
+        self.connection.executemany("INSERT OR IGNORE INTO temp.plan_ids (entity, entity_id) VALUES (?, ?)", rows)
+        self.connection.commit()
+        return self.connection.total_changes - before
+
+    def add_file(self, entity: str, file_path: str) -> int:
+        read = 0
+
+        def read_ids() -> Iterator[str]:
+            nonlocal read
+            for line in f:
+                if line.strip():
+                    read += 1
+                    yield line.strip()
+
+        try:
+            with open(file_path, 'r') as f:
+                added = self.add_ids(entity, read_ids())
+        except FileNotFoundError:
+            logging.warning(f"ID file not found: {file_path}")
+            return 0
+        self.ids_read[entity] += read
+        logging.info(f"Read {read} IDs from {file_path} ({added} new to the plan)")
+        return added
+
+    def add_registry(self, entity: str, registry) -> int:
+        read = 0
+
+        def pending_ids() -> Iterator[str]:
+            nonlocal read
+            for entity_id in registry.iter_pending(entity):
+                read += 1
+                yield entity_id
+
+        added = self.add_ids(entity, pending_ids())
+        self.ids_read[entity] += read
+        logging.info(f"Read {read} pending {entity} IDs from the ID registry ({added} new to the plan)")
+        return added
+
+    def _has_fetch_state(self) -> bool:
+        return self.connection.execute(
+            "SELECT 1 FROM main.sqlite_master WHERE type='table' AND name='fetch_state'"
+        ).fetchone() is not None
+
+    def drop_fresh(self, max_age_seconds: int) -> int:
+        self.max_age_seconds = max_age_seconds
+        if not self._has_fetch_state():
+            return 0
+        cutoff = int(time.time()) - max_age_seconds
+        dropped = 0
+        for entity in BATCH_LIMITS:
+            before = self.connection.total_changes
+            self.connection.execute("""
+                DELETE FROM temp.plan_ids
+                WHERE entity = ?
+                  AND entity_id IN (SELECT entity_id FROM main.fetch_state WHERE entity_type = ? AND fetched_at >= ?)
+            """, (entity, entity, cutoff))
+            self.ids_fresh[entity] = self.connection.total_changes - before
+            dropped += self.ids_fresh[entity]
+        self.connection.commit()
+        return dropped
+
+    def drop_landed(self) -> int:
+        # Entity checkpoints are keyed by ID and committed with their rows, so they are exact on resume.
+        dropped = 0
+        for entity in ('albums', 'artists', 'tracks'):
+            before = self.connection.total_changes
+            self.connection.execute(
+                "DELETE FROM temp.plan_ids WHERE entity = ? "
+                "AND entity_id IN (SELECT chunk_key FROM main.etl_checkpoints WHERE entity = ?)", (entity, entity)
+            )
+            landed = self.connection.total_changes - before
+            if landed:
+                logging.info(f"Resume: {landed} {entity} IDs already landed")
+            dropped += landed
+        self.connection.commit()
+        return dropped
+
+    def discover(self, entity: str, ids: Iterable[str]) -> List[str]:
+        # The plan plus fresh fetch_state rows form the crawl's visited set; only unseen IDs are planned.
+        candidates = list(dict.fromkeys(entity_id for entity_id in ids if entity_id))
+        if not candidates:
+            return []
+        placeholders = ', '.join(['?'] * len(candidates))
+        known = {row[0] for row in self.connection.execute(
+            f"SELECT entity_id FROM temp.plan_ids WHERE entity = ? AND entity_id IN ({placeholders})",
+            (entity, *candidates)
+        )}
+        if self.max_age_seconds is not None and self._has_fetch_state():
+            cutoff = int(time.time()) - self.max_age_seconds
+            known.update(row[0] for row in self.connection.execute(
+                f"SELECT entity_id FROM main.fetch_state WHERE entity_type = ? AND fetched_at >= ? "
+                f"AND entity_id IN ({placeholders})",
+                (entity, cutoff, *candidates)
+            ))
+        new_ids = [entity_id for entity_id in candidates if entity_id not in known]
+        self.add_ids(entity, new_ids)
+        return new_ids
+
+    def take_chunk(self, entity: str, allow_partial: bool = False) -> List[str]:
+        limit = BATCH_LIMITS[entity]
+        ids = [row[0] for row in self.connection.execute(
+            "SELECT entity_id FROM temp.plan_ids WHERE entity = ? AND dispatched = 0 LIMIT ?", (entity, limit)
+        )]
+        if not ids or (len(ids) < limit and not allow_partial):
+            return []
+        self.connection.executemany(
+            "UPDATE temp.plan_ids SET dispatched = 1 WHERE entity = ? AND entity_id = ?",
+            ((entity, entity_id) for entity_id in ids)
+        )
+        self.connection.commit()
+        return ids
+
+    def count(self, entity: str) -> int:
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM temp.plan_ids WHERE entity = ?", (entity,)
+        ).fetchone()[0]
+
+    def planned_requests(self) -> Dict[str, int]:
+        return {entity: -(-self.count(entity) // limit) for entity, limit in BATCH_LIMITS.items()}
+
+    def log_plan(self, requests_per_second: float):
+        planned = self.planned_requests()
+        for entity, requests in planned.items():
+            deferred = f", {self.ids_deferred[entity]} deferred" if self.ids_deferred[entity] else ""
+            logging.info(f"Plan {entity}: {self.ids_read[entity]} IDs read, {self.count(entity)} to fetch "
+                         f"({self.ids_fresh[entity]} already fresh{deferred}), {requests} requests "
+                         f"of up to {BATCH_LIMITS[entity]} IDs")
+        total = sum(planned.values())
+        # Playlists also cost one request per 100 tracks plus one per new owner, which is unknown up front.
+        logging.info(f"Planned at least {total} requests, roughly {total / requests_per_second / 60:.1f} minutes "
+                     f"at {requests_per_second:.1f} req/s")
+
+    def iter_chunks(self, entity: str) -> Iterator[List[str]]:
+        limit = BATCH_LIMITS[entity]
+        last_id = ''
+        while True:
+            # Keyset pages keep each read short and the chunk boundaries stable between runs.
+            page = [row[0] for row in self.connection.execute(
+                "SELECT entity_id FROM temp.plan_ids WHERE entity = ? AND entity_id > ? ORDER BY entity_id LIMIT ?",
+                (entity, last_id, self.page_size)
+            )]
+            if not page:
+                return
+            last_id = page[-1]
+            for i in range(0, len(page), limit):
+                yield page[i:i + limit]
+
+    def close(self):
+        self.connection.close()
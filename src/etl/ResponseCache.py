@@ -0,0 +1,173 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Optional, Dict, Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Track/album metadata barely changes; popularity and follower counts move daily.
+DEFAULT_TTLS = {
+    'albums': 7 * DAY,
+    'tracks': 7 * DAY,
+    'artists': 6 * HOUR,
+    'users': 6 * HOUR,
+    'playlists': DAY,
+    'search': DAY
+}
+
+
+class CachedResponse:
+    def __init__(self, body: bytes, etag: Optional[str], fresh: bool):
+        self.body = body
+        self.etag = etag
+        self.fresh = fresh
+
+    def json(self) -> Dict:
+        return json.loads(self.body)
+
+
+class ResponseCache:
+    def __init__(self, db_path: str = "spotify_db/http_cache.db", ttls: Optional[Dict[str, int]] = None,
+                 max_bytes: int = 512 * 1024 * 1024, default_ttl: int = DAY, max_age: Optional[int] = None):
+        self.db_path = Path(db_path).resolve()
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        # Caps every TTL for this run; a refresh must not be answered by a body cached before it was due.
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                cache_key TEXT PRIMARY KEY,
+                family TEXT,
+                body BLOB,
+                etag TEXT,
+                stored_at INTEGER,
+                expires_at INTEGER,
+                last_access INTEGER,
+                size INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access);
+        """)
+        self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def normalize(endpoint: str) -> Tuple[str, str]:
+        parts = urlsplit(endpoint)
+        path = parts.path.strip('/')
+        params = []
+        for key, value in parse_qsl(parts.query, keep_blank_values=True):
+            if key == 'ids':
+                value = ','.join(sorted(value.split(',')))
+            params.append((key, value))
+        query = urlencode(sorted(params), safe=',%()')
+        family = path.split('/', 1)[0]
+        return family, f"{path}?{query}" if query else path
+
+    def ttl_for(self, family: str) -> int:
+        return self.ttls.get(family, self.default_ttl)
+
+    def lookup(self, endpoint: str) -> Optional[CachedResponse]:
+        _, key = self.normalize(endpoint)
+        now = int(time.time())
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT body, etag, stored_at, expires_at FROM responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if not row:
+                self.misses += 1
+                return None
+            body, etag, stored_at, expires_at = row
+            if self.max_age is not None:
+                expires_at = min(expires_at, stored_at + self.max_age)
+            if expires_at <= now and not etag:
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE responses SET last_access = ? WHERE cache_key = ?", (now, key))
+            self.connection.commit()
+            fresh = expires_at > now
+            if fresh:
+                self.hits += 1
+            else:
+                # Counted as a miss until a 304 turns it into a revalidation.
+                self.misses += 1
+            return CachedResponse(zlib.decompress(body), etag, fresh)
+
+    def store(self, endpoint: str, body: bytes, etag: Optional[str] = None):
+        family, key = self.normalize(endpoint)
+        now = int(time.time())
+        compressed = zlib.compress(body)
+        with self._lock:
+            previous = self.connection.execute(
+                "SELECT size FROM responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (cache_key, family, body, etag, stored_at, expires_at, last_access, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, family, compressed, etag, now, now + self.ttl_for(family), now, len(compressed))
+            )
+            self.total_bytes += len(compressed) - (previous[0] if previous else 0)
+            self._evict()
+            self.connection.commit()
+
+    def mark_revalidated(self, endpoint: str):
+        family, key = self.normalize(endpoint)
+        now = int(time.time())
+        with self._lock:
+            self.misses -= 1
+            self.revalidated += 1
+            self.connection.execute(
+                "UPDATE responses SET stored_at = ?, expires_at = ?, last_access = ? WHERE cache_key = ?",
+                (now, now + self.ttl_for(family), now, key)
+            )
+            self.connection.commit()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes:
+            rows = self.connection.execute(
+                "SELECT cache_key, size FROM responses ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                return
+            victims = []
+            for cache_key, size in rows:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                victims.append((cache_key,))
+                self.total_bytes -= size
+            self.connection.executemany("DELETE FROM responses WHERE cache_key = ?", victims)
+            self.evicted += len(victims)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'evicted': self.evicted,
+            'bytes': self.total_bytes
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, "
+                     f"{stats['revalidated']} revalidated, {stats['evicted']} evicted, "
+                     f"{stats['bytes'] / (1024 * 1024):.1f} MiB on disk")
+
+    def close(self):
+        self.connection.close()
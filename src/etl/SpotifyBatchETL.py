@@ -1,112 +1,330 @@
+import argparse
 import logging
 import time
-import pandas as pd
-from typing import List, Dict
-from SpotifyExtractor import SpotifyExtractor
+from functools import partial
+from pathlib import Path
+from typing import List, Dict, Optional, Callable
+from SpotifyExtractor import SpotifyExtractor, PLAYLIST_PAGE_SIZE, PLAYLIST_PAGE_FIELDS, PLAYLIST_CRAWL_FIELDS
+from AsyncSpotifyExtractor import AsyncSpotifyExtractor
 from DatabaseManager import DatabaseManager
+from HttpSession import log_connection_stats
+from Metrics import metrics
+from ResponseCache import ResponseCache
+from StreamingWriter import StreamingWriter
+from RequestPlanner import RequestPlanner, BATCH_LIMITS
+from RefreshScheduler import RefreshScheduler
+from EntityCrawler import EntityCrawler
+from IdRegistry import IdRegistry
+
+ID_KEYS = {
+    'albums': 'album_id',
+    'artists': 'artist_id',
+    'tracks': 'track_id'
+}
+
+STAGES = ('plan', 'load', 'entities', 'playlists', 'crawl', 'export')
 
 
 class SpotifyETLPipeline:
-    def __init__(self):
-        self.extractor = SpotifyExtractor()
+    def __init__(self, use_async: bool = False, concurrency: int = 8, use_cache: bool = True,
+                 incremental: bool = False, chunk_size: int = 500, resume: bool = False,
+                 refresh_after_hours: float = 24.0, plan_only: bool = False, crawl: bool = False,
+                 crawl_depth: int = 1, crawl_budget: Optional[int] = None, keep_market_json: bool = False,
+                 parquet_dir: Optional[str] = None, data_dir: Optional[str] = None,
+                 schema_dir: str = "spotify_db/schema", metrics_dir: Optional[str] = None,
+                 refresh_budget: Optional[int] = None):
+        # Configured before the extractor authenticates; its first log call would install a WARNING-level default.
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.use_async = use_async
+        self.chunk_size = chunk_size
+        self.resume = resume
+        self.refresh_after_hours = refresh_after_hours
+        self.refresh_budget = refresh_budget
+        self.plan_only = plan_only
+        self.crawl = crawl
+        self.crawl_depth = crawl_depth
+        self.crawl_budget = crawl_budget
+        self.parquet_dir = parquet_dir
+        self.checkpoints = {}
+        # By default ID files are read from the working directory and the databases live in spotify_db/;
+        # a data directory holds all of them, which keeps benchmark and test runs self-contained.
+        id_dir = Path(data_dir or '.')
+        db_dir = Path(data_dir or 'spotify_db')
+        db_dir.mkdir(parents=True, exist_ok=True)
+        self.metrics_dir = Path(metrics_dir) if metrics_dir else db_dir
+        self.id_dir = id_dir
+        self.registry = IdRegistry(str(db_dir / "id_registry.db"))
+        # IDs are refetched in incremental mode once they are older than refresh_after_hours, so a cached body
+        # older than that must be revalidated rather than served, whatever its family's TTL.
+        max_age = int(refresh_after_hours * 3600) if incremental or resume else None
+        # A refresh budget is spent on measuring drift, so its requests must see live values, never cached ones.
+        use_cache = use_cache and refresh_budget is None
+        self.cache = ResponseCache(str(db_dir / "http_cache.db"), max_age=max_age) if use_cache else None
+        self.extractor = AsyncSpotifyExtractor(concurrency, self.cache) if use_async else SpotifyExtractor(self.cache)
         self.access_token = self.extractor.get_access_token()
-        self.db_manager = DatabaseManager()
+        # Resuming and refresh budgets need the previously loaded database, so they imply incremental mode.
+        self.db_manager = DatabaseManager(str(db_dir / "spotify.db"), schema_dir,
+                                          incremental=incremental or resume or refresh_budget is not None,
+                                          keep_market_json=keep_market_json)
 
-    def _read_ids(self, file_path: str) -> List[str]:
-        try:
-            with open(file_path, 'r') as f:
-                ids = [line.strip() for line in f if line.strip()]
-                logging.info(f"Read {len(ids)} IDs from {file_path}")
-                return ids
-        except FileNotFoundError:
-            logging.warning(f"ID file not found: {file_path}")
-            return []
-
-    def _extract_batch_data(self) -> Dict[str, pd.DataFrame]:
-        album_ids = self._read_ids('album_ids.txt')
-        artist_ids = self._read_ids('artist_ids.txt')
-        track_ids = self._read_ids('track_ids.txt')
-        playlist_ids = self._read_ids('playlist_ids.txt')
-
-        def process_in_batches(id_list: List[str], batch_func, name: str) -> pd.DataFrame:
-            all_data = []
-            for i in range(0, len(id_list), 20):
-                batch = id_list[i:i + 20]
+    def _build_plan(self) -> RequestPlanner:
+        planner = RequestPlanner(self.db_manager.db_path)
+        # The ID files are still accepted as seeds; importing them only adds IDs the registry has not seen.
+        self.registry.import_files(str(self.id_dir))
+        if self.db_manager.incremental:
+            requeued = self.registry.requeue(BATCH_LIMITS,
+                                             fetched_before=int(time.time() - self.refresh_after_hours * 3600))
+        else:
+            requeued = self.registry.requeue(BATCH_LIMITS)
+        logging.info(f"ID registry: {requeued} previously fetched IDs are due again")
+        for entity in BATCH_LIMITS:
+            planner.add_registry(entity, self.registry)
+        if self.db_manager.incremental:
+            planner.drop_fresh(int(self.refresh_after_hours * 3600))
+        if self.resume:
+            planner.drop_landed()
+        if self.refresh_budget is not None:
+            RefreshScheduler(planner, self.refresh_budget).apply()
+        planner.log_plan(self.extractor.credentials.rate)
+        return planner
+
+    def _write_chunk(self, writer: StreamingWriter, entity: str, chunk: List[str], records: List[Dict]):
+        # An empty result usually means the request failed, so its IDs stay pending for a retry.
+        if not records:
+            self.registry.mark_failed(entity, chunk)
+            return
+        # Checkpoints are per ID, so a resumed plan with different chunk boundaries still recognises landed IDs.
+        # Registry statuses follow the commit: a crash or failed write leaves the IDs pending.
+        returned = [record[ID_KEYS[entity]] for record in records]
+        writer.put(entity, records, [(entity, entity_id, 0) for entity_id in chunk],
+                   on_commit=partial(self.registry.record_results, entity, chunk, returned))
+
+    def _extract_entities(self, writer: StreamingWriter, planner: RequestPlanner):
+        # Chunks are packed to each endpoint's limit, so every batch call is exactly one request.
+        album_chunks = planner.iter_chunks('albums')
+        artist_chunks = planner.iter_chunks('artists')
+        track_chunks = planner.iter_chunks('tracks')
+
+        if self.use_async:
+            self.extractor.stream_entities(album_chunks, artist_chunks, track_chunks,
+                                           lambda entity, chunk, records: self._write_chunk(writer, entity, chunk, records))
+            return
+
+        for chunks, batch_func, name in ((album_chunks, self.extractor.get_albums_batch, "albums"),
+                                         (artist_chunks, self.extractor.get_artists_batch, "artists"),
+                                         (track_chunks, self.extractor.get_tracks_batch, "tracks")):
+            for i, batch in enumerate(chunks):
                 data = batch_func(batch)
-                all_data.extend(data)
-                logging.info(f"Fetched {len(data)} {name} from batch {i // 20 + 1}")
-                time.sleep(0.3)  # Be gentle with rate limits
-            return pd.DataFrame(all_data)
+                self._write_chunk(writer, name, batch, data)
+                logging.info(f"Fetched {len(data)} {name} from batch {i + 1}")
 
-        albums_df = process_in_batches(album_ids, self.extractor.get_albums_batch, "albums")
-        artists_df = process_in_batches(artist_ids, self.extractor.get_artists_batch, "artists")
-        tracks_df = process_in_batches(track_ids, self.extractor.get_tracks_batch, "tracks")
+    @staticmethod
+    def _playlist_track_rows(playlist_id: str, tracks: List[Dict]) -> List[Dict]:
+        return [{
+            'playlist_id': playlist_id,
+            'track_id': track['track_id'],
+            'added_at': track['added_at']
+        } for track in tracks]
 
-        logging.info(f"Fetched {len(albums_df)} albums in total")
-        logging.info(f"Fetched {len(artists_df)} artists in total")
-        logging.info(f"Fetched {len(tracks_df)} tracks in total")
+    def _extract_playlists(self, writer: StreamingWriter, planner: RequestPlanner,
+                           on_tracks: Optional[Callable[[List[Dict]], None]] = None):
+        page_fields = PLAYLIST_CRAWL_FIELDS if on_tracks else PLAYLIST_PAGE_FIELDS
+        seen_owners = set()
+        done_playlists = self.checkpoints.get('playlists', {})
+        page_offsets = self.checkpoints.get('playlist_pages', {})
 
-        playlists = []
-        playlist_tracks = []
-        user_infos = {}
+        for playlist_ids in planner.iter_chunks('playlists'):
+            for pid in playlist_ids:
+                if pid in done_playlists:
+                    continue
 
-        for pid in playlist_ids:
-            playlist_info = self.extractor.get_playlist_info(pid)
-            time.sleep(0.3)
+                playlist_info = self.extractor.get_playlist_header(pid, page_fields)
+                if not playlist_info:
+                    logging.warning(f"Could not fetch playlist info for ID: {pid}")
+                    self.registry.mark_failed('playlists', [pid])
+                    continue
+                first_page = playlist_info.pop('tracks')
+                writer.put('playlists', [playlist_info])
 
-            if playlist_info:
-                playlists.append(playlist_info)
+                start_offset = page_offsets.get(pid, 0)
+                if start_offset:
+                    logging.info(f"Resume: continuing playlist {pid} from offset {start_offset}")
+                else:
+                    start_offset = min(PLAYLIST_PAGE_SIZE, playlist_info['total_tracks'])
+                    writer.put('playlist_tracks', self._playlist_track_rows(pid, first_page),
+                               [('playlist_pages', pid, start_offset)])
+                    if on_tracks:
+                        on_tracks(first_page)
+                for next_offset, tracks in self.extractor.iter_playlist_tracks(pid, start_offset,
+                                                                               playlist_info['total_tracks'],
+                                                                               page_fields):
+                    writer.put('playlist_tracks', self._playlist_track_rows(pid, tracks),
+                               [('playlist_pages', pid, next_offset)])
+                    if on_tracks:
+                        on_tracks(tracks)
 
                 owner_id = playlist_info.get('owner_id')
-                if owner_id and owner_id not in user_infos:
+                if owner_id and owner_id not in seen_owners:
+                    seen_owners.add(owner_id)
+                    self.registry.add('users', [owner_id], source='playlist')
                     user_info = self.extractor.get_user_info(owner_id)
-                    time.sleep(0.2)
                     if user_info:
-                        user_infos[owner_id] = user_info
+                        writer.put('users', [user_info],
+                                   on_commit=partial(self.registry.mark_fetched, 'users', [owner_id]))
                     else:
                         logging.warning(f"User info not found for owner_id: {owner_id}")
+                        self.registry.mark_failed('users', [owner_id])
 
-                for track in playlist_info['tracks']:
-                    playlist_tracks.append({
-                        'playlist_id': pid,
-                        'track_id': track['track_id'],
-                        'added_at': track['added_at']
-                    })
-            else:
-                logging.warning(f"Could not fetch playlist info for ID: {pid}")
-
-        playlists_df = pd.DataFrame(playlists)
-        playlist_tracks_df = pd.DataFrame(playlist_tracks)
-        users_df = pd.DataFrame(user_infos.values())
-
-        logging.info(f"Total playlists fetched: {len(playlists_df)}")
-        logging.info(f"Total users fetched: {len(users_df)}")
-
-        return {
-            'albums': albums_df,
-            'artists': artists_df,
-            'tracks': tracks_df,
-            'playlists': playlists_df,
-            'playlist_tracks': playlist_tracks_df,
-            'users': users_df
+                writer.checkpoint('playlists', pid, on_commit=partial(self.registry.mark_fetched, 'playlists', [pid]))
+
+    def _dispatch(self, writer: StreamingWriter, planner: RequestPlanner, entities: List[str],
+                  allow_partial: bool = False):
+        batch_funcs = {
+            'albums': self.extractor.get_albums_batch,
+            'artists': self.extractor.get_artists_batch,
+            'tracks': self.extractor.get_tracks_batch
         }
+        for entity in entities:
+            chunk = planner.take_chunk(entity, allow_partial)
+            while chunk:
+                # Crawled IDs enter the registry when first dispatched; seeds are already there.
+                self.registry.add(entity, chunk, source='crawl')
+                self._write_chunk(writer, entity, chunk, batch_funcs[entity](chunk))
+                chunk = planner.take_chunk(entity, allow_partial)
 
-    def run(self):
-        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    def _crawl(self, writer: StreamingWriter, planner: RequestPlanner):
+        # Discovery and extraction share one plan: every full chunk is fetched as soon as it is discovered.
+        crawler = EntityCrawler(self.extractor, planner, self.crawl_depth, self.crawl_budget)
+        self._dispatch(writer, planner, ['albums', 'artists', 'tracks'])
+        self._extract_playlists(writer, planner,
+                                on_tracks=lambda tracks: self._dispatch(writer, planner,
+                                                                        crawler.discover_tracks(tracks)))
+        for entity in crawler.expand():
+            self._dispatch(writer, planner, [entity])
+        self._dispatch(writer, planner, ['albums', 'artists', 'tracks'], allow_partial=True)
+        crawler.log_summary()
 
-        logging.info("Starting ETL pipeline with batch support...")
-        dataframes = self._extract_batch_data()
+    def _export_parquet(self):
+        # pyarrow is only needed for the export stage, so it is imported on demand.
+        from ParquetExporter import ParquetExporter
+        exporter = ParquetExporter(self.db_manager.db_path, self.parquet_dir)
+        try:
+            exporter.export()
+        finally:
+            exporter.close()
 
-        if all(df.empty for df in dataframes.values()):
-            logging.error("No data was extracted. Please check your ID files or API access.")
+    def _write_metrics(self):
+        metrics.log_summary()
+        json_path = self.metrics_dir / "run_metrics.json"
+        prom_path = self.metrics_dir / "run_metrics.prom"
+        metrics.write_json(str(json_path))
+        metrics.write_prometheus(str(prom_path))
+        logging.info(f"Run metrics written to {json_path} and {prom_path}")
+
+    def run(self):
+        logging.info("Starting streaming ETL pipeline...")
+        # Checkpoints are read up front because the writer thread owns the connection once it starts.
+        if self.resume:
+            self.checkpoints = {entity: self.db_manager.get_checkpoints(entity)
+                                for entity in ('playlists', 'playlist_pages')}
+        else:
+            self.db_manager.clear_checkpoints()
+        with metrics.stage('plan'):
+            planner = self._build_plan()
+            planned = sum(planner.planned_requests().values())
+        if self.plan_only:
+            planner.close()
+            self.registry.close()
+            self.db_manager.close()
             return
 
-        logging.info("Saving data to database...")
-        self.db_manager.save_data(dataframes)
+        # Index maintenance is deferred only for full rebuilds; incremental runs keep indexes for readers.
+        # 'load' spans the whole streaming load, including the index rebuild when the bulk load ends.
+        with metrics.stage('load'), self.db_manager.bulk_load(defer_indexes=not self.db_manager.incremental):
+            writer = StreamingWriter(self.db_manager, chunk_size=self.chunk_size).start()
+            try:
+                if self.crawl:
+                    with metrics.stage('crawl'):
+                        self._crawl(writer, planner)
+                else:
+                    with metrics.stage('entities'):
+                        self._extract_entities(writer, planner)
+                    with metrics.stage('playlists'):
+                        self._extract_playlists(writer, planner)
+            finally:
+                totals = writer.close()
+                planner.close()
+
+        # An empty plan is the steady state of an incremental run; an empty result of a non-empty plan is a failure.
+        if not planned:
+            logging.info("Nothing was due: the plan was empty, so no requests were made.")
+        elif not any(totals.values()):
+            logging.error("No data was extracted. Please check your ID files or API access.")
         self.db_manager.close()
+        self.registry.log_summary()
+        self.registry.close()
+        log_connection_stats()
+        self.extractor.credentials.log_stats()
+        if self.cache:
+            self.cache.log_stats()
+            self.cache.close()
+        if self.parquet_dir:
+            with metrics.stage('export'):
+                self._export_parquet()
+        self._write_metrics()
         logging.info("ETL pipeline completed and data saved to database.")
 
 
 if __name__ == "__main__":
-    pipeline = SpotifyETLPipeline()
+    parser = argparse.ArgumentParser(description="Extract Spotify data into the SQLite database")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="fetch albums, artists and tracks with the asyncio extractor")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="maximum number of requests in flight when --async is set")
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help="bypass the on-disk HTTP response cache")
+    parser.add_argument('--incremental', action='store_true',
+                        help="keep the existing database and upsert only new or changed rows")
+    parser.add_argument('--chunk-size', type=int, default=500,
+                        help="rows buffered before the background writer commits them")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip ID chunks and playlist pages already landed by an interrupted run")
+    parser.add_argument('--refresh-after', type=float, default=24.0, metavar='HOURS',
+                        help="in incremental mode, skip IDs fetched more recently than this")
+    parser.add_argument('--refresh-budget', type=int, default=None, metavar='REQUESTS',
+                        help="spend at most this many entity requests, on new IDs first and then on the most "
+                             "stale, volatile and important refreshes; implies --incremental and --no-cache")
+    parser.add_argument('--plan-only', action='store_true',
+                        help="print the planned request count and exit without fetching")
+    parser.add_argument('--crawl', action='store_true',
+                        help="expand seed playlists into their tracks, albums and artists in the same pass")
+    parser.add_argument('--crawl-depth', type=int, default=1,
+                        help="1 stops at playlist contents; higher values also expand albums and artists")
+    parser.add_argument('--crawl-budget', type=int, default=None, metavar='REQUESTS',
+                        help="maximum album/artist expansion requests spent by --crawl")
+    parser.add_argument('--keep-market-json', action='store_true',
+                        help="also store the JSON markets list next to the compact market_bits column")
+    parser.add_argument('--export-parquet', dest='parquet_dir', default=None, metavar='DIR',
+                        help="after loading, write changed tables and views as Parquet files to DIR")
+    parser.add_argument('--data-dir', default=None, metavar='DIR',
+                        help="read the ID files from DIR and keep the database, ID registry and HTTP cache there")
+    parser.add_argument('--schema-dir', default="spotify_db/schema")
+    parser.add_argument('--metrics-dir', default=None, metavar='DIR',
+                        help="where run_metrics.json and the Prometheus textfile run_metrics.prom are written "
+                             "(default: the database directory)")
+    parser.add_argument('--profile', action='append', default=[], choices=STAGES, metavar='STAGE',
+                        help="run this stage under cProfile and write STAGE.prof; may be repeated")
+    parser.add_argument('--trace-memory', action='append', default=[], choices=STAGES, metavar='STAGE',
+                        help="run this stage under tracemalloc and write its top allocations; may be repeated")
+    parser.add_argument('--profile-dir', default="spotify_db/profiles")
+    args = parser.parse_args()
+
+    metrics.configure_profiling(args.profile, args.trace_memory, args.profile_dir)
+    pipeline = SpotifyETLPipeline(use_async=args.use_async, concurrency=args.concurrency, use_cache=args.use_cache,
+                                  incremental=args.incremental, chunk_size=args.chunk_size, resume=args.resume,
+                                  refresh_after_hours=args.refresh_after, plan_only=args.plan_only,
+                                  crawl=args.crawl, crawl_depth=args.crawl_depth, crawl_budget=args.crawl_budget,
+                                  keep_market_json=args.keep_market_json, parquet_dir=args.parquet_dir,
+                                  data_dir=args.data_dir, schema_dir=args.schema_dir, metrics_dir=args.metrics_dir,
+                                  refresh_budget=args.refresh_budget)
     pipeline.run()
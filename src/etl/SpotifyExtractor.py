@@ -1,71 +1,90 @@
 import time
 import requests
-import base64
 import logging
-import os
-from datetime import datetime, timedelta
-from typing import Optional, Dict, List
-from dotenv import load_dotenv
+from typing import Optional, Dict, List, Iterator, Tuple
 import json
-import random
+from CredentialPool import CredentialPool
+from Metrics import metrics, endpoint_label
+from HttpSession import get_session, API_BASE_URL
+from ResponseCache import ResponseCache
+from concurrent.futures import ThreadPoolExecutor
+
+# Only the fields the extractor keeps are requested, which shrinks every playlist payload.
+PLAYLIST_PAGE_SIZE = 100
+PLAYLIST_PAGE_FIELDS = 'items(added_at,track(id,name))'
+PLAYLIST_CRAWL_FIELDS = 'items(added_at,track(id,name,album(id),artists(id)))'
+PLAYLIST_HEADER_FIELDS = 'id,name,owner(id),public,uri,tracks(total,{page_fields})'
 
 class SpotifyExtractor:
-    def __init__(self):
-        load_dotenv()
-        self.CLIENT_ID = os.getenv("CLIENT_ID")
-        self.CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-        self.access_token = None
-        self.token_expiry = None
+    def __init__(self, cache: Optional[ResponseCache] = None, page_concurrency: int = 4,
+                 credentials: Optional[CredentialPool] = None):
+        self.credentials = credentials or CredentialPool.from_env()
+        self.cache = cache
+        self.page_concurrency = page_concurrency
 
     def get_access_token(self) -> Optional[str]:
-        if self.access_token and datetime.now() < self.token_expiry:
-            return self.access_token
+        return self.credentials.authenticate()
 
-        auth_string = f"{self.CLIENT_ID}:{self.CLIENT_SECRET}"
-        auth_bytes = auth_string.encode('utf-8')
-        auth_base64 = base64.b64encode(auth_bytes).decode('utf-8')
+    @staticmethod
+    def _parse(label: str, body: bytes) -> Dict:
+        with metrics.timer('spotify_json_parse_seconds', endpoint=label):
+            return json.loads(body)
 
-        headers = {
-            'Authorization': f'Basic {auth_base64}',
-            'Content-Type': 'application/x-www-form-urlencoded'
-        }
-        data = {'grant_type': 'client_credentials'}
+    @staticmethod
+    def _record_response(label: str, status: int, seconds: float, size: int):
+        metrics.inc('spotify_requests_total', endpoint=label, status=status)
+        metrics.observe('spotify_request_seconds', seconds, endpoint=label)
+        metrics.inc('spotify_response_bytes_total', size, endpoint=label)
 
-        try:
-            response = requests.post('https://accounts.spotify.com/api/token',
-                                     headers=headers, data=data, timeout=10)
-            response.raise_for_status()
-            token_data = response.json()
-            self.access_token = token_data['access_token']
-            self.token_expiry = datetime.now() + timedelta(seconds=token_data['expires_in'] - 60)
-            return self.access_token
-        except Exception as e:
-            logging.error(f"Error getting access token: {str(e)}")
-            return None
+    @staticmethod
+    def _record_retry(label: str, reason: str, retry_after: float = 0.0):
+        metrics.inc('spotify_retries_total', endpoint=label, reason=reason)
+        if retry_after:
+            metrics.inc('spotify_retry_after_seconds_total', retry_after, endpoint=label)
 
     def make_request(self, endpoint: str, retries: int = 10, backoff: float = 1.0) -> Optional[Dict]:
+        label = endpoint_label(endpoint)
+        cached = self.cache.lookup(endpoint) if self.cache else None
+        if cached and cached.fresh:
+            return self._parse(label, cached.body)
+
         for attempt in range(retries):
-            headers = {'Authorization': f'Bearer {self.get_access_token()}'}
+            credential = self.credentials.acquire()
+            headers = {'Authorization': f'Bearer {credential.get_access_token()}'}
+            if cached and cached.etag:
+                headers['If-None-Match'] = cached.etag
             try:
-                response = requests.get(
-                    f'https://api.spotify.com/v1/{endpoint}',
+                started = time.perf_counter()
+                response = get_session().get(
+                    f'{API_BASE_URL}/{endpoint}',
                     headers=headers,
                     timeout=15
                 )
+                self._record_response(label, response.status_code, time.perf_counter() - started,
+                                      len(response.content))
 
                 if response.status_code == 200:
-                    time.sleep(random.uniform(0.1, 0.3))
-                    return response.json()
+                    self.credentials.on_success(credential)
+                    if self.cache:
+                        self.cache.store(endpoint, response.content, response.headers.get('ETag'))
+                    return self._parse(label, response.content)
+
+                elif response.status_code == 304 and cached:
+                    self.credentials.on_success(credential)
+                    self.cache.mark_revalidated(endpoint)
+                    return self._parse(label, cached.body)
 
                 elif response.status_code == 401:
                     logging.warning(f"Unauthorized for {endpoint}. Refreshing token and retrying...")
-                    self.access_token = None
+                    self._record_retry(label, 'unauthorized')
+                    credential.invalidate()
                     continue
 
                 elif response.status_code == 429:
                     retry_after = int(response.headers.get("Retry-After", "5"))
                     logging.warning(f"Rate limited for {endpoint}, retrying after {retry_after} seconds...")
-                    time.sleep(retry_after)
+                    self._record_retry(label, 'rate_limited', retry_after)
+                    self.credentials.on_rate_limited(credential, retry_after)
                     continue
 
                 else:
@@ -74,55 +93,95 @@ class SpotifyExtractor:
 
             except requests.exceptions.RequestException as e:
                 logging.warning(f"Attempt {attempt + 1}/{retries} failed for {endpoint}: {e}")
-                time.sleep(backoff * (2 ** attempt))
+                self._record_retry(label, 'network')
+                delay = backoff * (2 ** attempt)
+                metrics.inc('spotify_sleep_seconds_total', delay, reason='backoff')
+                time.sleep(delay)
                 continue
 
         logging.error(f"Exceeded max retries for {endpoint}")
         return None
 
-    def get_playlist_info(self, playlist_id: str) -> Optional[Dict]:
-        # Get general playlist info
-        data = self.make_request(f'playlists/{playlist_id}')
+    @staticmethod
+    def _parse_playlist_items(items: List[Dict]) -> List[Dict]:
+        tracks = []
+        for item in items:
+            track = item.get('track')
+            if not track:
+                continue
+            track_info = {
+                'added_at': item.get('added_at'),
+                'track_id': track.get('id'),
+                'track_name': track.get('name'),
+            }
+            # Present only when the page was requested with PLAYLIST_CRAWL_FIELDS.
+            if 'album' in track:
+                track_info['album_id'] = (track.get('album') or {}).get('id')
+            if 'artists' in track:
+                track_info['artist_ids'] = [artist.get('id') for artist in track.get('artists') or [] if artist]
+            tracks.append(track_info)
+        return tracks
+
+    def get_playlist_header(self, playlist_id: str, page_fields: str = PLAYLIST_PAGE_FIELDS) -> Optional[Dict]:
+        # The playlist object embeds the first page of tracks, returned under 'tracks'.
+        fields = PLAYLIST_HEADER_FIELDS.format(page_fields=page_fields)
+        data = self.make_request(f'playlists/{playlist_id}?fields={fields}')
         if not data:
             return None
 
         try:
-            playlist_info = {
+            return {
                 'playlist_id': data['id'],
                 'playlist_name': data['name'],
                 'owner_id': data['owner']['id'],
                 'total_tracks': data['tracks']['total'],
                 'public': bool(data.get('public', False)),
                 'playlist_uri': data['uri'],
-                'tracks': []
+                'tracks': self._parse_playlist_items(data['tracks'].get('items', []))
             }
+        except KeyError as e:
+            logging.error(f"Missing field in playlist data: {str(e)}")
+            return None
+
+    def _get_playlist_page(self, playlist_id: str, offset: int, page_fields: str) -> Optional[Dict]:
+        return self.make_request(f'playlists/{playlist_id}/tracks?limit={PLAYLIST_PAGE_SIZE}&offset={offset}'
+                                 f'&fields={page_fields}')
 
-            # Get all tracks using paging
-            offset = 0
-            limit = 100
+    def iter_playlist_tracks(self, playlist_id: str, start_offset: int = 0, total: Optional[int] = None,
+                             page_fields: str = PLAYLIST_PAGE_FIELDS) -> Iterator[Tuple[int, List[Dict]]]:
+        # Yields (next_offset, tracks) per page, in order, so callers can checkpoint mid-playlist.
+        if total is None:
+            offset = start_offset
             while True:
-                track_data = self.make_request(f'playlists/{playlist_id}/tracks?limit={limit}&offset={offset}')
+                track_data = self._get_playlist_page(playlist_id, offset, page_fields)
                 if not track_data or 'items' not in track_data:
                     break
-                for item in track_data['items']:
-                    track = item.get('track')
-                    if not track:
-                        continue
-                    track_info = {
-                        'added_at': item.get('added_at'),
-                        'track_id': track.get('id'),
-                        'track_name': track.get('name'),
-                    }
-                    playlist_info['tracks'].append(track_info)
+                offset += PLAYLIST_PAGE_SIZE
+                yield offset, self._parse_playlist_items(track_data['items'])
                 if track_data.get('next') is None:
                     break
-                offset += limit
+            return
 
-            return playlist_info
-        except KeyError as e:
-            logging.error(f"Missing field in playlist data: {str(e)}")
+        # With the total known every offset can be requested at once; map() hands pages back in order.
+        offsets = range(start_offset, total, PLAYLIST_PAGE_SIZE)
+        with ThreadPoolExecutor(max_workers=self.page_concurrency) as executor:
+            pages = executor.map(lambda offset: self._get_playlist_page(playlist_id, offset, page_fields), offsets)
+            for offset, track_data in zip(offsets, pages):
+                if not track_data or 'items' not in track_data:
+                    logging.warning(f"Missing page at offset {offset} for playlist {playlist_id}")
+                    break
+                yield offset + PLAYLIST_PAGE_SIZE, self._parse_playlist_items(track_data['items'])
+
+    def get_playlist_info(self, playlist_id: str) -> Optional[Dict]:
+        playlist_info = self.get_playlist_header(playlist_id)
+        if not playlist_info:
             return None
 
+        total = playlist_info['total_tracks']
+        for _, tracks in self.iter_playlist_tracks(playlist_id, min(PLAYLIST_PAGE_SIZE, total), total):
+            playlist_info['tracks'].extend(tracks)
+        return playlist_info
+
     def get_album_info(self, album_id: str) -> Optional[Dict]:
         data = self.make_request(f'albums/{album_id}')
         if not data:
@@ -202,6 +261,69 @@ class SpotifyExtractor:
             return None
 
 
+    def _parse_albums_batch(self, data: Dict) -> List[Dict]:
+        album_infos = []
+        for album in data.get('albums', []):
+            if album:
+                try:
+                    album_info = {
+                        'album_id': album['id'],
+                        'album_name': album['name'],
+                        'album_type': album['album_type'],
+                        'artist_id': ','.join([artist['id'] for artist in album.get('artists', [])]),
+                        'release_date': album['release_date'],
+                        'total_tracks': album['total_tracks'],
+                        'markets': json.dumps(album['available_markets']),
+                        'popularity': album.get('popularity', 0),
+                        'album_uri': album['uri']
+                    }
+                    album_infos.append(album_info)
+                except KeyError as e:
+                    logging.error(f"Album batch missing key: {e}")
+        return album_infos
+
+    def _parse_artists_batch(self, data: Dict) -> List[Dict]:
+        artist_infos = []
+        for artist in data.get('artists', []):
+            if artist:
+                try:
+                    artist_info = {
+                        'artist_id': artist['id'],
+                        'artist_name': artist['name'],
+                        'genres': json.dumps(artist['genres']),
+                        'followers': artist['followers']['total'],
+                        'popularity': artist['popularity'],
+                        'artist_uri': artist['uri']
+                    }
+                    artist_infos.append(artist_info)
+                except KeyError as e:
+                    logging.error(f"Artist batch missing key: {e}")
+        return artist_infos
+
+    def _parse_tracks_batch(self, data: Dict) -> List[Dict]:
+        track_infos = []
+        for track in data.get('tracks', []):
+            if track:
+                try:
+                    track_info = {
+                        'track_id': track['id'],
+                        'track_name': track['name'],
+                        'artist_id': track.get('artists', [{}])[0].get('id', ''),
+                        'album_id': track['album']['id'],
+                        'markets': json.dumps(track['available_markets']),
+                        'popularity': track['popularity'],
+                        'duration_ms': track['duration_ms'],
+                        'track_number': track['track_number'],
+                        'disc_number': track['disc_number'],
+                        'explicit': bool(track['explicit']),
+                        'local': bool(track['is_local']),
+                        'track_uri': track['uri']
+                    }
+                    track_infos.append(track_info)
+                except (KeyError, IndexError) as e:
+                    logging.error(f"Track batch missing field: {e}")
+        return track_infos
+
     def get_albums_batch(self, album_ids: List[str]) -> List[Dict]:
         all_album_infos = []
         for i in range(0, len(album_ids), 20):
@@ -210,23 +332,7 @@ class SpotifyExtractor:
             data = self.make_request(f'albums?ids={ids_param}')
             if not data:
                 continue
-            for album in data.get('albums', []):
-                if album:
-                    try:
-                        album_info = {
-                            'album_id': album['id'],
-                            'album_name': album['name'],
-                            'album_type': album['album_type'],
-                            'artist_id': ','.join([artist['id'] for artist in album.get('artists', [])]),
-                            'release_date': album['release_date'],
-                            'total_tracks': album['total_tracks'],
-                            'markets': json.dumps(album['available_markets']),
-                            'popularity': album.get('popularity', 0),
-                            'album_uri': album['uri']
-                        }
-                        all_album_infos.append(album_info)
-                    except KeyError as e:
-                        logging.error(f"Album batch missing key: {e}")
+            all_album_infos.extend(self._parse_albums_batch(data))
         return all_album_infos
 
     def get_artists_batch(self, artist_ids: List[str]) -> List[Dict]:
@@ -237,20 +343,7 @@ class SpotifyExtractor:
             data = self.make_request(f'artists?ids={ids_param}')
             if not data:
                 continue
-            for artist in data.get('artists', []):
-                if artist:
-                    try:
-                        artist_info = {
-                            'artist_id': artist['id'],
-                            'artist_name': artist['name'],
-                            'genres': json.dumps(artist['genres']),
-                            'followers': artist['followers']['total'],
-                            'popularity': artist['popularity'],
-                            'artist_uri': artist['uri']
-                        }
-                        all_artist_infos.append(artist_info)
-                    except KeyError as e:
-                        logging.error(f"Artist batch missing key: {e}")
+            all_artist_infos.extend(self._parse_artists_batch(data))
         return all_artist_infos
 
     def get_tracks_batch(self, track_ids: List[str]) -> List[Dict]:
@@ -261,24 +354,5 @@ class SpotifyExtractor:
             data = self.make_request(f'tracks?ids={ids_param}')
             if not data:
                 continue
-            for track in data.get('tracks', []):
-                if track:
-                    try:
-                        track_info = {
-                            'track_id': track['id'],
-                            'track_name': track['name'],
-                            'artist_id': track.get('artists', [{}])[0].get('id', ''),
-                            'album_id': track['album']['id'],
-                            'markets': json.dumps(track['available_markets']),
-                            'popularity': track['popularity'],
-                            'duration_ms': track['duration_ms'],
-                            'track_number': track['track_number'],
-                            'disc_number': track['disc_number'],
-                            'explicit': bool(track['explicit']),
-                            'local': bool(track['is_local']),
-                            'track_uri': track['uri']
-                        }
-                        all_track_infos.append(track_info)
-                    except (KeyError, IndexError) as e:
-                        logging.error(f"Track batch missing field: {e}")
+            all_track_infos.extend(self._parse_tracks_batch(data))
         return all_track_infos
@@ -0,0 +1,86 @@
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+from DatabaseManager import DatabaseManager
+from Metrics import metrics
+
+_STOP = object()
+
+
+class StreamingWriter:
+    def __init__(self, db_manager: DatabaseManager, chunk_size: int = 500, max_pending: int = 16):
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+        # A bounded queue gives backpressure: fetchers block instead of piling records up in memory.
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.buffers = defaultdict(list)
+        self.buffered_rows = 0
+        self.pending_checkpoints = []
+        self.pending_callbacks = []
+        self.rows_saved = defaultdict(int)
+        self.failed_chunks = 0
+        self.thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def put(self, table: str, rows: List[Dict], checkpoints: List[Tuple[str, str, int]] = (),
+            on_commit: Optional[Callable[[], None]] = None):
+        # on_commit runs on the writer thread once the rows and checkpoints are committed, and never if they fail.
+        if rows or checkpoints or on_commit:
+            self.queue.put((table, rows, list(checkpoints), on_commit))
+
+    def checkpoint(self, entity: str, chunk_key: str, position: int = 0,
+                   on_commit: Optional[Callable[[], None]] = None):
+        self.queue.put((None, [], [(entity, chunk_key, position)], on_commit))
+
+    def _flush(self):
+        if not self.buffered_rows and not self.pending_checkpoints and not self.pending_callbacks:
+            return
+        records = dict(self.buffers)
+        started = time.perf_counter()
+        saved = self.db_manager.save_rows(records, self.pending_checkpoints)
+        metrics.observe('spotify_db_write_seconds', time.perf_counter() - started)
+        if saved:
+            for table, rows in records.items():
+                self.rows_saved[table] += len(rows)
+                metrics.inc('spotify_db_rows_total', len(rows), table=table)
+            for callback in self.pending_callbacks:
+                try:
+                    callback()
+                except Exception:
+                    logging.exception("Post-commit callback failed")
+        else:
+            self.failed_chunks += 1
+            logging.error(f"Failed to write {self.buffered_rows} buffered rows")
+        self.buffers.clear()
+        self.buffered_rows = 0
+        self.pending_checkpoints = []
+        self.pending_callbacks = []
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                self._flush()
+                return
+            table, rows, checkpoints, on_commit = item
+            if rows:
+                self.buffers[table].extend(rows)
+                self.buffered_rows += len(rows)
+            self.pending_checkpoints.extend(checkpoints)
+            if on_commit:
+                self.pending_callbacks.append(on_commit)
+            if self.buffered_rows >= self.chunk_size:
+                self._flush()
+
+    def close(self) -> Dict[str, int]:
+        self.queue.put(_STOP)
+        self.thread.join()
+        for table, count in self.rows_saved.items():
+            logging.info(f"Streamed {count} rows to {table}")
+        return dict(self.rows_saved)
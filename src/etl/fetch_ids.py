@@ -1,23 +1,58 @@
+import argparse
 import requests
 import base64
+import heapq
+import itertools
 import random
 import logging
 from dotenv import load_dotenv
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from RateLimiter import get_shared_limiter
+from HttpSession import get_session, log_connection_stats, API_BASE_URL, TOKEN_URL
+from IdRegistry import IdRegistry
+
+SEARCH_PAGE_SIZE = 50
+# The search endpoint rejects offsets past 1000.
+SEARCH_MAX_OFFSET = 1000
+SEARCH_TERMS = [
+    '%25a%25', '%25b%25', '%25c%25', '%25d%25', '%25e%25', 
+    '%25f%25', '%25g%25', '%25h%25', '%25i%25', '%25j%25',
+    '%25k%25', '%25l%25', '%25m%25', '%25n%25', '%25o%25',
+    '%25p%25', '%25q%25', '%25r%25', '%25s%25', '%25t%25',
+    '%25u%25', '%25v%25', '%25w%25', '%25x%25', '%25y%25', '%25z%25',
+    '%25the%25', '%25and%25', '%25you%25', '%25that%25', '%25have%25',
+    '%25for%25', '%25with%25', '%25this%25', '%25from%25', '%25they%25',
+    '%25music%25', '%25song%25', '%25tune%25', '%25beat%25', '%25melody%25',
+    '%25rhythm%25', '%25sound%25', '%25track%25', '%25album%25', '%25artist%25',
+    '%25band%25', '%25singer%25', '%25vocal%25', '%25lyric%25', '%25chord%25',
+    '%25pop%25', '%25rock%25', '%25jazz%25', '%25blues%25', '%25hiphop%25',
+    '%25rap%25', '%25edm%25', '%25electronic%25', '%25classical%25', '%25country%25',
+    '%25rnb%25', '%25reggae%25', '%25metal%25', '%25punk%25', '%25indie%25',
+    '%25happy%25', '%25sad%25', '%25love%25', '%25heart%25', '%25cool%25',
+    '%25hot%25', '%25chill%25', '%25party%25', '%25dance%25', '%25sleep%25',
+    '%25energy%25', '%25calm%25', '%25romantic%25', '%25summer%25', '%25winter%25',
+    '%25mix%25', '%25best%25', '%25top%25', '%25great%25', '%25awesome%25',
+    '%25hit%25', '%25now%25', '%25new%25', '%25old%25', '%25gold%25',
+    '%25fm%25', '%25radio%25', '%25live%25', '%25cover%25', '%25remix%25',
+    '%252023%25', '%252022%25', '%252021%25', '%252020%25', '%2519%25',
+    '%2590s%25', '%2580s%25', '%2570s%25', '%2560s%25', '%2550s%25',
+    '%25usa%25', '%25uk%25', '%25europe%25', '%25asia%25', '%25africa%25',
+    '%25latin%25', '%25kpop%25', '%25jpop%25', '%25french%25', '%25german%25'
+]
 
 def get_access_token():
     load_dotenv()
     CLIENT_ID = os.getenv("CLIENT_ID")
     CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-    token_url = 'https://accounts.spotify.com/api/token'
     headers = {
         'Authorization': f"Basic {base64.b64encode(f'{CLIENT_ID}:{CLIENT_SECRET}'.encode()).decode()}",
     }
     data = {
         'grant_type': 'client_credentials'
     }
-    response = requests.post(token_url, headers=headers, data=data)
+    response = get_session().post(TOKEN_URL, headers=headers, data=data)
     if response.status_code == 200:
         token_data = response.json()
         return token_data['access_token']
@@ -26,15 +61,18 @@ def get_access_token():
         return None
 
 def fetch_with_retry(url, headers, max_retries=3):
+    rate_limiter = get_shared_limiter()
     for attempt in range(max_retries):
+        rate_limiter.acquire()
         try:
-            response = requests.get(url, headers=headers)
+            response = get_session().get(url, headers=headers)
             if response.status_code == 200:
+                rate_limiter.on_success()
                 return response
             elif response.status_code == 429:  
                 retry_after = int(response.headers.get('Retry-After', 5))
                 logging.warning(f"Rate limited. Retrying after {retry_after} seconds...")
-                time.sleep(retry_after)
+                rate_limiter.on_rate_limited(retry_after)
                 continue
             else:
                 logging.error(f"Error: {response.status_code} - {response.text}")
@@ -46,74 +84,67 @@ def fetch_with_retry(url, headers, max_retries=3):
             time.sleep(2 ** attempt)  
     return None
 
-def get_random_ids(access_token, item_type, count=40):
-    base_url = 'https://api.spotify.com/v1/search'
+def get_random_ids(access_token, item_type, count=40, known=None, concurrency=8, min_yield=0.2):
+    # Terms are explored concurrently and paged deeper only while they keep producing new IDs;
+    # `known` filters out IDs we already have, so `count` means genuinely new IDs.
+    base_url = f'{API_BASE_URL}/search'
     headers = {
         'Authorization': f'Bearer {access_token}',
         'Content-Type': 'application/json'
     }
 
-    search_terms = [
-        '%25a%25', '%25b%25', '%25c%25', '%25d%25', '%25e%25', 
-        '%25f%25', '%25g%25', '%25h%25', '%25i%25', '%25j%25',
-        '%25k%25', '%25l%25', '%25m%25', '%25n%25', '%25o%25',
-        '%25p%25', '%25q%25', '%25r%25', '%25s%25', '%25t%25',
-        '%25u%25', '%25v%25', '%25w%25', '%25x%25', '%25y%25', '%25z%25',
-        '%25the%25', '%25and%25', '%25you%25', '%25that%25', '%25have%25',
-        '%25for%25', '%25with%25', '%25this%25', '%25from%25', '%25they%25',
-        '%25music%25', '%25song%25', '%25tune%25', '%25beat%25', '%25melody%25',
-        '%25rhythm%25', '%25sound%25', '%25track%25', '%25album%25', '%25artist%25',
-        '%25band%25', '%25singer%25', '%25vocal%25', '%25lyric%25', '%25chord%25',
-        '%25pop%25', '%25rock%25', '%25jazz%25', '%25blues%25', '%25hiphop%25',
-        '%25rap%25', '%25edm%25', '%25electronic%25', '%25classical%25', '%25country%25',
-        '%25rnb%25', '%25reggae%25', '%25metal%25', '%25punk%25', '%25indie%25',
-        '%25happy%25', '%25sad%25', '%25love%25', '%25heart%25', '%25cool%25',
-        '%25hot%25', '%25chill%25', '%25party%25', '%25dance%25', '%25sleep%25',
-        '%25energy%25', '%25calm%25', '%25romantic%25', '%25summer%25', '%25winter%25',
-        '%25mix%25', '%25best%25', '%25top%25', '%25great%25', '%25awesome%25',
-        '%25hit%25', '%25now%25', '%25new%25', '%25old%25', '%25gold%25',
-        '%25fm%25', '%25radio%25', '%25live%25', '%25cover%25', '%25remix%25',
-        '%252023%25', '%252022%25', '%252021%25', '%252020%25', '%2519%25',
-        '%2590s%25', '%2580s%25', '%2570s%25', '%2560s%25', '%2550s%25',
-        '%25usa%25', '%25uk%25', '%25europe%25', '%25asia%25', '%25africa%25',
-        '%25latin%25', '%25kpop%25', '%25jpop%25', '%25french%25', '%25german%25'
-    ]
-
-    random.shuffle(search_terms)
-
-    ids = set()
-    for term in search_terms:
-        if len(ids) >= count:
-            break
-
-        url = f"{base_url}?q={term}&type={item_type}&limit=50"
-        response = fetch_with_retry(url, headers)
-
-        if response and response.status_code == 200:
-            items = response.json().get(f"{item_type}s", {}).get("items", [])
-            for item in items:
-                if item and 'id' in item:
-                    ids.add(item['id'])
-
-        time.sleep(0.5)
-
-    return random.sample(list(ids), min(count, len(ids))) if ids else []
-
-def save_ids_to_file(ids, filename):
-    existing_ids = set()
-    if os.path.exists(filename):
-        with open(filename, 'r') as file:
-            existing_ids = set(line.strip() for line in file.readlines())
-
-    new_ids = set(ids) - existing_ids
-
-    with open(filename, 'a') as file:
-        for id in new_ids:
-            file.write(f"{id}\n")
-
-    return len(new_ids)
-
-def main():
+    terms = SEARCH_TERMS[:]
+    random.shuffle(terms)
+    order = itertools.count()
+    # Max-heap on observed yield; untried terms get an optimistic 1.0 so each is sampled once first.
+    frontier = [(-1.0, next(order), term, 0) for term in terms]
+    heapq.heapify(frontier)
+
+    seen = set()
+    new_ids = []
+    requests_sent = 0
+    retired = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = {}
+        while (frontier or in_flight) and len(new_ids) < count:
+            while frontier and len(in_flight) < concurrency:
+                _, _, term, offset = heapq.heappop(frontier)
+                url = f"{base_url}?q={term}&type={item_type}&limit={SEARCH_PAGE_SIZE}&offset={offset}"
+                in_flight[executor.submit(fetch_with_retry, url, headers)] = (term, offset)
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                term, offset = in_flight.pop(future)
+                response = future.result()
+                requests_sent += 1
+                if not response or response.status_code != 200:
+                    retired += 1
+                    continue
+
+                page = response.json().get(f"{item_type}s", {})
+                ids = [item['id'] for item in page.get('items', []) if item and 'id' in item]
+                fresh = [entity_id for entity_id in dict.fromkeys(ids) if entity_id not in seen]
+                seen.update(fresh)
+                if known and fresh:
+                    already_known = known(fresh)
+                    fresh = [entity_id for entity_id in fresh if entity_id not in already_known]
+                new_ids.extend(fresh)
+
+                term_yield = len(fresh) / len(ids) if ids else 0.0
+                next_offset = offset + SEARCH_PAGE_SIZE
+                if page.get('next') and next_offset < SEARCH_MAX_OFFSET and term_yield >= min_yield:
+                    heapq.heappush(frontier, (-term_yield, next(order), term, next_offset))
+                else:
+                    retired += 1
+
+        for future in in_flight:
+            future.cancel()
+
+    logging.info(f"Search for {item_type}s: {len(new_ids)} new IDs from {requests_sent} requests "
+                 f"({len(seen)} distinct hits, {retired} terms retired)")
+    return new_ids[:count]
+
+def main(count=50, concurrency=8, min_yield=0.2):
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     access_token = get_access_token()
 
@@ -121,13 +152,26 @@ def main():
         logging.error("Failed to get access token. Exiting.")
         return
 
-    album_count = save_ids_to_file(get_random_ids(access_token, 'album', 50), 'album_ids.txt')
-    artist_count = save_ids_to_file(get_random_ids(access_token, 'artist', 50), 'artist_ids.txt')
-    track_count = save_ids_to_file(get_random_ids(access_token, 'track', 50), 'track_ids.txt')
-    playlist_count = save_ids_to_file(get_random_ids(access_token, 'playlist', 50), 'playlist_ids.txt')
+    # New IDs go to the registry, which answers membership from its primary key instead of re-reading files.
+    registry = IdRegistry()
+    added = {}
+    for item_type in ('album', 'artist', 'track', 'playlist'):
+        entity = f"{item_type}s"
+        ids = get_random_ids(access_token, item_type, count, known=lambda ids: registry.known(entity, ids),
+                             concurrency=concurrency, min_yield=min_yield)
+        added[entity] = registry.add(entity, ids, source='search')
+    registry.close()
 
-    logging.info(f"Added {album_count} new albums, {artist_count} new artists, "
-                 f"{track_count} new tracks, {playlist_count} new playlists to files.")
+    logging.info(f"Added {added['albums']} new albums, {added['artists']} new artists, "
+                 f"{added['tracks']} new tracks, {added['playlists']} new playlists to the ID registry.")
+    log_connection_stats()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Discover new Spotify IDs through the search endpoint")
+    parser.add_argument('--count', type=int, default=50, help="new IDs wanted per entity type")
+    parser.add_argument('--concurrency', type=int, default=8, help="search requests in flight")
+    parser.add_argument('--min-yield', type=float, default=0.2,
+                        help="stop paging a term once fewer than this share of its hits are new")
+    args = parser.parse_args()
+
+    main(args.count, args.concurrency, args.min_yield)
@@ -0,0 +1,356 @@
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import random
+import secrets
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, quote, urlparse
+
+BASE62 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+MARKETS = ['AD', 'AR', 'AT', 'AU', 'BE', 'BG', 'BR', 'CA', 'CH', 'CL', 'CO', 'CZ', 'DE', 'DK', 'EE', 'ES',
+           'FI', 'FR', 'GB', 'GR', 'HK', 'HU', 'ID', 'IE', 'IL', 'IN', 'IS', 'IT', 'JP', 'KR', 'LT', 'MX',
+           'MY', 'NL', 'NO', 'NZ', 'PH', 'PL', 'PT', 'SE', 'SG', 'TH', 'TR', 'TW', 'US', 'VN', 'ZA']
+GENRES = ['pop', 'rock', 'indie', 'jazz', 'blues', 'hip hop', 'rap', 'edm', 'house', 'techno', 'classical',
+          'country', 'r&b', 'soul', 'reggae', 'metal', 'punk', 'k-pop', 'j-pop', 'latin', 'folk', 'ambient']
+ALBUM_TYPES = ['album', 'single', 'compilation']
+# Batch size limits of the real endpoints; larger requests get a 400 like the real API.
+BATCH_LIMITS = {'albums': 20, 'artists': 50, 'tracks': 50}
+SEARCH_MAX_OFFSET = 1000
+
+
+def make_id(kind: str, n: int) -> str:
+    # Deterministic 22-character base62 IDs, so ID files and crawled references name the same catalog.
+    value = int.from_bytes(hashlib.blake2b(f"{kind}:{n}".encode(), digest_size=16).digest(), 'big')
+    chars = []
+    for _ in range(22):
+        value, digit = divmod(value, 62)
+        chars.append(BASE62[digit])
+    return ''.join(chars)
+
+
+class Catalog:
+    # Every object is generated from its own ID, so the catalog needs no storage and any ID resolves.
+    def __init__(self, size: int = 100000, max_playlist_tracks: int = 300):
+        self.size = size
+        self.max_playlist_tracks = max_playlist_tracks
+
+    def _rng(self, kind: str, entity_id: str) -> random.Random:
+        return random.Random(f"{kind}:{entity_id}")
+
+    def _ref(self, rng: random.Random, kind: str) -> str:
+        return make_id(kind, rng.randrange(self.size))
+
+    def artist(self, artist_id: str) -> Dict:
+        rng = self._rng('artist', artist_id)
+        return {
+            'id': artist_id,
+            'name': f"Artist {artist_id[:6]}",
+            'genres': rng.sample(GENRES, rng.randint(0, 3)),
+            'followers': {'href': None, 'total': int(10 ** rng.uniform(1, 7.5))},
+            'popularity': rng.randint(0, 100),
+            'type': 'artist',
+            'uri': f"spotify:artist:{artist_id}"
+        }
+
+    def album(self, album_id: str) -> Dict:
+        rng = self._rng('album', album_id)
+        artists = [{'id': self._ref(rng, 'artist'), 'type': 'artist'} for _ in range(rng.randint(1, 2))]
+        return {
+            'id': album_id,
+            'name': f"Album {album_id[:6]}",
+            'album_type': rng.choice(ALBUM_TYPES),
+            'artists': artists,
+            'release_date': f"{rng.randint(1960, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'total_tracks': rng.randint(1, 20),
+            'available_markets': rng.sample(MARKETS, rng.randint(0, len(MARKETS))),
+            'popularity': rng.randint(0, 100),
+            'type': 'album',
+            'uri': f"spotify:album:{album_id}"
+        }
+
+    def track(self, track_id: str) -> Dict:
+        rng = self._rng('track', track_id)
+        return {
+            'id': track_id,
+            'name': f"Track {track_id[:6]}",
+            'artists': [{'id': self._ref(rng, 'artist'), 'type': 'artist'}],
+            'album': {'id': self._ref(rng, 'album'), 'type': 'album'},
+            'available_markets': rng.sample(MARKETS, rng.randint(0, len(MARKETS))),
+            'popularity': rng.randint(0, 100),
+            'duration_ms': rng.randint(60000, 420000),
+            'track_number': rng.randint(1, 20),
+            'disc_number': 1,
+            'explicit': rng.random() < 0.2,
+            'is_local': False,
+            'type': 'track',
+            'uri': f"spotify:track:{track_id}"
+        }
+
+    def user(self, user_id: str) -> Dict:
+        rng = self._rng('user', user_id)
+        return {
+            'id': user_id,
+            'display_name': f"User {user_id[:6]}",
+            'followers': {'href': None, 'total': rng.randint(0, 50000)},
+            'type': 'user',
+            'uri': f"spotify:user:{user_id}"
+        }
+
+    def playlist_total(self, playlist_id: str) -> int:
+        return self._rng('playlist', playlist_id).randint(0, self.max_playlist_tracks)
+
+    def playlist_items(self, playlist_id: str, offset: int, limit: int) -> List[Dict]:
+        items = []
+        for position in range(offset, min(offset + limit, self.playlist_total(playlist_id))):
+            rng = random.Random(f"playlist:{playlist_id}:{position}")
+            track = self.track(self._ref(rng, 'track'))
+            items.append({
+                'added_at': f"20{rng.randint(10, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00Z",
+                'track': {'id': track['id'], 'name': track['name'], 'album': track['album'],
+                          'artists': track['artists']}
+            })
+        return items
+
+    def playlist(self, playlist_id: str, base_url: str, page_size: int = 100) -> Dict:
+        rng = self._rng('playlist', playlist_id)
+        return {
+            'id': playlist_id,
+            'name': f"Playlist {playlist_id[:6]}",
+            'owner': {'id': make_id('user', rng.randrange(max(1, self.size // 10)))},
+            'public': rng.random() < 0.8,
+            'uri': f"spotify:playlist:{playlist_id}",
+            'tracks': self.playlist_page(playlist_id, 0, page_size, base_url)
+        }
+
+    def playlist_page(self, playlist_id: str, offset: int, limit: int, base_url: str) -> Dict:
+        total = self.playlist_total(playlist_id)
+        next_offset = offset + limit
+        return {
+            'items': self.playlist_items(playlist_id, offset, limit),
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'next': f"{base_url}/playlists/{playlist_id}/tracks?offset={next_offset}&limit={limit}"
+            if next_offset < total else None
+        }
+
+    def search(self, query: str, item_type: str, offset: int, limit: int, base_url: str) -> Dict:
+        # A query matches a deterministic slice of the catalog, so overlapping terms return overlapping IDs.
+        start = int.from_bytes(hashlib.blake2b(query.encode(), digest_size=8).digest(), 'big')
+        stop = min(offset + limit, SEARCH_MAX_OFFSET)
+        items = [{'id': make_id(item_type, (start + position * 7919) % self.size), 'type': item_type}
+                 for position in range(offset, stop)]
+        return {
+            'items': items,
+            'total': SEARCH_MAX_OFFSET,
+            'offset': offset,
+            'limit': limit,
+            'next': None if stop >= SEARCH_MAX_OFFSET else
+            f"{base_url}/search?q={quote(query)}&type={item_type}&offset={stop}&limit={limit}"
+        }
+
+
+class MockSpotifyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), catalog: Optional[Catalog] = None, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, error_rate_429: float = 0.0, error_rate_5xx: float = 0.0,
+                 retry_after: int = 1, rps_limit: Optional[float] = None, token_ttl: int = 3600):
+        super().__init__(address, MockSpotifyHandler)
+        self.catalog = catalog or Catalog()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate_429 = error_rate_429
+        self.error_rate_5xx = error_rate_5xx
+        self.retry_after = retry_after
+        self.rps_limit = rps_limit
+        self.token_ttl = token_ttl
+        self.tokens = {}
+        self.buckets = {}
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def api_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+    @property
+    def token_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/api/token"
+
+    def env(self) -> Dict[str, str]:
+        return {'SPOTIFY_API_URL': self.api_url, 'SPOTIFY_TOKEN_URL': self.token_url}
+
+    def start(self) -> 'MockSpotifyServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def record(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+    def issue_token(self, client_id: str) -> str:
+        token = secrets.token_hex(16)
+        with self._lock:
+            self.tokens[token] = (client_id, time.monotonic() + self.token_ttl)
+        return token
+
+    def client_for(self, token: str) -> Optional[str]:
+        with self._lock:
+            client_id, expires_at = self.tokens.get(token, (None, 0))
+        return client_id if time.monotonic() < expires_at else None
+
+    def over_limit(self, client_id: str) -> bool:
+        # Per-client token bucket, mirroring the per-app rolling budget of the real API.
+        if not self.rps_limit:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self.buckets.get(client_id, (self.rps_limit, now))
+            tokens = min(self.rps_limit, tokens + (now - updated) * self.rps_limit)
+            if tokens < 1:
+                self.buckets[client_id] = (tokens, now)
+                return True
+            self.buckets[client_id] = (tokens - 1, now)
+            return False
+
+
+class MockSpotifyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, delayed ACKs add ~40 ms to each keep-alive response.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: Optional[Dict] = None, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"' if status == 200 else None
+        if etag and self.headers.get('If-None-Match') == etag:
+            status, body = 304, b''
+        if body and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)
+            headers = {**(headers or {}), 'Content-Encoding': 'gzip'}
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.record(f"status_{status}")
+
+    def _error(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        self._send(status, {'error': {'status': status, 'message': message}}, headers)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        if urlparse(self.path).path != '/api/token' or form.get('grant_type') != ['client_credentials']:
+            self._error(400, "unsupported request")
+            return
+        self.server.record('token')
+        authorization = self.headers.get('Authorization', '')
+        client_id = authorization[6:] if authorization.startswith('Basic ') else 'anonymous'
+        self._send(200, {'access_token': self.server.issue_token(client_id), 'token_type': 'Bearer',
+                         'expires_in': self.server.token_ttl})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        server = self.server
+
+        if parts == ['_stats']:
+            self._send(200, server.stats())
+            return
+        if len(parts) < 2 or parts[0] != 'v1':
+            self._error(404, "not found")
+            return
+        resource = parts[1]
+        server.record(f"endpoint_{resource}" + ("_tracks" if parts[-1] == 'tracks' and len(parts) == 4 else ""))
+
+        authorization = self.headers.get('Authorization', '')
+        client_id = server.client_for(authorization[7:]) if authorization.startswith('Bearer ') else None
+        if client_id is None:
+            self._error(401, "The access token expired")
+            return
+
+        if server.latency_ms or server.jitter_ms:
+            time.sleep(max(0.0, random.gauss(server.latency_ms, server.jitter_ms)) / 1000)
+        if server.over_limit(client_id) or random.random() < server.error_rate_429:
+            self._error(429, "API rate limit exceeded", {'Retry-After': str(server.retry_after)})
+            return
+        if random.random() < server.error_rate_5xx:
+            self._error(random.choice([500, 502, 503]), "Server error")
+            return
+
+        catalog = server.catalog
+        if len(parts) == 2 and resource in BATCH_LIMITS:
+            ids = [entity_id for entity_id in query.get('ids', '').split(',') if entity_id]
+            if not ids or len(ids) > BATCH_LIMITS[resource]:
+                self._error(400, "invalid ids")
+                return
+            build = getattr(catalog, resource[:-1])
+            self._send(200, {resource: [build(entity_id) for entity_id in ids]})
+        elif len(parts) == 3 and resource in BATCH_LIMITS:
+            self._send(200, getattr(catalog, resource[:-1])(parts[2]))
+        elif resource == 'playlists' and len(parts) == 3:
+            self._send(200, catalog.playlist(parts[2], server.api_url))
+        elif resource == 'playlists' and len(parts) == 4 and parts[3] == 'tracks':
+            offset = int(query.get('offset', 0))
+            limit = min(int(query.get('limit', 100)), 100)
+            self._send(200, catalog.playlist_page(parts[2], offset, limit, server.api_url))
+        elif resource == 'users' and len(parts) == 3:
+            self._send(200, catalog.user(parts[2]))
+        elif resource == 'search' and len(parts) == 2:
+            offset = int(query.get('offset', 0))
+            limit = min(int(query.get('limit', 20)), 50)
+            if 'q' not in query or 'type' not in query or offset > SEARCH_MAX_OFFSET:
+                self._error(400, "invalid search")
+                return
+            self._send(200, {f"{item_type}s": catalog.search(query['q'], item_type, offset, limit, server.api_url)
+                             for item_type in query['type'].split(',')})
+        else:
+            self._error(404, "not found")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Spotify Web API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--catalog-size', type=int, default=100000,
+                        help="number of distinct IDs per entity type that references are drawn from")
+    parser.add_argument('--max-playlist-tracks', type=int, default=300)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="mean added latency per API request")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="standard deviation of the added latency")
+    parser.add_argument('--error-rate-429', type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument('--error-rate-5xx', type=float, default=0.0, help="fraction of requests answered with 5xx")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with every 429")
+    parser.add_argument('--rps-limit', type=float, default=None,
+                        help="per-client request rate above which requests are answered with 429")
+    parser.add_argument('--token-ttl', type=int, default=3600)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = MockSpotifyServer((args.host, args.port), Catalog(args.catalog_size, args.max_playlist_tracks),
+                               args.latency_ms, args.jitter_ms, args.error_rate_429, args.error_rate_5xx,
+                               args.retry_after, args.rps_limit, args.token_ttl)
+    logging.info(f"Mock Spotify API listening; point the extractors at it with "
+                 f"SPOTIFY_API_URL={server.api_url} SPOTIFY_TOKEN_URL={server.token_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,229 @@
+import argparse
+import json
+import logging
+import os
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+ETL_DIR = REPO_ROOT / "src" / "etl"
+DB_DIR = REPO_ROOT / "db"
+
+from mock_spotify_api import Catalog, MockSpotifyServer, make_id
+
+ENTITY_TABLES = ('albums', 'artists', 'tracks', 'playlists', 'playlist_tracks', 'users')
+ID_FILES = {'album': 'album_ids.txt', 'artist': 'artist_ids.txt', 'track': 'track_ids.txt',
+            'playlist': 'playlist_ids.txt'}
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def format_table(rows: List[list], headers: List[str]) -> str:
+    # Numbers are right-aligned and everything else left-aligned, in a plain fixed-width layout.
+    cells = [headers] + [['' if value is None else str(value) for value in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    numeric = [all(isinstance(row[i], (int, float)) or row[i] is None for row in rows) for i in range(len(headers))]
+    lines = ['  '.join(cell.rjust(width) if is_numeric else cell.ljust(width)
+                       for cell, width, is_numeric in zip(row, widths, numeric)).rstrip() for row in cells]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return '\n'.join(lines)
+
+
+def write_id_files(data_dir: Path, scale: int, playlist_ratio: float):
+    # Seed IDs come from the same deterministic catalog the mock server resolves references in.
+    counts = {'album': scale, 'artist': scale, 'track': scale, 'playlist': max(1, int(scale * playlist_ratio))}
+    for kind, filename in ID_FILES.items():
+        with open(data_dir / filename, 'w') as f:
+            f.writelines(f"{make_id(kind, n)}\n" for n in range(counts[kind]))
+
+
+def run_worker(args):
+    # Runs inside the child process, so peak RSS covers the pipeline alone.
+    sys.path[:0] = [str(ETL_DIR), str(DB_DIR)]
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    from SpotifyExtractor import SpotifyExtractor
+    from AsyncSpotifyExtractor import AsyncSpotifyExtractor
+    from SpotifyBatchETL import SpotifyETLPipeline
+
+    # Latency is timed per make_request call, so it includes rate-limiter waits and retries.
+    latencies = []
+    make_request = SpotifyExtractor.make_request
+    make_request_async = AsyncSpotifyExtractor.make_request_async
+
+    def timed_request(self, *a, **kw):
+        started = time.perf_counter()
+        try:
+            return make_request(self, *a, **kw)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    async def timed_request_async(self, *a, **kw):
+        started = time.perf_counter()
+        try:
+            return await make_request_async(self, *a, **kw)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    SpotifyExtractor.make_request = timed_request
+    AsyncSpotifyExtractor.make_request_async = timed_request_async
+
+    started = time.perf_counter()
+    pipeline = SpotifyETLPipeline(use_async=args.use_async, concurrency=args.concurrency, use_cache=False,
+                                  crawl=args.crawl, data_dir=args.data_dir, schema_dir=str(DB_DIR / "schema"))
+    pipeline.run()
+    elapsed = time.perf_counter() - started
+
+    search_seconds = None
+    if args.search_count:
+        import fetch_ids
+        search_started = time.perf_counter()
+        token = fetch_ids.get_access_token()
+        for item_type in ID_FILES:
+            fetch_ids.get_random_ids(token, item_type, args.search_count)
+        search_seconds = time.perf_counter() - search_started
+
+    conn = sqlite3.connect(Path(args.data_dir) / "spotify.db")
+    rows = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ENTITY_TABLES}
+    conn.close()
+
+    result = {
+        'seconds': elapsed,
+        'calls': len(latencies),
+        'p50_ms': percentile(latencies, 0.5) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else None,
+        'rows': rows,
+        'search_seconds': search_seconds,
+        # ru_maxrss is in kilobytes on Linux.
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+    Path(args.result).write_text(json.dumps(result), encoding='utf-8')
+
+
+def run_scale(args, scale: int) -> Dict:
+    server = MockSpotifyServer(catalog=Catalog(args.catalog_size, args.max_playlist_tracks),
+                               latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                               error_rate_429=args.error_rate_429, error_rate_5xx=args.error_rate_5xx,
+                               retry_after=args.retry_after, rps_limit=args.rps_limit).start()
+    try:
+        if args.keep_data:
+            kept = Path(args.keep_data) / str(scale)
+            kept.mkdir(parents=True, exist_ok=True)
+            workspace = nullcontext(str(kept))
+        else:
+            workspace = tempfile.TemporaryDirectory(prefix=f"spotify_bench_{scale}_")
+        with workspace as data_dir:
+            write_id_files(Path(data_dir), scale, args.playlist_ratio)
+            result_path = Path(data_dir) / "result.json"
+            env = {**os.environ, **server.env(),
+                   'CLIENT_ID': 'benchmark', 'CLIENT_SECRET': 'benchmark',
+                   'SPOTIFY_TARGET_RPS': str(args.target_rps)}
+            command = [sys.executable, __file__, '--worker', '--data-dir', data_dir, '--result', str(result_path),
+                       '--concurrency', str(args.concurrency), '--search-count', str(args.search_count)]
+            if args.use_async:
+                command.append('--async')
+            if args.crawl:
+                command.append('--crawl')
+            subprocess.run(command, env=env, check=True, cwd=data_dir)
+            result = json.loads(result_path.read_text(encoding='utf-8'))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    stats = server.stats()
+    # Search requests belong to the separately timed fetch_ids stage.
+    api_requests = sum(count for key, count in stats.items()
+                       if key.startswith('endpoint_') and key != 'endpoint_search')
+    entities = sum(result['rows'].values())
+    return {
+        'scale': scale,
+        'seconds': round(result['seconds'], 2),
+        'api_requests': api_requests,
+        'requests_per_sec': round(api_requests / result['seconds'], 1),
+        'entities': entities,
+        'entities_per_sec': round(entities / result['seconds'], 1),
+        'p50_ms': round(result['p50_ms'], 2) if result['p50_ms'] is not None else None,
+        'p99_ms': round(result['p99_ms'], 2) if result['p99_ms'] is not None else None,
+        'peak_rss_mb': round(result['peak_rss_mb'], 1),
+        'search_seconds': round(result['search_seconds'], 2) if result['search_seconds'] else None,
+        'rate_limited': stats.get('status_429', 0),
+        'server_errors': sum(count for key, count in stats.items() if key.startswith('status_5')),
+        'rows': result['rows'],
+        'server': stats
+    }
+
+
+def main(args):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    results = []
+    for scale in args.scales:
+        logging.info(f"Benchmarking {scale} IDs per entity type...")
+        results.append(run_scale(args, scale))
+
+    columns = ['scale', 'seconds', 'api_requests', 'requests_per_sec', 'entities', 'entities_per_sec',
+               'p50_ms', 'p99_ms', 'peak_rss_mb', 'rate_limited', 'server_errors']
+    if args.search_count:
+        columns.append('search_seconds')
+    print(format_table([[result[column] for column in columns] for result in results], columns))
+
+    # One JSON line per run, so successive runs can be compared as a baseline.
+    if args.json_path:
+        run = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'config': {name: value for name, value in vars(args).items()
+                       if name not in ('worker', 'result', 'data_dir', 'json_path')},
+            'results': results
+        }
+        with open(args.json_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(run) + "\n")
+        print(f"\nResults appended to {args.json_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ETL pipeline against the local mock Spotify API")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="IDs per entity type in each run")
+    parser.add_argument('--async', dest='use_async', action='store_true')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--crawl', action='store_true')
+    parser.add_argument('--playlist-ratio', type=float, default=0.01,
+                        help="playlist IDs seeded per album/artist/track ID")
+    parser.add_argument('--target-rps', type=float, default=500.0,
+                        help="client rate limiter target; high by default so the mock is the bottleneck")
+    parser.add_argument('--search-count', type=int, default=0,
+                        help="also time fetch_ids.get_random_ids for this many IDs per type")
+    parser.add_argument('--catalog-size', type=int, default=100000)
+    parser.add_argument('--max-playlist-tracks', type=int, default=300)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--error-rate-429', type=float, default=0.0)
+    parser.add_argument('--error-rate-5xx', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--rps-limit', type=float, default=None)
+    parser.add_argument('--keep-data', default=None, metavar='DIR',
+                        help="keep each scale's ID files and databases in DIR/<scale> instead of a temporary directory")
+    parser.add_argument('--json', dest='json_path', default=None, metavar='PATH',
+                        help="append the results as one JSON line to this file")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--data-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+    else:
+        main(args)
@@ -4,20 +4,28 @@ import random
 import logging
 from dotenv import load_dotenv
 import os
+import sys
 import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "src" / "etl"))
+
+from RateLimiter import get_shared_limiter
+from HttpSession import API_BASE_URL, TOKEN_URL, get_session, log_connection_stats
+from IdRegistry import IdRegistry
 
 def get_access_token():
     load_dotenv()
     CLIENT_ID = os.getenv("CLIENT_ID")
     CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-    token_url = 'https://accounts.spotify.com/api/token'
     headers = {
         'Authorization': f"Basic {base64.b64encode(f'{CLIENT_ID}:{CLIENT_SECRET}'.encode()).decode()}",
     }
     data = {
         'grant_type': 'client_credentials'
     }
-    response = requests.post(token_url, headers=headers, data=data)
+    response = get_session().post(TOKEN_URL, headers=headers, data=data)
     if response.status_code == 200:
         token_data = response.json()
         return token_data['access_token']
@@ -26,15 +34,18 @@ def get_access_token():
         return None
 
 def fetch_with_retry(url, headers, max_retries=3):
+    rate_limiter = get_shared_limiter()
     for attempt in range(max_retries):
+        rate_limiter.acquire()
         try:
-            response = requests.get(url, headers=headers)
+            response = get_session().get(url, headers=headers)
             if response.status_code == 200:
+                rate_limiter.on_success()
                 return response
             elif response.status_code == 429:  
                 retry_after = int(response.headers.get('Retry-After', 5))
                 logging.warning(f"Rate limited. Retrying after {retry_after} seconds...")
-                time.sleep(retry_after)
+                rate_limiter.on_rate_limited(retry_after)
                 continue
             else:
                 logging.error(f"Error: {response.status_code} - {response.text}")
@@ -52,21 +63,26 @@ def get_related_ids_from_playlist(playlist_id, access_token):
         'Content-Type': 'application/json'
     }
 
-    url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks?limit=100"
-    response = fetch_with_retry(url, headers)
+    url = (f"{API_BASE_URL}/playlists/{playlist_id}/tracks?limit=100"
+           f"&fields=next,items(track(id,album(id),artists(id)))")
 
     track_ids = set()
     album_ids = set()
     artist_ids = set()
 
-    if response and response.status_code == 200:
-        items = response.json().get("items", [])
-        for item in items:
+    # Follow `next` so playlists longer than one page are fully covered.
+    while url:
+        response = fetch_with_retry(url, headers)
+        if not response or response.status_code != 200:
+            break
+
+        page = response.json()
+        for item in page.get("items", []):
             track = item.get("track")
             if track:
                 track_id = track.get("id")
                 album = track.get("album")
-                artists = track.get("artists")
+                artists = track.get("artists") or []
 
                 if track_id:
                     track_ids.add(track_id)
@@ -77,11 +93,12 @@ def get_related_ids_from_playlist(playlist_id, access_token):
                 for artist in artists:
                     if artist and "id" in artist:
                         artist_ids.add(artist["id"])
+        url = page.get("next")
 
     return track_ids, album_ids, artist_ids
 
 def get_random_playlist_ids(access_token, count=40):
-    base_url = 'https://api.spotify.com/v1/search'
+    base_url = f'{API_BASE_URL}/search'
     headers = {
         'Authorization': f'Bearer {access_token}',
         'Content-Type': 'application/json'
@@ -129,24 +146,8 @@ def get_random_playlist_ids(access_token, count=40):
                 if item and 'id' in item:
                     ids.add(item['id'])
 
-        time.sleep(0.5)
-
     return random.sample(list(ids), min(count, len(ids))) if ids else []
 
-def save_ids_to_file(ids, filename):
-    existing_ids = set()
-    if os.path.exists(filename):
-        with open(filename, 'r') as file:
-            existing_ids = set(line.strip() for line in file.readlines())
-
-    new_ids = set(ids) - existing_ids
-
-    with open(filename, 'a') as file:
-        for id in new_ids:
-            file.write(f"{id}\n")
-
-    return len(new_ids)
-
 def main():
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     access_token = get_access_token()
@@ -166,15 +167,17 @@ def main():
         all_track_ids.update(track_ids)
         all_album_ids.update(album_ids)
         all_artist_ids.update(artist_ids)
-        time.sleep(0.5) 
 
-    added_playlist = save_ids_to_file(all_playlist_ids, "playlist_ids.txt")
-    added_track = save_ids_to_file(all_track_ids, "track_ids.txt")
-    added_album = save_ids_to_file(all_album_ids, "album_ids.txt")
-    added_artist = save_ids_to_file(all_artist_ids, "artist_ids.txt")
+    registry = IdRegistry()
+    added_playlist = registry.add('playlists', all_playlist_ids, source='search')
+    added_track = registry.add('tracks', all_track_ids, source='playlist')
+    added_album = registry.add('albums', all_album_ids, source='playlist')
+    added_artist = registry.add('artists', all_artist_ids, source='playlist')
+    registry.close()
 
     logging.info(f"Added {added_playlist} playlists, {added_track} tracks, "
                  f"{added_album} albums, {added_artist} artists.")
+    log_connection_stats()
 
 if __name__ == "__main__":
     main()
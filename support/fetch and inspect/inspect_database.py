@@ -1,13 +1,110 @@
+import argparse
+import json
+import math
+import random
 import sqlite3
-import pandas as pd
-from tabulate import tabulate
+import sys
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Optional
 
-def get_database_summary(db_path="spotify_db/spotify.db"):
-    conn = sqlite3.connect(db_path)
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "db"))
+
+from StreamingStats import register_aggregates
+
+NUMERIC_TYPES = ('INT', 'REAL', 'FLOA', 'DOUB', 'NUM', 'BOOL')
+STATS = ('count', 'null_rate', 'distinct_estimate', 'min', 'max', 'mean', 'std')
+
+
+def quote(column: str) -> str:
+    return f'"{column}"'
+
+
+def is_numeric(declared_type: str) -> bool:
+    return any(marker in declared_type.upper() for marker in NUMERIC_TYPES)
+
+
+def profile_columns(conn: sqlite3.Connection, source: str, columns: List[str]) -> Dict[str, Dict]:
+    # Every aggregate for every numeric column comes out of one scan of the table.
+    selects = ['COUNT(*)']
+    for col in columns:
+        selects += [f"{aggregate}({quote(col)})"
+                    for aggregate in ('COUNT', 'approx_distinct', 'MIN', 'MAX', 'AVG', 'stddev_pop')]
+    row = conn.execute(f"SELECT {', '.join(selects)} FROM {source}").fetchone()
+    total = row[0]
+    stats = {}
+    for i, col in enumerate(columns):
+        count, distinct, minimum, maximum, mean, std = row[1 + i * 6:7 + i * 6]
+        stats[col] = {
+            'count': count,
+            'null_rate': round(1 - count / total, 4) if total else None,
+            'distinct_estimate': distinct if count else 0,
+            'min': minimum,
+            'max': maximum,
+            'mean': mean,
+            'std': std
+        }
+    return stats
+
+
+def reservoir_sample(conn: sqlite3.Connection, table: str, columns: List[str], size: int) -> List[tuple]:
+    # Algorithm L: after the reservoir fills, whole runs of rows are skipped without a random draw each.
+    rows = conn.execute(f"SELECT {', '.join(map(quote, columns))} FROM {table}")
+    reservoir = list(islice(rows, size))
+    if len(reservoir) < size:
+        return reservoir
+    weight = math.exp(math.log(random.random()) / size)
+    while True:
+        skip = math.floor(math.log(random.random()) / math.log(1 - weight))
+        row = next(islice(rows, skip, None), None)
+        if row is None:
+            return reservoir
+        reservoir[random.randrange(size)] = row
+        weight *= math.exp(math.log(random.random()) / size)
+
+
+def profile_table(conn: sqlite3.Connection, table: str, columns: List[str],
+                  sample_size: Optional[int]) -> Dict[str, Dict]:
+    if not sample_size:
+        return profile_columns(conn, table, columns)
+    # Sampled rows go to a temp table so the same single-pass SQL profiles them.
+    sample = reservoir_sample(conn, table, columns, sample_size)
+    conn.execute("DROP TABLE IF EXISTS temp.profile_sample")
+    conn.execute(f"CREATE TEMP TABLE profile_sample ({', '.join(map(quote, columns))})")
+    conn.executemany(f"INSERT INTO temp.profile_sample VALUES ({', '.join(['?'] * len(columns))})", sample)
+    return profile_columns(conn, "temp.profile_sample", columns)
+
+
+def format_value(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    return f"{value:,}" if isinstance(value, int) else str(value)
+
+
+def format_table(rows: List[list], headers: List[str], right_align: int = 1) -> str:
+    # Columns from index right_align onwards are right-aligned, so numeric columns line up.
+    cells = [headers] + [['' if value is None else str(value) for value in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    lines = ['  '.join(cell.rjust(width) if i >= right_align else cell.ljust(width)
+                       for i, (cell, width) in enumerate(zip(row, widths))).rstrip() for row in cells]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return '\n'.join(lines)
+
+
+def get_database_summary(db_path="spotify_db/spotify.db", sample_size: Optional[int] = None,
+                         json_path: Optional[str] = None):
+    conn = sqlite3.connect(f"file:{Path(db_path).resolve()}?mode=ro", uri=True)
+    register_aggregates(conn)
     cursor = conn.cursor()
-    
-    tables = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;", conn)['name'].tolist()
-    
+
+    tables = [row[0] for row in cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name;"
+    ).fetchall()]
+
     if not tables:
         print("No tables found in the database.")
         conn.close()
@@ -15,50 +112,68 @@ def get_database_summary(db_path="spotify_db/spotify.db"):
 
     summary_data = []
     column_stats = []
-    
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'db_path': str(Path(db_path).resolve()),
+        'sample_size': sample_size,
+        'tables': {}
+    }
+
     for table in tables:
         cursor.execute(f"SELECT COUNT(*) FROM {table};")
         row_count = cursor.fetchone()[0]
-        
+
         cursor.execute(f"PRAGMA table_info({table});")
         columns = cursor.fetchall()
         col_count = len(columns)
-        
+
         summary_data.append([table, row_count, col_count])
-        
+
         if row_count > 0:
-            df = pd.read_sql(f"SELECT * FROM {table} LIMIT 1;", conn)
-            sample_data = df.iloc[0].to_dict()
+            cursor.execute(f"SELECT * FROM {table} LIMIT 1;")
+            sample_data = dict(zip([desc[0] for desc in cursor.description], cursor.fetchone()))
             for col in columns:
                 col_name = col[1]
                 col_type = col[2]
                 sample_value = str(sample_data.get(col_name, ''))[:50]
                 column_stats.append([table, col_name, col_type, sample_value])
-    
+
+        numeric_cols = [col[1] for col in columns if is_numeric(col[2])]
+        report['tables'][table] = {
+            'rows': row_count,
+            'columns': col_count,
+            'numeric': profile_table(conn, table, numeric_cols, sample_size) if numeric_cols and row_count else {}
+        }
+
     print("\nDATABASE SUMMARY")
-    print(tabulate(summary_data, 
-                 headers=["Table", "Rows", "Columns"],
-                 tablefmt="grid",
-                 numalign="right"))
-    
+    print(format_table(summary_data, ["Table", "Rows", "Columns"]))
+
     print("\nCOLUMN DETAILS (First Row Samples)")
-    print(tabulate(column_stats,
-                 headers=["Table", "Column", "Type", "Sample Value"],
-                 tablefmt="grid",
-                 maxcolwidths=[None, None, None, 50]))
-    
-    print("\nBASIC STATISTICS")
-    for table in tables:
-        try:
-            df = pd.read_sql(f"SELECT * FROM {table};", conn)
-            numeric_cols = df.select_dtypes(include=['number']).columns
-            if len(numeric_cols) > 0:
-                print(f"\n{table} - Numeric Columns Statistics:")
-                print(df[numeric_cols].describe().to_markdown(tablefmt="grid"))
-        except Exception as e:
-            print(f"Could not describe table '{table}': {e}")
+    print(format_table(column_stats, ["Table", "Column", "Type", "Sample Value"], right_align=4))
+
+    print("\nBASIC STATISTICS" + (f" (reservoir sample of {sample_size} rows per table)" if sample_size else ""))
+    for table, table_report in report['tables'].items():
+        if table_report['numeric']:
+            print(f"\n{table} - Numeric Columns Statistics:")
+            print(format_table([[col] + [format_value(stats[name]) for name in STATS]
+                                for col, stats in table_report['numeric'].items()],
+                               ["Column", "Count", "Null Rate", "Distinct (est.)", "Min", "Max", "Mean", "Std"]))
+
+    # One JSON object per run, appended, so successive runs can be diffed for trends.
+    if json_path:
+        with open(json_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(report) + "\n")
+        print(f"\nProfile appended to {json_path}")
 
     conn.close()
 
 if __name__ == "__main__":
-    get_database_summary()
+    parser = argparse.ArgumentParser(description="Profile the tables of the Spotify SQLite database")
+    parser.add_argument('--db-path', default="spotify_db/spotify.db")
+    parser.add_argument('--sample', type=int, default=None, metavar='ROWS',
+                        help="profile a reservoir sample of this many rows per table instead of every row")
+    parser.add_argument('--json', dest='json_path', default=None, metavar='PATH',
+                        help="append the profile as one JSON line to this file")
+    args = parser.parse_args()
+
+    get_database_summary(args.db_path, args.sample, args.json_path)
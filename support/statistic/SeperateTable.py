@@ -1,44 +1,21 @@
-import sqlite3
-import json  
+import argparse
+import logging
+import sys
 from pathlib import Path
 
+# Genre explosion now runs inside DatabaseManager loads; this script only rebuilds it for an existing database.
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "db"))
 
-db_path: str = "spotify_db/spotify.db"
-db_path = Path(db_path).resolve()
+from DatabaseManager import DatabaseManager
 
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild genre_dim and artist_genres from artists.genres")
+    parser.add_argument('--db-path', default="spotify_db/spotify.db")
+    args = parser.parse_args()
 
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS genres (
-    artist_id TEXT,
-    genre TEXT
-);
-""")
-
-
-cursor.execute("DELETE FROM genres;")
-
-
-cursor.execute("SELECT artist_id, genres FROM artists;")
-rows = cursor.fetchall()
-
-
-for artist_id, genres_str in rows:
-    if genres_str and genres_str != "[]":
-        try:
-            genres_list = json.loads(genres_str)  
-            for genre in genres_list:
-                cleaned_genre = genre.strip().lower()  
-                cursor.execute(
-                    "INSERT INTO genres (artist_id, genre) VALUES (?, ?)",
-                    (artist_id, cleaned_genre)
-                )
-        except json.JSONDecodeError:
-            print(f"Invalid JSON for artist {artist_id}: {genres_str}")
-
-conn.commit()
-conn.close()
-
-print("Genres table created successfully.")
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db_manager = DatabaseManager.open_existing(args.db_path, read_only=False)
+    db_manager.refresh_genres(all_artists=True)
+    db_manager.close()
@@ -1,33 +1,29 @@
-import sqlite3
-import numpy as np
-
-db_path = r"D:\SpotifyAPI\SpotifyAPI_Music\spotify_db\spotify.db"
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
-
-cursor.execute("SELECT followers FROM artists WHERE followers IS NOT NULL AND followers > 0")
-followers = [row[0] for row in cursor.fetchall()]
-
-if not followers:
-    print("No valid followers data found.")
-else:
-    log_followers = np.log10(followers)
-
-    mean_log = round(np.mean(log_followers), 2)
-    std_log = round(np.std(log_followers), 2)
-
-    low_log = round(mean_log - std_log, 2)
-    high_log = round(mean_log + std_log, 2)
-
-    mean_followers = round(np.mean(followers), 2)
-
-    low_threshold = int(10 ** low_log)
-    high_threshold = int(10 ** high_log)
-
-    print(f"Mean log10(followers): {mean_log}")
-    print(f"Std log10(followers): {std_log}")
-    print(f"Mean followers (actual): {mean_followers}")
-    print(f"Low threshold (followers): < {low_threshold}")
-    print(f"High threshold (followers): >= {high_threshold}")
-
-conn.close()
+import argparse
+import sys
+from pathlib import Path
+
+# The statistics are computed in SQLite by DatabaseManager.compute_thresholds; every load also stores them.
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "db"))
+
+from DatabaseManager import DatabaseManager
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the artist follower thresholds")
+    parser.add_argument('--db-path', default="spotify_db/spotify.db")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager.open_existing(args.db_path)
+    values = dict(db_manager.compute_thresholds())
+    db_manager.close()
+
+    if 'followers_mean' not in values:
+        print("No valid followers data found.")
+    else:
+        print(f"Mean log10(followers): {values['followers_log10_mean']}")
+        print(f"Std log10(followers): {values['followers_log10_std']}")
+        print(f"Mean followers (actual): {values['followers_mean']}")
+        print(f"Median followers (P2 estimate): {int(values['followers_p50'])}")
+        print(f"Low threshold (followers): < {values['followers_low']}")
+        print(f"High threshold (followers): >= {values['followers_high']}")
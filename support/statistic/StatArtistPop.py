@@ -1,24 +1,28 @@
-import sqlite3
-import numpy as np
-
-db_path = r"D:\SpotifyAPI\SpotifyAPI_Music\spotify_db\spotify.db"
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
-
-
-cursor.execute("SELECT popularity FROM artists WHERE popularity IS NOT NULL")
-popularities = [row[0] for row in cursor.fetchall()]
-
-
-mean_pop = round(np.mean(popularities), 2)
-std_pop = round(np.std(popularities), 2)
-low_threshold = round(mean_pop - std_pop, 2)
-high_threshold = round(mean_pop + std_pop, 2)
-
-
-print(f"Mean popularity: {mean_pop}")
-print(f"Standard deviation: {std_pop}")
-print(f"Low threshold: < {low_threshold}")
-print(f"High threshold: >= {high_threshold}")
-
-conn.close()
+import argparse
+import sys
+from pathlib import Path
+
+# The statistics are computed in SQLite by DatabaseManager.compute_thresholds; every load also stores them.
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "db"))
+
+from DatabaseManager import DatabaseManager
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the artist popularity thresholds")
+    parser.add_argument('--db-path', default="spotify_db/spotify.db")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager.open_existing(args.db_path)
+    values = dict(db_manager.compute_thresholds())
+    db_manager.close()
+
+    if 'popularity_mean' not in values:
+        print("No valid popularity data found.")
+    else:
+        print(f"Mean popularity: {values['popularity_mean']}")
+        print(f"Standard deviation: {values['popularity_std']}")
+        print(f"Median popularity (P2 estimate): {values['popularity_p50']:.2f}")
+        print(f"Low threshold: < {values['popularity_low']}")
+        print(f"High threshold: >= {values['popularity_high']}")
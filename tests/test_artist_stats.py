@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT / "db"))
+
+pytest.importorskip("pandas")
+
+from DatabaseManager import DatabaseManager
+
+
+def artist(artist_id: str):
+    return {'artist_id': artist_id, 'artist_name': artist_id, 'genres': '[]', 'popularity': 50,
+            'followers': 100, 'artist_uri': f"spotify:artist:{artist_id}"}
+
+
+def album(album_id: str, artist_ids: str, popularity: int):
+    return {'album_id': album_id, 'album_name': album_id, 'album_type': 'album', 'artist_id': artist_ids,
+            'release_date': '2024-01-01', 'total_tracks': 1, 'popularity': popularity, 'markets': '[]',
+            'album_uri': f"spotify:album:{album_id}"}
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / "spotify.db"), str(REPO_ROOT / "db" / "schema"))
+    yield db_manager
+    db_manager.close()
+
+
+def album_stats(db_manager):
+    return {artist_id: (album_count, avg_popularity) for artist_id, album_count, avg_popularity in
+            db_manager.connection.execute("SELECT artist_id, album_count, avg_album_popularity FROM artist_stats")}
+
+
+def test_two_artist_album_counts_for_both_artists(db_manager):
+    assert db_manager.save_rows({
+        'artists': [artist('A'), artist('B')],
+        'albums': [album('duet', 'A,B', 60), album('solo', 'A', 40)]
+    })
+    assert album_stats(db_manager) == {'A': (2, 50.0), 'B': (1, 60.0)}
+
+
+def test_dropped_credit_leaves_the_artists_stats(db_manager):
+    db_manager.save_rows({'artists': [artist('A'), artist('B')], 'albums': [album('duet', 'A,B', 60)]})
+    assert db_manager.save_rows({'albums': [album('duet', 'A', 60)]})
+    assert album_stats(db_manager) == {'A': (1, 60.0), 'B': (0, None)}
+
+
+def test_existing_database_backfills_album_artists(tmp_path, db_manager):
+    db_manager.save_rows({'artists': [artist('A'), artist('B')], 'albums': [album('duet', 'A,B', 60)]})
+    # A database written before the bridge existed: no bridge rows and stats that missed artist B.
+    db_manager.connection.execute("DELETE FROM album_artists")
+    db_manager.connection.execute("UPDATE artist_stats SET album_count = 0 WHERE artist_id = 'B'")
+    db_manager.connection.commit()
+    db_manager.close()
+
+    reopened = DatabaseManager(str(tmp_path / "spotify.db"), str(REPO_ROOT / "db" / "schema"), incremental=True)
+    try:
+        assert album_stats(reopened) == {'A': (1, 60.0), 'B': (1, 60.0)}
+    finally:
+        reopened.close()
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT / "support" / "benchmark"))
+
+from mock_spotify_api import Catalog, MockSpotifyServer, make_id
+
+pytest.importorskip("requests")
+pytest.importorskip("pandas")
+
+ARTISTS = 20
+
+
+class DriftingCatalog(Catalog):
+    # Popularity moves by `drift` between runs, as it does on the real API from one day to the next.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.drift = 0
+
+    def artist(self, artist_id: str):
+        artist = super().artist(artist_id)
+        artist['popularity'] = (artist['popularity'] + self.drift) % 101
+        return artist
+
+
+@pytest.fixture
+def server():
+    server = MockSpotifyServer(catalog=DriftingCatalog(size=1000, max_playlist_tracks=10)).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def run_pipeline(server, data_dir: Path, *args):
+    env = {**os.environ, **server.env(), 'CLIENT_ID': 'test', 'CLIENT_SECRET': 'test', 'SPOTIFY_TARGET_RPS': '500',
+           'PYTHONPATH': os.pathsep.join(filter(None, [str(REPO_ROOT / "src" / "etl"), str(REPO_ROOT / "db"),
+                                                       os.getenv('PYTHONPATH')]))}
+    subprocess.run([sys.executable, str(REPO_ROOT / "src" / "etl" / "SpotifyBatchETL.py"),
+                    '--data-dir', str(data_dir), '--schema-dir', str(REPO_ROOT / "db" / "schema"), *args],
+                   env=env, check=True, capture_output=True)
+
+
+def test_refresh_budget_records_live_popularity(server, tmp_path):
+    artist_ids = [make_id('artist', n) for n in range(ARTISTS)]
+    (tmp_path / "artist_ids.txt").write_text(''.join(f"{artist_id}\n" for artist_id in artist_ids))
+    run_pipeline(server, tmp_path)
+
+    # The first run cached every artist response; a refresh that read those would see no change at all.
+    server.catalog.drift = 7
+    time.sleep(1.1)
+    run_pipeline(server, tmp_path, '--refresh-budget', '100', '--refresh-after', '0')
+
+    expected = {artist_id: server.catalog.artist(artist_id)['popularity'] for artist_id in artist_ids}
+    connection = sqlite3.connect(tmp_path / "spotify.db")
+    connection.execute("ATTACH DATABASE ? AS history", (str(tmp_path / "history.db"),))
+    refreshed = dict(connection.execute(
+        "SELECT entity_id, popularity FROM refresh_state WHERE entity_type = 'artists' AND volatility IS NOT NULL"
+    ))
+    latest = dict(connection.execute("""
+        SELECT entity_id, popularity FROM history.popularity_history h
+        WHERE entity_type = 'artists'
+          AND observed_at = (SELECT MAX(observed_at) FROM history.popularity_history
+                             WHERE entity_type = h.entity_type AND entity_id = h.entity_id)
+    """))
+    observations = connection.execute(
+        "SELECT COUNT(*) FROM history.popularity_history WHERE entity_type = 'artists'"
+    ).fetchone()[0]
+    connection.close()
+
+    assert refreshed == expected
+    assert latest == expected
+    assert observations == 2 * ARTISTS